@@ -3,7 +3,7 @@ Configurações da aplicação usando Pydantic v2 Settings.
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 
 
@@ -24,7 +24,154 @@ class Settings(BaseSettings):
     
     # Configurações de API
     api_timeout: int = 30
-    rate_limit: int = 60
+    rate_limit: int = 60  # extrações por minuto por cliente (0 = sem limite)
+    
+    # Provedores: URLs base (ex.: mock local de benchmarks/mock_provider.py)
+    claude_base_url: str = "https://api.anthropic.com"
+    gemini_base_url: str = "https://generativelanguage.googleapis.com"
+    # Timeout de cada provedor (None = api_timeout)
+    claude_timeout: Optional[float] = None
+    gemini_timeout: Optional[float] = None
+    
+    # Provedor compatível com a API da OpenAI (chat/completions com imagem),
+    # ex.: endpoint de visão auto-hospedado (vLLM, Ollama) ou o mock local
+    openai_enabled: bool = False
+    openai_base_url: str = "https://api.openai.com"
+    openai_model: str = "gpt-4o-mini"
+    openai_key_prefix: str = "sk-"  # vazio = aceita qualquer chave (fora do modo auto)
+    openai_max_concurrency: int = 8
+    openai_timeout: Optional[float] = None
+    openai_cost_per_call: float = 0.003
+    
+    # Controle de admissão
+    rate_limit_per_api_key: int = 60  # extrações por minuto por chave de API
+    rate_limit_burst: int = 10
+    rate_limit_max_keys: int = 10000
+    rate_limit_trust_forwarded_for: bool = False
+    rate_limit_db_path: str = ""  # SQLite compartilhado entre processos (vazio = em memória)
+    admission_max_in_flight: int = 16
+    admission_max_queue: int = 32
+    admission_queue_timeout: float = 10.0
+    
+    # Pool de conexões HTTP com os provedores
+    http2_enabled: bool = True
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry: float = 60.0
+    http_connect_timeout: float = 10.0
+    
+    # Cache de resultados de extração
+    cache_enabled: bool = True
+    cache_max_entries: int = 512
+    cache_ttl_seconds: int = 86400
+    cache_disk_path: str = ""  # vazio = sem camada em disco
+    cache_disk_max_entries: int = 10000
+    
+    # Quase-duplicatas (hash perceptual): reaproveita a extração de um documento
+    # fotografado/escaneado de novo; desligado por padrão, pois um falso positivo
+    # devolveria os dados de outro documento
+    near_duplicate_enabled: bool = False
+    near_duplicate_threshold: int = 4  # distância de Hamming máxima (de 64 bits)
+    near_duplicate_max_entries: int = 1000000
+    near_duplicate_snapshot_path: str = ""  # vazio = só em memória
+    near_duplicate_snapshot_interval: float = 300.0
+    
+    # Caminho rápido local: OCR (Tesseract) antes do provedor, com escalonamento
+    # ao provedor quando faltam campos, a confiança é baixa ou a validação falha
+    local_ocr_enabled: bool = False
+    local_ocr_binary: str = "tesseract"
+    local_ocr_language: str = "por"
+    local_ocr_psm: int = 3  # segmentação de página do Tesseract
+    local_ocr_min_confidence: float = 80.0  # confiança mínima (0-100) de cada campo
+    local_ocr_timeout: float = 10.0
+    
+    # Pré-processamento de imagens (Pillow)
+    preprocess_enabled: bool = True
+    preprocess_max_long_edge: int = 2048
+    preprocess_jpeg_quality: int = 85
+    preprocess_grayscale: bool = False
+    preprocess_autocrop: bool = False
+    preprocess_min_bytes: int = 300 * 1024
+    
+    # Extração em lote
+    batch_max_files: int = 20
+    claude_max_concurrency: int = 8
+    gemini_max_concurrency: int = 8
+    
+    # Modo assíncrono (jobs)
+    jobs_workers: int = 4
+    jobs_max_queue: int = 100
+    jobs_result_ttl_seconds: int = 3600
+    jobs_db_path: str = ""  # vazio = apenas em memória
+    
+    # Saída estruturada nativa (tool use no Claude, responseSchema no Gemini)
+    structured_output: bool = True
+    structured_max_tokens: int = 1024
+    
+    # Prompts por tipo de documento e cache de prompt do Claude
+    prompt_variants_enabled: bool = True
+    claude_prompt_caching: bool = True
+    
+    # Validação e normalização dos dados extraídos (CPF, CNH, CEP, datas, UF)
+    validation_enabled: bool = True
+    validation_normalize: bool = True  # devolve os campos na forma canônica
+    # Nova consulta ao provedor só dos campos inválidos (custa uma chamada)
+    validation_reask_enabled: bool = False
+    validation_reask_max_fields: int = 4
+    validation_batch_max_records: int = 50000
+    validation_batch_chunk: int = 5000  # registros por tarefa no pool de CPU
+    
+    # Retry com backoff e circuit breaker por provedor
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    retry_deadline_factor: float = 2.0  # prazo total = timeout do provedor * fator
+    breaker_window: int = 20
+    breaker_min_requests: int = 10
+    breaker_error_threshold: float = 0.5
+    breaker_open_seconds: float = 30.0
+    
+    # Hedge entre provedores (provider="auto")
+    hedge_delay_seconds: float = 8.0  # usado até haver amostras suficientes
+    hedge_delay_percentile: float = 0.95
+    hedge_min_delay_seconds: float = 1.0
+    hedge_min_samples: int = 20
+    hedge_budget_ratio: float = 0.2  # fração máxima de requisições com hedge
+    hedge_budget_burst: int = 5
+    hedge_max_cost_per_request: float = 0.05
+    claude_cost_per_call: float = 0.02  # custo estimado (USD) por extração
+    gemini_cost_per_call: float = 0.005
+    
+    # Roteamento adaptativo (provider="adaptive"): primário escolhido pela
+    # latência esperada (EWMA + p95, taxa de erro) por tipo e tamanho de arquivo
+    routing_ewma_alpha: float = 0.2
+    routing_window: int = 100  # amostras por estimativa para o p95
+    routing_p95_weight: float = 0.3  # peso da cauda (p95) na latência esperada
+    routing_min_samples: int = 5  # por recorte; abaixo disso vale o recorte mais geral
+    routing_max_cost_per_request: float = 0.05  # orçamento (USD) do provedor primário
+    routing_explore_ratio: float = 0.05  # decisões que consultam outro provedor
+    routing_decision_log: int = 200  # decisões recentes guardadas para inspeção
+    
+    # Divisão de PDFs em páginas (PyPDF2)
+    pdf_split_enabled: bool = True
+    pdf_pages_per_chunk: int = 1
+    pdf_max_pages: int = 20
+    pdf_max_concurrency: int = 4
+    
+    # Processos para trabalho de CPU (imagens, PDFs)
+    cpu_workers: int = 2
+    
+    # Gravação/reprodução do tráfego com os provedores
+    cassette_mode: str = ""  # vazio = desligado, "record" ou "replay"
+    cassette_dir: str = "cassettes"
+    cassette_replay_speed: float = 1.0  # 1 = tempo gravado, 0 = sem esperas
+    cassette_match: str = "body"  # "body" (hash do corpo) ou "path" (rodízio)
+    
+    # Métricas no formato Prometheus (/metrics)
+    metrics_enabled: bool = True
+    # Diretório compartilhado pelos processos do gunicorn (vazio = só o processo atual)
+    metrics_multiprocess_dir: str = ""
+    metrics_flush_interval: float = 2.0
     
     # Logs
     log_level: str = "INFO"
@@ -3,15 +3,35 @@ Arquivo principal da aplicação FastAPI.
 Define a aplicação, middlewares, e configurações gerais.
 """
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 import time
 from contextlib import asynccontextmanager
 from .config import get_settings
-from .routers import extractor
-from .models import HealthResponse
+from .routers import extractor, jobs, validation, routing
+from .models import HealthResponse, ROUTING_MODES
+from .services.http_client import http_clients
+from .services.provider_registry import provider_registry
+from .services.cache_service import extraction_cache
+from .services.near_duplicate import near_duplicate_index
+from .services.local_ocr import local_ocr
+from .services.coalescer import extraction_coalescer
+from .services.image_preprocessor import image_preprocessor
+from .services.cpu_pool import cpu_pool
+from .services.pdf_service import pdf_splitter
+from .services.job_queue import job_queue
+from .services.hedging import hedging_policy
+from .services.adaptive_router import adaptive_router
+from .services.latency_tracker import latency_tracker
+from .services.resilience import resilience
+from .services.admission import AdmissionMiddleware, admission_stats, extraction_admission
+from .services.response_parser import response_parser
+from .services.validation import document_validator
+from .services.usage_tracker import usage_tracker
+from .services.metrics import metrics, MetricsMiddleware
+from .services.cassette import cassette_store
 
 # Configurar logging
 logging.basicConfig(
@@ -32,9 +52,23 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info(f"Iniciando aplicação em modo {settings.environment}")
     logger.info(f"Servidor rodando na porta {settings.port}")
+    await http_clients.startup(provider_registry.names())
+    cpu_pool.startup(settings.cpu_workers)
+    # O OCR também confere o conteúdo das quase-duplicatas
+    local_ocr.startup(needed=near_duplicate_index.enabled)
+    await near_duplicate_index.startup()
+    await job_queue.startup()
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        metrics.start_multiprocess(settings.metrics_multiprocess_dir, settings.metrics_flush_interval)
     yield
     # Shutdown
     logger.info("Encerrando aplicação...")
+    await job_queue.shutdown()
+    await near_duplicate_index.shutdown()
+    await metrics.stop_multiprocess()
+    await http_clients.shutdown()
+    extraction_cache.close()
+    cpu_pool.shutdown()
 
 
 # Criar aplicação FastAPI
@@ -47,6 +81,16 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Controle de admissão das rotas de extração (antes da leitura do corpo);
+# adicionado antes do CORS para que as respostas 429/503 tenham os headers CORS.
+# O lote ocupa uma vaga por documento (na rota) e os jobs, uma por execução (no worker)
+app.add_middleware(
+    AdmissionMiddleware,
+    paths=["/api/extract", "/api/jobs"],
+    per_document_paths=["/api/extract/batch"],
+    trust_forwarded_for=settings.rate_limit_trust_forwarded_for
+)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -86,8 +130,77 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# Métricas HTTP (mais externo: inclui as recusas da admissão e o próprio log)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Métricas lidas dos serviços a cada scrape de /metrics
+metrics.register_function(
+    "extractor_upstream_requests_in_flight",
+    "Chamadas aos provedores em andamento",
+    ("provider",),
+    lambda: {(provider,): info["in_flight"] for provider, info in http_clients.stats().items()}
+)
+metrics.register_function(
+    "extractor_admission_in_flight",
+    "Extrações admitidas em andamento",
+    (),
+    lambda: {(): extraction_admission.in_flight}
+)
+metrics.register_function(
+    "extractor_admission_queue_depth",
+    "Extrações aguardando admissão",
+    (),
+    lambda: {(): extraction_admission.stats()["queue_depth"]}
+)
+metrics.register_function(
+    "extractor_jobs_queue_depth",
+    "Jobs aguardando um worker",
+    (),
+    lambda: {(): job_queue.stats()["queue_depth"]}
+)
+metrics.register_function(
+    "extractor_response_parse_failures_total",
+    "Respostas dos provedores que não puderam ser interpretadas",
+    ("provider", "category"),
+    lambda: {
+        (provider, category): count
+        for provider, failures in response_parser.failures.items()
+        for category, count in failures.items()
+    },
+    kind="counter"
+)
+metrics.register_function(
+    "extractor_local_ocr_total",
+    "Tentativas do OCR local por resultado (hit ou motivo do escalonamento)",
+    ("outcome",),
+    lambda: {
+        **{(reason,): count for reason, count in local_ocr.escalations.items()},
+        ("hit",): local_ocr.hits,
+    },
+    kind="counter"
+)
+metrics.register_function(
+    "extractor_routing_decisions_total",
+    "Decisões do roteamento adaptativo por provedor escolhido",
+    ("provider",),
+    lambda: {(provider,): count for provider, count in adaptive_router.decisions.items()},
+    kind="counter"
+)
+metrics.register_function(
+    "extractor_invalid_fields_total",
+    "Campos extraídos que não passaram na validação",
+    ("field",),
+    lambda: {(name,): count for name, count in document_validator.invalid_fields.items()},
+    kind="counter"
+)
+
+
 # Incluir routers (SEM prefixo adicional, pois já está definido no router)
 app.include_router(extractor.router)
+app.include_router(jobs.router)
+app.include_router(validation.router)
+app.include_router(routing.router)
 
 
 # Rota raiz
@@ -116,10 +229,14 @@ async def health_check():
 @app.get("/api/health", response_model=HealthResponse)
 async def api_health_check():
     """
-    Health check da API.
+    Health check da API, com o estado dos circuit breakers.
     """
+    breakers = resilience.breaker_stats()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
     return HealthResponse(
-        environment=settings.environment
+        status="degraded" if degraded else "healthy",
+        environment=settings.environment,
+        circuit_breakers=breakers
     )
 
 
@@ -141,6 +258,45 @@ async def api_info():
     return api_info_response()
 
 
+# Estatísticas internas em /api/stats
+@app.get("/api/stats")
+async def api_stats():
+    """
+    Retorna estatísticas de uso dos estágios da extração.
+    """
+    return {
+        "providers": provider_registry.stats(),
+        "http_pools": http_clients.stats(),
+        "cache": extraction_cache.stats(),
+        "near_duplicates": near_duplicate_index.stats(),
+        "local_ocr": local_ocr.stats(),
+        "coalescer": extraction_coalescer.stats(),
+        "preprocessing": image_preprocessor.stats(),
+        "pdf": pdf_splitter.stats(),
+        "jobs": job_queue.stats(),
+        "latency": latency_tracker.stats(),
+        "hedging": hedging_policy.stats(),
+        "routing": adaptive_router.stats(recent=0),
+        "resilience": resilience.stats(),
+        "admission": admission_stats(),
+        "response_parser": response_parser.stats(),
+        "validation": document_validator.stats(),
+        "usage": usage_tracker.stats(),
+        "cassettes": cassette_store.stats()
+    }
+
+
+# Métricas no formato de exposição do Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Histogramas por estágio, contadores e gauges para scrape.
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Métricas desativadas")
+    return Response(content=await metrics.render_all(), media_type="text/plain; version=0.0.4")
+
+
 def api_info_response():
     """
     Resposta padrão para informações da API.
@@ -150,7 +306,7 @@ def api_info_response():
         "version": "1.0.0",
         "environment": settings.environment,
         "features": {
-            "providers": ["claude", "gemini"],
+            "providers": [*provider_registry.names(), *ROUTING_MODES],
             "file_types": settings.allowed_file_types,
             "max_file_size_mb": settings.max_file_size_mb
         },
@@ -158,7 +314,15 @@ def api_info_response():
             "docs": "/docs",
             "health": "/api/health",
             "extract": "/api/extract/",
-            "info": "/api/info"
+            "extract_upload": "/api/extract/upload",
+            "extract_stream": "/api/extract/stream",
+            "extract_batch": "/api/extract/batch",
+            "jobs": "/api/jobs/",
+            "validate_batch": "/api/validate/batch",
+            "routing": "/api/routing",
+            "info": "/api/info",
+            "stats": "/api/stats",
+            "metrics": "/metrics"
         }
     }
 
@@ -3,19 +3,82 @@ Modelos Pydantic para validação de dados.
 Pydantic automaticamente valida tipos, formatos e conteúdo.
 """
 
-from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any, Literal
+from pydantic import BaseModel, Field, PrivateAttr, validator, model_validator
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 import base64
+import binascii
+import hashlib
 
-class ExtractionRequest(BaseModel):
+
+class DocumentContent:
+    """
+    Conteúdo do arquivo decodificado uma única vez.
+    Guarda os bytes (tamanho exato) e a forma base64 usada no payload
+    do provedor, evitando novas decodificações/cópias no caminho da extração.
+    """
+    
+    __slots__ = ("data", "_b64", "_sha256")
+    
+    def __init__(self, data: bytes, b64: Optional[bytes] = None, sha256: Optional[str] = None):
+        self.data = data
+        self._b64 = b64
+        self._sha256 = sha256
+    
+    @classmethod
+    def from_base64(cls, value: str) -> "DocumentContent":
+        """
+        Decodifica o base64 recebido, reaproveitando o texto original
+        como payload quando ele já está na forma canônica.
+        """
+        try:
+            return cls(base64.b64decode(value, validate=True), b64=value.encode("ascii"))
+        except (binascii.Error, ValueError):
+            # Formas não canônicas (quebras de linha etc.) são normalizadas
+            return cls(base64.b64decode(value))
+    
+    @property
+    def size(self) -> int:
+        """Tamanho exato do arquivo em bytes."""
+        return len(self.data)
+    
+    @property
+    def b64(self) -> bytes:
+        """Conteúdo em base64 (ASCII), codificado no máximo uma vez."""
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self.data)
+        return self._b64
+    
+    @property
+    def sha256(self) -> str:
+        """SHA-256 do arquivo decodificado."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+
+# Modos com duas chaves: auto (primário = api_key, hedge no secundário) e
+# adaptive (primário escolhido pela latência observada, hedge no outro)
+ROUTING_MODES = ("auto", "adaptive")
+
+
+def provider_for_key(api_key: Optional[str]) -> Optional[str]:
+    """
+    Identifica o provedor pelo prefixo da chave de API.
+    """
+    from .services.provider_registry import provider_registry
+    return provider_registry.provider_for_key(api_key)
+
+
+class ExtractionMetadata(BaseModel):
     
     """
-    Modelo para requisição de extração.
-    Valida os dados recebidos do frontend.
+    Metadados comuns a toda extração (provedor, chave e arquivo).
+    Usado diretamente pelo endpoint multipart.
     """ 
-    # Provedor: só aceita 'claude' ou 'gemini'
-    provider: Literal["claude", "gemini"] = Field(
+    # Provedor registrado (claude, gemini...), 'auto' (hedge entre dois)
+    # ou 'adaptive' (o servidor escolhe o primário pela latência observada)
+    provider: str = Field(
         ..., description= "Provedor de IA para extração"
     )
     
@@ -23,14 +86,14 @@ class ExtractionRequest(BaseModel):
     api_key: str = Field(
         ...,
         min_length=10,
-        description="Chave de API do provedor"
+        description="Chave de API do provedor (no modo auto, a do provedor primário)"
     )
     
-    #  Arquivo em base64
-    file_content: str = Field(
-        ...,
+    # Chave do provedor secundário (apenas no modo auto)
+    secondary_api_key: Optional[str] = Field(
+        None,
         min_length=10,
-        description="Conteúdo do arquivo em base64"
+        description="Chave de API do provedor secundário (modo auto)"
     )
     
     # Tipo MIME do arquivo
@@ -45,32 +108,110 @@ class ExtractionRequest(BaseModel):
         description="Nome original do arquivo"
     )
     
+    # Dica do tipo de documento (seleciona o prompt reduzido)
+    document_type: Optional[str] = Field(
+        None,
+        description="Tipo do documento: RG, CNH, CPF ou COMPROVANTE_ENDERECO (opcional)"
+    )
+    
+    @validator('provider')
+    def validate_provider(cls, v: str) -> str:
+        """
+        Aceita os provedores registrados e os modos auto/adaptive.
+        """
+        from .services.provider_registry import provider_registry
+        if v not in ROUTING_MODES and v not in provider_registry:
+            available = ', '.join([*provider_registry.names(), *ROUTING_MODES])
+            raise ValueError(f'Provedor desconhecido: {v} (disponíveis: {available})')
+        return v
+    
     @validator('api_key')
     def validate_api_key(cls, v:str, values: dict) -> str:
         """
         Validador customizado para chaves de API.
-        Verifica formato básico sem expor a chave.
+        Verifica formato básico (prefixo do provedor) sem expor a chave.
         """
+        from .services.provider_registry import provider_registry
         provider = values.get('provider')
         
-        if provider == 'claude' and not v.startswith('sk-ant-api'):
-            raise ValueError('Chave Claude deve começar com sk-ant-api')
-        if provider == 'gemini' and not v.startswith('AIza'):
-            raise ValueError('Chave Gemini deve começar com AIza')
+        if provider in ROUTING_MODES:
+            if provider_for_key(v) is None:
+                prefixes = ', '.join(
+                    f'{p.LABEL} ({p.KEY_PREFIX})' for p in provider_registry.all() if p.KEY_PREFIX
+                )
+                raise ValueError(f'Chave deve ser de um destes provedores: {prefixes}')
+        elif provider in provider_registry:
+            service = provider_registry.get(provider)
+            if not service.accepts_key(v):
+                raise ValueError(f'Chave {service.LABEL} deve começar com {service.KEY_PREFIX}')
         
         return v
     
-    @validator('file_content')
-    def validate_base64(cls, v:str) -> str:
+    @validator('secondary_api_key', always=True)
+    def validate_secondary_api_key(cls, v: Optional[str], values: dict) -> Optional[str]:
+        """
+        Nos modos auto e adaptive, exige a chave do outro provedor.
+        """
+        provider = values.get('provider')
+        if provider not in ROUTING_MODES:
+            return v
+        primary = provider_for_key(values.get('api_key'))
+        secondary = provider_for_key(v)
+        if secondary is None or secondary == primary:
+            raise ValueError(f'Modo {provider} exige a chave do outro provedor em secondary_api_key')
+        return v
+    
+    @validator('document_type')
+    def validate_document_type(cls, v: Optional[str]) -> Optional[str]:
+        """
+        Normaliza a dica de tipo (maiúsculas) e rejeita tipos desconhecidos.
+        """
+        from .services.prompts import normalize_document_type
+        return normalize_document_type(v)
+    
+    @property
+    def primary_provider(self) -> str:
+        """
+        Provedor efetivamente consultado primeiro (no modo adaptive, o da
+        chave primária: a escolha é feita por arquivo, no pipeline).
+        """
+        if self.provider in ROUTING_MODES:
+            return provider_for_key(self.api_key)
+        return self.provider
+
+
+class ExtractionRequest(ExtractionMetadata):
+    
+    """
+    Modelo para requisição de extração.
+    Valida os dados recebidos do frontend.
+    """ 
+    #  Arquivo em base64
+    file_content: str = Field(
+        ...,
+        min_length=10,
+        description="Conteúdo do arquivo em base64"
+    )
+    
+    # Conteúdo decodificado na validação e reutilizado até o payload
+    _document: Optional[DocumentContent] = PrivateAttr(None)
+    
+    @model_validator(mode='after')
+    def validate_base64(self) -> "ExtractionRequest":
         """
-        Valida se o conteúdo é base64 válido.
+        Valida se o conteúdo é base64 válido, guardando os bytes decodificados.
         """       
         
         try:
-            base64.b64decode(v)
-            return v
+            self._document = DocumentContent.from_base64(self.file_content)
         except Exception:
             raise ValueError('Conteúdo do arquivo não é base64 válido')
+        return self
+    
+    @property
+    def document(self) -> DocumentContent:
+        """Conteúdo do arquivo já decodificado."""
+        return self._document
         
 class DocumentData(BaseModel):
     
@@ -79,36 +220,99 @@ class DocumentData(BaseModel):
     Define a estrutura esperada de retorno.
     """
     # Campos obrigatórios
-    tipoDocumento: str = Field(..., description="Tipo do documento") 
+    tipoDocumento: str = Field(..., description="Tipo do documento (RG, CNH, CPF, etc)") 
     
         # Campos opcionais (podem ser None)
-    nome: Optional[str] = None
-    cpf: Optional[str] = None
-    rg: Optional[str] = None
-    dataNascimento: Optional[str] = None
-    nomeDaMae: Optional[str] = None
-    nomeDoPai: Optional[str] = None
-    orgaoExpedidor: Optional[str] = None
-    dataExpedicao: Optional[str] = None
-    dataVencimento: Optional[str] = None
-    naturalidade: Optional[str] = None
-    uf: Optional[str] = None
+    nome: Optional[str] = Field(None, description="Nome completo")
+    cpf: Optional[str] = Field(None, description="CPF com formatação (000.000.000-00)")
+    rg: Optional[str] = Field(None, description="RG com formatação")
+    dataNascimento: Optional[str] = Field(None, description="DD/MM/AAAA")
+    nomeDaMae: Optional[str] = Field(None, description="Nome da mãe")
+    nomeDoPai: Optional[str] = Field(None, description="Nome do pai")
+    orgaoExpedidor: Optional[str] = Field(None, description="Órgão expedidor/UF")
+    dataExpedicao: Optional[str] = Field(None, description="DD/MM/AAAA")
+    dataVencimento: Optional[str] = Field(None, description="DD/MM/AAAA")
+    naturalidade: Optional[str] = Field(None, description="Cidade de nascimento")
+    uf: Optional[str] = Field(None, description="Estado (sigla)")
     nacionalidade: Optional[str] = None
     estadoCivil: Optional[str] = None
-    endereco: Optional[str] = None
-    cep: Optional[str] = None
+    endereco: Optional[str] = Field(None, description="Endereço completo")
+    cep: Optional[str] = Field(None, description="CEP com formatação (00000-000)")
     numeroDocumento: Optional[str] = None       
 
     # Campos específicos CNH
-    categoria: Optional[str] = None
-    numeroRegistro: Optional[str] = None
-    validade: Optional[str] = None
-    primeiraHabilitacao: Optional[str] = None
+    categoria: Optional[str] = Field(None, description="Categoria da CNH")
+    numeroRegistro: Optional[str] = Field(None, description="Número de registro da CNH")
+    validade: Optional[str] = Field(None, description="Validade da CNH")
+    primeiraHabilitacao: Optional[str] = Field(None, description="Data da primeira habilitação")
     
      # Campos adicionais
-    observacoes: Optional[str] = None
-    outrosDados: Optional[str] = None
+    observacoes: Optional[str] = Field(None, description="Observações do documento")
+    outrosDados: Optional[str] = Field(None, description="Outros dados relevantes")
+    
+class PreprocessingInfo(BaseModel):
+    """
+    Resultado do pré-processamento da imagem enviada ao provedor.
+    """
+    
+    applied: bool = Field(..., description="Se a imagem reduzida foi usada")
+    original_bytes: int
+    final_bytes: int
+    bytes_saved: int
+    duration_ms: float
+    original_size: list = Field(..., description="[largura, altura] originais")
+    final_size: list = Field(..., description="[largura, altura] enviadas")
+
+
+class TokenUsage(BaseModel):
+    """
+    Consumo das chamadas ao provedor feitas pela requisição.
+    """
+    
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cache_read_input_tokens: int = Field(0, description="Tokens lidos do cache de prompt (Claude)")
+    cache_creation_input_tokens: int = Field(0, description="Tokens gravados no cache de prompt (Claude)")
+    provider_seconds: float
+    time_saved_seconds: Optional[float] = Field(
+        None, description="Estimativa frente à mediana do prompt genérico sem cache"
+    )
+
+
+class FieldValidation(BaseModel):
+    """
+    Estado de um campo após a validação dos dados extraídos.
+    """
+    
+    status: Literal["valid", "normalized", "invalid"] = Field(
+        ..., description="valid: já canônico; normalized: formato corrigido; invalid: não passa na verificação"
+    )
+    reason: Optional[str] = Field(None, description="Motivo, quando inválido")
+
+
+class ValidationReport(BaseModel):
+    """
+    Resultado da validação/normalização dos campos verificáveis
+    (CPF, registro da CNH, CEP, datas, UF...).
+    """
+    
+    valid: bool = Field(..., description="Se nenhum campo verificado é inválido")
+    fields: Dict[str, FieldValidation]
+    reasked: Optional[List[str]] = Field(
+        None, description="Campos consultados de novo no provedor por estarem inválidos"
+    )
+
+
+class ValidationBatchRequest(BaseModel):
+    """
+    Lote de registros (campos do DocumentData) para validação, ex.: backfills.
+    """
     
+    records: List[Dict[str, Any]] = Field(..., description="Registros com os campos do DocumentData")
+    normalize: bool = Field(True, description="Devolver os campos na forma canônica")
+
+
 class ExtractionResponse(BaseModel):
     
     """
@@ -121,6 +325,21 @@ class ExtractionResponse(BaseModel):
     error: Optional[str] = Field(None, description="Mensagem de erro, se houver")
     provider: str = Field(..., description="Provedor usado")
     processing_time: float = Field(..., description="Tempo de processamento em segundos")
+    cached: bool = Field(False, description="Se o resultado veio do cache")
+    near_duplicate_distance: Optional[int] = Field(
+        None, description="Distância de Hamming do documento visualmente parecido encontrado no cache"
+    )
+    near_duplicate_confirmed: Optional[bool] = Field(
+        None, description="Se o conteúdo confirmou a mesma pessoa (só então a extração é reaproveitada)"
+    )
+    hedged: bool = Field(False, description="Se houve requisição extra ao provedor secundário")
+    preprocessing: Optional[PreprocessingInfo] = Field(None, description="Pré-processamento aplicado")
+    documents: Optional[List[DocumentData]] = Field(
+        None, description="Resultados por parte, quando o PDF foi dividido"
+    )
+    document_type: Optional[str] = Field(None, description="Tipo usado na escolha do prompt")
+    usage: Optional[TokenUsage] = Field(None, description="Tokens e tempo das chamadas ao provedor")
+    validation: Optional[ValidationReport] = Field(None, description="Validação dos campos extraídos")
     timestamp: datetime = Field(default_factory=datetime.now)
     
     class Config:
@@ -138,4 +357,21 @@ class HealthResponse(BaseModel):
     status: str = "healthy"
     timestamp: datetime = Field(default_factory=datetime.now)
     version: str = "1.0.0"
-    environment: str
\ No newline at end of file
+    environment: str
+    circuit_breakers: Optional[Dict[str, Any]] = None
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Modelo para o estado de um job de extração assíncrona.
+    """
+    
+    job_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    provider: str
+    file_name: str
+    created_at: float = Field(..., description="Epoch do envio")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    wait_time: Optional[float] = Field(None, description="Segundos aguardando na fila")
+    result: Optional[ExtractionResponse] = None
@@ -4,5 +4,8 @@ Marca o diretório routers como pacote Python.
 
 # Imports dos routers
 from . import extractor
+from . import jobs
+from . import validation
+from . import routing
 
-__all__ = ["extractor"]
\ No newline at end of file
+__all__ = ["extractor", "jobs", "validation", "routing"]
\ No newline at end of file
@@ -3,13 +3,21 @@ Router (controlador) para endpoints de extração.
 Define as rotas HTTP e coordena os serviços.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
-import time
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, Any, AsyncIterator
+import asyncio
 import logging
-from ..models import ExtractionRequest, ExtractionResponse, DocumentData
-from ..services.claude_service import ClaudeService
-from ..services.gemini_service import GeminiService
+import time
+import orjson
+from ..models import ExtractionRequest, ExtractionResponse, ExtractionMetadata, DocumentContent, ROUTING_MODES
+from ..services.pipeline import extraction_pipeline
+from ..services.provider_registry import provider_registry
+from ..services.upload_service import receive_multipart, MultipartUpload, UploadedFile
+from ..services.admission import AdmissionRejected, api_key_rate_limiter, api_key_id, extraction_admission
+from ..services.metrics import metrics
 from ..config import get_settings
 
 # Criar router - agrupa endpoints relacionados
@@ -21,9 +29,51 @@ router = APIRouter(
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Instanciar serviços
-claude_service = ClaudeService()
-gemini_service = GeminiService()
+
+def validate_file_type(file_type: str) -> None:
+    """
+    Rejeita tipos de arquivo não permitidos (415).
+    """
+    if file_type not in settings.allowed_file_types:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Tipo de arquivo não suportado: {file_type}"
+        )
+
+
+def validate_file_size(size: int) -> None:
+    """
+    Rejeita arquivos acima do limite configurado (413).
+    """
+    if size > settings.max_file_size_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Arquivo muito grande. Máximo: {settings.max_file_size_mb}MB"
+        )
+
+
+async def check_api_key_rate(api_key: str, documents: int = 1) -> None:
+    """
+    Aplica o limite de extrações por chave de API (429).
+    """
+    retry_after = await api_key_rate_limiter.check(api_key_id(api_key), documents)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Limite de requisições excedido para esta chave de API",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
+
+
+def extraction_json(result: ExtractionResponse, file_type: str) -> Response:
+    """
+    Serializa a resposta uma única vez (pydantic-core), medindo o estágio
+    de serialização; dispensa a conversão genérica do response_model.
+    """
+    start_time = time.perf_counter()
+    body = result.model_dump_json()
+    metrics.observe_stage("serialization", result.provider, file_type, time.perf_counter() - start_time)
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/", response_model=ExtractionResponse)
@@ -34,89 +84,274 @@ async def extract_document(request: ExtractionRequest) -> ExtractionResponse:
     POST /api/extract/
     
     Recebe:
-    - provider: claude ou gemini
+    - provider: provedor registrado (claude, gemini...), auto ou adaptive
     - api_key: chave da API
+    - secondary_api_key: chave do outro provedor (modos auto e adaptive)
     - file_content: arquivo em base64
     - file_type: tipo MIME
     - file_name: nome original
+    - document_type: opcional (RG, CNH, CPF, COMPROVANTE_ENDERECO);
+      sem ele o tipo é inferido pelo nome do arquivo
     
     Retorna:
     - success: booleano
     - data: dados extraídos
     - error: mensagem de erro (se houver)
     - processing_time: tempo de processamento
+    - cached: se o resultado veio do cache
+    - near_duplicate_distance: quando há no cache um documento
+      visualmente quase idêntico (foto/digitalização repetida)
+    - near_duplicate_confirmed: se o OCR confirmou a mesma pessoa; só então
+      a extração em cache é reaproveitada, senão o provedor é consultado
     """
     
-    # Marcar tempo inicial
-    start_time = time.time()
+    # Validar tamanho exato do arquivo (decodificado uma única vez na validação)
+    validate_file_size(request.document.size)
+    
+    # Validar tipo de arquivo
+    validate_file_type(request.file_type)
+    
+    await check_api_key_rate(request.api_key)
+    metrics.observe_validation(request.provider, request.file_type)
+    
+    result = await extraction_pipeline.run(
+        provider=request.provider,
+        api_key=request.api_key,
+        document=request.document,
+        file_type=request.file_type,
+        file_name=request.file_name,
+        secondary_api_key=request.secondary_api_key,
+        document_type=request.document_type
+    )
+    return extraction_json(result, request.file_type)
+
+
+@router.post("/stream")
+async def extract_stream(request: ExtractionRequest) -> StreamingResponse:
+    """
+    Extração com resposta em streaming (Server-Sent Events).
     
+    POST /api/extract/stream
+    
+    Recebe o mesmo corpo de /api/extract/ e emite:
+    - event: field  -> {"name": ..., "value": ...} a cada campo concluído
+    - event: result -> ExtractionResponse final, já validado
+    """
+    validate_file_size(request.document.size)
+    validate_file_type(request.file_type)
+    await check_api_key_rate(request.api_key)
+    metrics.observe_validation(request.provider, request.file_type)
+    
+    return StreamingResponse(
+        stream_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def stream_events(request: ExtractionRequest) -> AsyncIterator[bytes]:
+    """
+    Formata os eventos do pipeline como SSE.
+    """
+    async for event in extraction_pipeline.stream(
+        provider=request.provider,
+        api_key=request.api_key,
+        document=request.document,
+        file_type=request.file_type,
+        file_name=request.file_name,
+        document_type=request.document_type,
+        secondary_api_key=request.secondary_api_key
+    ):
+        data = event["data"]
+        if isinstance(data, ExtractionResponse):
+            data = data.model_dump(mode="json")
+        yield b"event: " + event["event"].encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/upload", response_model=ExtractionResponse)
+async def extract_upload(request: Request) -> ExtractionResponse:
+    """
+    Extração a partir de upload multipart/form-data.
+    
+    POST /api/extract/upload
+    
+    Recebe (form-data):
+    - provider: provedor registrado (claude, gemini...), auto ou adaptive
+    - api_key: chave da API
+    - file: arquivo (o tipo MIME vem da própria parte)
+    - file_type: opcional, sobrescreve o tipo MIME da parte
+    - document_type: opcional, tipo do documento
+    
+    O arquivo é lido em streaming com limite de tamanho, evitando o
+    corpo JSON com base64; a codificação base64 é feita uma única vez.
+    """
+    upload = await receive_multipart(request, settings.max_file_size_bytes)
     try:
-        # Validar tamanho do arquivo
-        # Base64 aumenta o tamanho em ~33%
-        estimated_size = len(request.file_content) * 0.75
-        if estimated_size > settings.max_file_size_bytes:
-            raise HTTPException(
-                status_code=413,
-                detail=f"Arquivo muito grande. Máximo: {settings.max_file_size_mb}MB"
-            )
-        
-        # Validar tipo de arquivo
-        if request.file_type not in settings.allowed_file_types:
-            raise HTTPException(
-                status_code=415,
-                detail=f"Tipo de arquivo não suportado: {request.file_type}"
-            )
+        if not upload.files:
+            raise HTTPException(status_code=400, detail="Campo 'file' ausente")
+        uploaded = upload.files[0]
         
-        # Escolher serviço baseado no provider
-        if request.provider == "claude":
-            logger.info(f"Processando com Claude: {request.file_name}")
-            document_data = await claude_service.extract_document(
-                api_key=request.api_key,
-                file_content=request.file_content,
-                file_type=request.file_type
+        try:
+            metadata = ExtractionMetadata(
+                provider=upload.fields.get("provider"),
+                api_key=upload.fields.get("api_key"),
+                secondary_api_key=upload.fields.get("secondary_api_key") or None,
+                file_type=upload.fields.get("file_type") or uploaded.content_type,
+                file_name=uploaded.file_name,
+                document_type=upload.fields.get("document_type") or None
             )
-        else:  # gemini
-            logger.info(f"Processando com Gemini: {request.file_name}")
-            document_data = await gemini_service.extract_document(
-                api_key=request.api_key,
-                file_content=request.file_content,
-                file_type=request.file_type
-            )
-        
-        # Calcular tempo de processamento
-        processing_time = time.time() - start_time
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
         
-        # Retornar resposta de sucesso
-        return ExtractionResponse(
-            success=True,
-            data=document_data,
-            provider=request.provider,
-            processing_time=round(processing_time, 2)
-        )
-        
-    except ValueError as e:
-        # Erros de validação ou API
-        logger.error(f"Erro de validação: {str(e)}")
-        return ExtractionResponse(
-            success=False,
-            error=str(e),
-            provider=request.provider,
-            processing_time=round(time.time() - start_time, 2)
-        )
+        validate_file_type(metadata.file_type)
+        await check_api_key_rate(metadata.api_key)
+        metrics.observe_validation(metadata.provider, metadata.file_type)
         
-    except HTTPException:
-        # Re-lançar exceções HTTP
+        # Única codificação base64, fora do event loop
+        document = DocumentContent(uploaded.read(), sha256=uploaded.sha256)
+        await asyncio.to_thread(lambda: document.b64)
+    finally:
+        upload.close()
+    
+    result = await extraction_pipeline.run(
+        provider=metadata.provider,
+        api_key=metadata.api_key,
+        document=document,
+        file_type=metadata.file_type,
+        file_name=metadata.file_name,
+        secondary_api_key=metadata.secondary_api_key,
+        document_type=metadata.document_type
+    )
+    return extraction_json(result, metadata.file_type)
+
+
+@router.post("/batch")
+async def extract_batch(request: Request) -> StreamingResponse:
+    """
+    Extração de vários documentos num único upload multipart/form-data.
+    
+    POST /api/extract/batch
+    
+    Recebe (form-data):
+    - provider: provedor registrado (claude, gemini...), auto ou adaptive
+    - api_key: chave da API
+    - files: um ou mais arquivos (até batch_max_files)
+    - document_type: opcional, vale para todos os arquivos
+    
+    Retorna NDJSON em streaming: uma linha {"type": "result", ...} por
+    documento, na ordem em que terminam, e uma linha final {"type": "summary"}
+    com tempos do lote e contagem de falhas.
+    """
+    upload = await receive_multipart(
+        request,
+        settings.max_file_size_bytes,
+        max_files=settings.batch_max_files
+    )
+    try:
+        if not upload.files:
+            raise HTTPException(status_code=400, detail="Nenhum arquivo enviado")
+        try:
+            metadata = ExtractionMetadata(
+                provider=upload.fields.get("provider"),
+                api_key=upload.fields.get("api_key"),
+                secondary_api_key=upload.fields.get("secondary_api_key") or None,
+                file_type=upload.files[0].content_type,
+                file_name=upload.files[0].file_name,
+                document_type=upload.fields.get("document_type") or None
+            )
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        await check_api_key_rate(metadata.api_key, len(upload.files))
+        metrics.observe_validation(metadata.provider, metadata.file_type)
+    except Exception:
+        upload.close()
         raise
+    
+    logger.info(f"Lote com {len(upload.files)} arquivo(s) para {metadata.provider}")
+    return StreamingResponse(
+        stream_batch(upload, metadata),
+        media_type="application/x-ndjson"
+    )
+
+
+async def stream_batch(upload: MultipartUpload, metadata: ExtractionMetadata) -> AsyncIterator[bytes]:
+    """
+    Distribui os arquivos pelo pipeline (limitado pelo semáforo do provedor)
+    e emite cada resultado assim que fica pronto. Cada documento ocupa uma
+    vaga do controle de admissão, como uma requisição avulsa.
+    """
+    start_time = time.time()
+    provider = metadata.provider
+    limit = extraction_pipeline.limits[metadata.primary_provider]
+    
+    async def process(index: int, uploaded: UploadedFile):
+        async with limit:
+            if uploaded.content_type not in settings.allowed_file_types:
+                response = ExtractionResponse(
+                    success=False,
+                    error=f"Tipo de arquivo não suportado: {uploaded.content_type}",
+                    provider=provider,
+                    processing_time=0.0
+                )
+            else:
+                try:
+                    await extraction_admission.acquire()
+                except AdmissionRejected as e:
+                    logger.warning(f"Documento do lote recusado pelo controle de admissão: {e.detail}")
+                    return index, uploaded, ExtractionResponse(
+                        success=False,
+                        error=e.detail,
+                        provider=provider,
+                        processing_time=0.0
+                    )
+                try:
+                    document = DocumentContent(uploaded.read(), sha256=uploaded.sha256)
+                    response = await extraction_pipeline.run(
+                        provider=provider,
+                        api_key=metadata.api_key,
+                        document=document,
+                        file_type=uploaded.content_type,
+                        file_name=uploaded.file_name,
+                        secondary_api_key=metadata.secondary_api_key,
+                        document_type=metadata.document_type
+                    )
+                finally:
+                    extraction_admission.release()
+        return index, uploaded, response
+    
+    tasks = [
+        asyncio.ensure_future(process(index, uploaded))
+        for index, uploaded in enumerate(upload.files)
+    ]
+    succeeded = 0
+    first_result_time = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, uploaded, response = await next_done
+            if response.success:
+                succeeded += 1
+            if first_result_time is None:
+                first_result_time = time.time() - start_time
+            yield orjson.dumps({
+                "type": "result",
+                "index": index,
+                "file_name": uploaded.file_name,
+                "result": response.model_dump(mode="json"),
+            }) + b"\n"
         
-    except Exception as e:
-        # Erros inesperados
-        logger.error(f"Erro inesperado: {str(e)}", exc_info=True)
-        return ExtractionResponse(
-            success=False,
-            error="Erro interno no servidor",
-            provider=request.provider,
-            processing_time=round(time.time() - start_time, 2)
-        )
+        yield orjson.dumps({
+            "type": "summary",
+            "total": len(tasks),
+            "succeeded": succeeded,
+            "failed": len(tasks) - succeeded,
+            "first_result_time": round(first_result_time or 0.0, 2),
+            "processing_time": round(time.time() - start_time, 2),
+        }) + b"\n"
+    finally:
+        # Cliente desconectado: cancelar o que ainda não terminou
+        for task in tasks:
+            task.cancel()
+        upload.close()
 
 
 @router.get("/test")
@@ -127,6 +362,6 @@ async def test_endpoint():
     """
     return {
         "message": "API de extração funcionando!",
-        "providers": ["claude", "gemini"],
+        "providers": [*provider_registry.names(), *ROUTING_MODES],
         "max_file_size_mb": settings.max_file_size_mb
     }
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Router para o modo assíncrono (jobs) de extração.
+O envio retorna um ID imediatamente e o resultado é consultado por polling.
+"""
+
+from fastapi import APIRouter, HTTPException
+import logging
+from ..models import ExtractionRequest, JobStatusResponse
+from ..services.job_queue import job_queue, Job, QueueFullError
+from ..services.metrics import metrics
+from ..config import get_settings
+from .extractor import validate_file_type, validate_file_size, check_api_key_rate
+
+router = APIRouter(
+    prefix="/api/jobs",
+    tags=["jobs"]
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def job_status(job: Job) -> JobStatusResponse:
+    """
+    Converte o job interno na resposta pública (sem arquivo nem chave).
+    """
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        provider=job.provider,
+        file_name=job.file_name,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        wait_time=round(job.started_at - job.created_at, 3) if job.started_at else None,
+        result=job.result
+    )
+
+
+@router.post("/", response_model=JobStatusResponse, status_code=202)
+async def submit_job(request: ExtractionRequest) -> JobStatusResponse:
+    """
+    Enfileira uma extração.
+    
+    POST /api/jobs/
+    
+    Recebe o mesmo corpo de /api/extract/ e retorna o job_id
+    para consulta em GET /api/jobs/{job_id}.
+    """
+    validate_file_size(request.document.size)
+    validate_file_type(request.file_type)
+    await check_api_key_rate(request.api_key)
+    metrics.observe_validation(request.provider, request.file_type)
+    
+    try:
+        job = await job_queue.submit(
+            provider=request.provider,
+            api_key=request.api_key,
+            document=request.document,
+            file_type=request.file_type,
+            file_name=request.file_name,
+            secondary_api_key=request.secondary_api_key,
+            document_type=request.document_type
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Fila de extração cheia, tente novamente")
+    
+    logger.info(f"Job {job.id} enfileirado: {request.file_name}")
+    return job_status(job)
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str) -> JobStatusResponse:
+    """
+    Consulta o estado e, quando concluído, o resultado do job.
+    
+    GET /api/jobs/{job_id}
+    """
+    job = await job_queue.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job_status(job)
@@ -0,0 +1,55 @@
+"""
+Router de inspeção do roteamento adaptativo (provider="adaptive"):
+estimativas de latência/erro por provedor e as decisões recentes.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, Optional
+from ..services.adaptive_router import adaptive_router
+from ..services.provider_registry import provider_registry
+from ..config import get_settings
+
+router = APIRouter(
+    prefix="/api/routing",
+    tags=["routing"]
+)
+
+settings = get_settings()
+
+
+@router.get("")
+async def routing_stats(recent: int = Query(20, ge=0, le=1000)) -> Dict[str, Any]:
+    """
+    Estado do roteador.
+
+    GET /api/routing?recent=20
+
+    Retorna a configuração, a contagem de decisões por provedor e por
+    motivo, as estimativas por provedor/modelo em cada recorte (all, tipo
+    de arquivo, tipo/faixa de tamanho: amostras, EWMA, p95, taxa de erro e
+    latência esperada) e as últimas decisões com os candidatos avaliados.
+    """
+    return adaptive_router.stats(recent)
+
+
+@router.get("/preview")
+async def routing_preview(
+    file_type: str = Query("image/jpeg", description="Tipo MIME do arquivo"),
+    size_kb: int = Query(500, ge=0, description="Tamanho do arquivo em KB"),
+    providers: Optional[str] = Query(None, description="Candidatos separados por vírgula (padrão: todos)")
+) -> Dict[str, Any]:
+    """
+    Decisão que o roteador tomaria agora, sem registrá-la nem explorar.
+
+    GET /api/routing/preview?file_type=application/pdf&size_kb=1200&providers=claude,gemini
+    """
+    if file_type not in settings.allowed_file_types:
+        raise HTTPException(status_code=400, detail=f"Tipo de arquivo não suportado: {file_type}")
+    names = [p.strip() for p in providers.split(",") if p.strip()] if providers else provider_registry.names()
+    unknown = [name for name in names if name not in provider_registry]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provedores desconhecidos: {', '.join(unknown) or '(nenhum)'}"
+        )
+    return adaptive_router.choose(names, file_type, size_kb * 1024, record=False)
@@ -0,0 +1,71 @@
+"""
+Router para validação/normalização de dados já extraídos (sem provedor).
+Usado em backfills: valida lotes grandes de registros de uma vez.
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from typing import Dict
+import logging
+import time
+import orjson
+from ..models import ValidationBatchRequest
+from ..services.validation import document_validator, INVALID
+from ..config import get_settings
+
+router = APIRouter(
+    prefix="/api/validate",
+    tags=["validation"]
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@router.post("/batch")
+async def validate_batch(request: ValidationBatchRequest) -> Response:
+    """
+    Valida e normaliza um lote de registros.
+
+    POST /api/validate/batch
+
+    Recebe:
+    - records: lista de objetos com os campos do DocumentData (outras
+      chaves, como IDs do backfill, são devolvidas sem alteração)
+    - normalize: devolver os campos na forma canônica (padrão: true)
+
+    Retorna, na ordem recebida, {"index", "valid", "data", "fields"} por
+    registro, com o estado de cada campo verificado, e um resumo com a
+    contagem de registros e de campos inválidos.
+    """
+    if len(request.records) > settings.validation_batch_max_records:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote muito grande. Máximo: {settings.validation_batch_max_records} registros"
+        )
+    start_time = time.perf_counter()
+    results = await document_validator.validate_batch(request.records, request.normalize)
+
+    invalid_fields: Dict[str, int] = {}
+    invalid = 0
+    for index, result in enumerate(results):
+        result["index"] = index
+        if not result["valid"]:
+            invalid += 1
+            for name, field in result["fields"].items():
+                if field["status"] == INVALID:
+                    invalid_fields[name] = invalid_fields.get(name, 0) + 1
+    processing_time = time.perf_counter() - start_time
+    logger.info(f"Lote de {len(results)} registro(s) validado em {processing_time:.3f}s ({invalid} inválido(s))")
+
+    return Response(
+        content=orjson.dumps({
+            "total": len(results),
+            "valid": len(results) - invalid,
+            "invalid": invalid,
+            "invalid_fields": invalid_fields,
+            "processing_time": round(processing_time, 3),
+            "results": results,
+        }),
+        media_type="application/json"
+    )
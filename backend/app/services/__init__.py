@@ -3,7 +3,17 @@ Marca o diretório services como pacote Python.
 """
 
 # Imports convenientes
+from .provider_base import ExtractionProvider
 from .claude_service import ClaudeService
 from .gemini_service import GeminiService
+from .openai_service import OpenAICompatibleService
+from .provider_registry import ProviderRegistry, provider_registry
 
-__all__ = ["ClaudeService", "GeminiService"]
\ No newline at end of file
+__all__ = [
+    "ExtractionProvider",
+    "ClaudeService",
+    "GeminiService",
+    "OpenAICompatibleService",
+    "ProviderRegistry",
+    "provider_registry",
+]
@@ -0,0 +1,275 @@
+"""
+Roteamento adaptativo entre provedores (provider="adaptive").
+Mantém estimativas vivas de latência (EWMA e p95) e de taxa de erro por
+provedor/modelo, tipo de arquivo (PDF ou imagem) e faixa de tamanho, e
+escolhe por requisição o provedor de menor latência esperada dentro do
+orçamento de custo. As decisões recentes ficam disponíveis para inspeção.
+"""
+
+import random
+import time
+import logging
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
+from ..config import get_settings
+from .provider_registry import provider_registry
+from .resilience import resilience
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Faixas de tamanho do arquivo (limite superior em bytes)
+SIZE_CLASSES = ((512 * 1024, "small"), (2 * 1024 * 1024, "medium"))
+LARGE = "large"
+
+# Motivos de decisão
+LOWEST_LATENCY = "lowest_latency"
+UNEXPLORED = "unexplored"
+EXPLORATION = "exploration"
+OVER_BUDGET = "over_budget"
+CIRCUIT_OPEN = "circuit_open"
+
+
+def file_kind(file_type: str) -> str:
+    return "pdf" if file_type == "application/pdf" else "image"
+
+
+def size_class(size: int) -> str:
+    for limit, name in SIZE_CLASSES:
+        if size <= limit:
+            return name
+    return LARGE
+
+
+class RouteEstimate:
+    """
+    Estimativa de um provedor num recorte do tráfego: EWMA da latência das
+    chamadas bem-sucedidas, janela para o p95 e EWMA da taxa de erro.
+    """
+
+    __slots__ = ("ewma", "error_rate", "samples", "latencies")
+
+    def __init__(self, window: int):
+        self.ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float, success: bool, alpha: float) -> None:
+        self.samples += 1
+        self.error_rate += alpha * ((0.0 if success else 1.0) - self.error_rate)
+        if success:
+            self.ewma = seconds if self.ewma is None else self.ewma + alpha * (seconds - self.ewma)
+            self.latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def expected(self, p95_weight: float, failure_latency: Optional[float] = None) -> Optional[float]:
+        """
+        Latência esperada: EWMA combinada com o p95 (cauda), dividida pela
+        taxa de sucesso (número esperado de tentativas). Sem nenhuma chamada
+        bem-sucedida vale failure_latency (o timeout do provedor) dividido
+        pela taxa de sucesso, ou None se não for informado.
+        """
+        if self.ewma is None:
+            if failure_latency is None or not self.samples:
+                return None
+            latency = failure_latency
+        else:
+            latency = (1 - p95_weight) * self.ewma + p95_weight * self.p95()
+        return latency / (1 - min(self.error_rate, 0.9))
+
+    def stats(self, p95_weight: float) -> Dict[str, Any]:
+        p95 = self.p95()
+        expected = self.expected(p95_weight)
+        return {
+            "samples": self.samples,
+            "ewma": round(self.ewma, 3) if self.ewma is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "expected": round(expected, 3) if expected is not None else None,
+        }
+
+
+class AdaptiveRouter:
+    """
+    Estimativas por (provedor/modelo, recorte) e escolha do provedor primário.
+    Os recortes vão do mais específico (tipo + tamanho) ao geral; vale o
+    mais específico com amostras suficientes.
+    """
+
+    def __init__(
+        self,
+        alpha: float,
+        window: int,
+        p95_weight: float,
+        min_samples: int,
+        max_cost: float,
+        explore_ratio: float,
+        decision_log: int
+    ):
+        self.alpha = alpha
+        self.window = window
+        self.p95_weight = p95_weight
+        self.min_samples = min_samples
+        self.max_cost = max_cost
+        self.explore_ratio = explore_ratio
+        self.random = random.Random()
+        self._estimates: Dict[Tuple[str, str], RouteEstimate] = {}
+        self.decisions: Dict[str, int] = {}
+        self.reasons: Dict[str, int] = {}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=decision_log)
+
+    @staticmethod
+    def route(provider: str) -> str:
+        """Provedor/modelo (uma troca de modelo recomeça as estimativas)."""
+        return f"{provider}/{provider_registry.get(provider).MODEL}"
+
+    @staticmethod
+    def scopes(file_type: str, size: int) -> Tuple[str, ...]:
+        """Recortes do mais específico ao geral."""
+        kind = file_kind(file_type)
+        return f"{kind}/{size_class(size)}", kind, "all"
+
+    def record(self, provider: str, file_type: str, size: int, seconds: float, success: bool) -> None:
+        """
+        Registra uma chamada ao provedor em todos os recortes a que pertence.
+        """
+        route = self.route(provider)
+        for scope in self.scopes(file_type, size):
+            estimate = self._estimates.get((route, scope))
+            if estimate is None:
+                estimate = self._estimates[(route, scope)] = RouteEstimate(self.window)
+            estimate.record(seconds, success, self.alpha)
+
+    def estimate(self, provider: str, file_type: str, size: int) -> Tuple[Optional[float], Optional[str]]:
+        """
+        Latência esperada e recorte usado (None, None sem amostras suficientes,
+        ou seja, provedor inexplorado). Um provedor só com falhas recebe o
+        timeout dividido pela taxa de sucesso e fica atrás dos que respondem.
+        """
+        route = self.route(provider)
+        timeout = provider_registry.get(provider).timeout
+        for scope in self.scopes(file_type, size):
+            estimate = self._estimates.get((route, scope))
+            if estimate is not None and estimate.samples >= self.min_samples:
+                return estimate.expected(self.p95_weight, timeout), scope
+        return None, None
+
+    @staticmethod
+    def circuit_open(provider: str) -> bool:
+        """Circuito aberto e ainda dentro do tempo de espera."""
+        breaker = resilience.breaker(provider)
+        return breaker.state == "open" and time.monotonic() - breaker.opened_at < breaker.open_seconds
+
+    def choose(
+        self,
+        providers: List[str],
+        file_type: str,
+        size: int,
+        record: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Ordena os provedores candidatos para a requisição.
+
+        Fora do orçamento de custo ou com o circuito aberto, o provedor só é
+        usado se nenhum outro servir. Entre os elegíveis, os ainda sem
+        amostras vêm primeiro (exploração inicial); depois, o de menor
+        latência esperada, salvo numa fração explore_ratio das decisões,
+        que consulta outro para manter as estimativas atualizadas.
+
+        Returns:
+            {"order": [...], "provider": escolhido, "reason": motivo, "candidates": {...}}
+        """
+        candidates: Dict[str, Dict[str, Any]] = {}
+        for provider in providers:
+            service = provider_registry.get(provider)
+            expected, scope = self.estimate(provider, file_type, size)
+            candidates[provider] = {
+                "expected": round(expected, 3) if expected is not None else None,
+                "scope": scope,
+                "cost_per_call": service.cost_per_call,
+                "over_budget": service.cost_per_call > self.max_cost,
+                "circuit_open": self.circuit_open(provider),
+            }
+
+        def rank(provider: str) -> Tuple[int, float]:
+            info = candidates[provider]
+            # Indisponíveis por último; depois, inexplorados antes dos conhecidos
+            penalty = 2 if info["circuit_open"] else 1 if info["over_budget"] else 0
+            expected = info["expected"]
+            return penalty, -1.0 if expected is None else expected
+
+        order = sorted(providers, key=rank)
+        best = candidates[order[0]]
+        if best["circuit_open"]:
+            reason = CIRCUIT_OPEN
+        elif best["over_budget"]:
+            reason = OVER_BUDGET
+        elif best["expected"] is None:
+            reason = UNEXPLORED
+        else:
+            reason = LOWEST_LATENCY
+            eligible = [
+                p for p in order[1:]
+                if not candidates[p]["circuit_open"] and not candidates[p]["over_budget"]
+            ]
+            if eligible and record and self.random.random() < self.explore_ratio:
+                explored = self.random.choice(eligible)
+                order.remove(explored)
+                order.insert(0, explored)
+                reason = EXPLORATION
+
+        decision = {
+            "order": order,
+            "provider": order[0],
+            "reason": reason,
+            "candidates": candidates,
+        }
+        if record:
+            self.decisions[order[0]] = self.decisions.get(order[0], 0) + 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            self.recent.append({
+                "timestamp": round(time.time(), 3),
+                "file_kind": file_kind(file_type),
+                "size_class": size_class(size),
+                "size": size,
+                **decision,
+            })
+            logger.info(f"Roteamento: {order[0]} ({reason}) para {file_kind(file_type)}/{size_class(size)}")
+        return decision
+
+    def stats(self, recent: int = 20) -> Dict[str, Any]:
+        estimates: Dict[str, Dict[str, Any]] = {}
+        for (route, scope), estimate in sorted(self._estimates.items()):
+            estimates.setdefault(route, {})[scope] = estimate.stats(self.p95_weight)
+        return {
+            "config": {
+                "ewma_alpha": self.alpha,
+                "window": self.window,
+                "p95_weight": self.p95_weight,
+                "min_samples": self.min_samples,
+                "max_cost_per_request": self.max_cost,
+                "explore_ratio": self.explore_ratio,
+            },
+            "decisions": self.decisions,
+            "reasons": self.reasons,
+            "estimates": estimates,
+            "recent": list(self.recent)[-recent:] if recent > 0 else [],
+        }
+
+
+# Instância única compartilhada pela aplicação
+adaptive_router = AdaptiveRouter(
+    alpha=settings.routing_ewma_alpha,
+    window=settings.routing_window,
+    p95_weight=settings.routing_p95_weight,
+    min_samples=settings.routing_min_samples,
+    max_cost=settings.routing_max_cost_per_request,
+    explore_ratio=settings.routing_explore_ratio,
+    decision_log=settings.routing_decision_log
+)
@@ -0,0 +1,422 @@
+"""
+Controle de admissão das extrações.
+Limita a taxa por cliente e por chave de API (token bucket) e o número de
+extrações simultâneas, com uma fila de espera limitada que rejeita rápido
+(429/503) quando está cheia. O middleware atua antes da leitura do corpo.
+
+Com vários processos (gunicorn), os baldes podem ficar num SQLite
+compartilhado (rate_limit_db_path) para que o limite valha para o serviço
+inteiro; o limite de concorrência continua por processo, já que protege o
+event loop de cada um.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, Optional
+import orjson
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class AdmissionRejected(Exception):
+    """
+    Requisição recusada pelo controle de admissão.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        if self.retry_after is None:
+            return {}
+        return {"Retry-After": str(max(1, int(self.retry_after + 0.999)))}
+
+
+class TokenBucket:
+    """
+    Balde de fichas: `rate` fichas por segundo, até `capacity` acumuladas.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self, tokens: float = 1.0) -> Optional[float]:
+        """
+        Consome fichas; retorna None se permitido ou os segundos até haver saldo.
+        Pedidos maiores que a capacidade consomem o balde inteiro.
+        """
+        tokens = min(tokens, self.capacity)
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return None
+        return (tokens - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket por chave (cliente ou chave de API), com limite de chaves
+    em memória (as menos recentes são descartadas).
+    """
+
+    def __init__(self, per_minute: int, burst: int, max_keys: int):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    async def check(self, key: str, tokens: float = 1.0) -> Optional[float]:
+        """
+        Retorna None se permitido ou o Retry-After (segundos) se limitado.
+        """
+        if not self.enabled:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(
+                self.per_minute / 60.0, max(self.burst, 1)
+            )
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        retry_after = bucket.take(tokens)
+        if retry_after is None:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "per_minute": self.per_minute,
+            "burst": self.burst,
+            "tracked_keys": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket por chave gravado em SQLite, compartilhado pelos processos
+    que apontam para o mesmo arquivo. Cada verificação é uma transação
+    curta (BEGIN IMMEDIATE) executada fora do event loop.
+    """
+
+    # Verificações entre limpezas dos baldes já cheios de novo
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, name: str, per_minute: int, burst: int, max_keys: int):
+        super().__init__(per_minute, burst, max_keys)
+        self.path = path
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " name TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (name, key))"
+        )
+        self._checks = 0
+
+    async def check(self, key: str, tokens: float = 1.0) -> Optional[float]:
+        if not self.enabled:
+            return None
+        try:
+            retry_after = await asyncio.to_thread(self._take, key, tokens)
+        except sqlite3.Error as e:
+            # Banco indisponível não derruba as extrações: libera a requisição
+            logger.warning(f"Falha no limite de taxa compartilhado ({self.path}): {e}")
+            return None
+        if retry_after is None:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return retry_after
+
+    def _take(self, key: str, tokens: float) -> Optional[float]:
+        rate = self.per_minute / 60.0
+        capacity = max(self.burst, 1)
+        tokens = min(tokens, capacity)
+        with self._lock:
+            self._checks += 1
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE name = ? AND key = ?",
+                    (self.name, key)
+                ).fetchone()
+                available = capacity
+                if row is not None:
+                    available = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                retry_after = None
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    retry_after = (tokens - available) / rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (name, key, tokens, updated_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (self.name, key, available, now)
+                )
+                if self._checks % self.PRUNE_EVERY == 0:
+                    # Baldes que já teriam enchido equivalem a não ter registro
+                    conn.execute(
+                        "DELETE FROM rate_buckets WHERE name = ? AND updated_at < ?",
+                        (self.name, now - capacity / rate)
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["tracked_keys"] = self._conn.execute(
+                "SELECT COUNT(*) FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()[0]
+        stats["shared"] = self.path
+        return stats
+
+
+class ConcurrencyLimiter:
+    """
+    Limite global de extrações em andamento com fila de espera FIFO limitada.
+    Quem espera mais que `queue_timeout` é recusado (protege a latência
+    das requisições admitidas em vez de acumular timeouts).
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._wait_times: Deque[float] = deque(maxlen=500)
+
+    async def acquire(self, bounded: bool = True) -> None:
+        """
+        Obtém uma vaga, aguardando na fila se necessário.
+
+        Args:
+            bounded: False para quem já tem a própria fila limitada (workers
+                de jobs): espera a vez sem limite de fila nem de tempo
+
+        Raises:
+            AdmissionRejected: fila cheia ou espera acima do limite (503)
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if bounded and len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise AdmissionRejected(
+                503, "Servidor sobrecarregado, tente novamente", retry_after=self.queue_timeout
+            )
+
+        self.queued += 1
+        start_time = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout if bounded else None)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise AdmissionRejected(
+                503, "Tempo de espera na fila esgotado, tente novamente", retry_after=self.queue_timeout
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga foi repassada no mesmo instante: devolvê-la
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._wait_times.append(time.monotonic() - start_time)
+        self.admitted += 1
+
+    def release(self) -> None:
+        """
+        Libera a vaga, repassando-a diretamente ao próximo da fila.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "max_queue": self.max_queue,
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3)
+            if waits else 0.0,
+        }
+
+
+def api_key_id(api_key: str) -> str:
+    """
+    Identificador da chave de API para o limitador (não guarda a chave em si).
+    """
+    return hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI: aplica o limite por cliente e a vaga de concorrência
+    às rotas de extração antes que o corpo da requisição seja lido.
+    A vaga fica ocupada até o fim da resposta (inclusive em streaming).
+
+    Nas rotas de per_document_paths (lote) a própria rota ocupa uma vaga
+    por documento; o middleware só aplica o limite por cliente, senão a
+    vaga da requisição somaria às dos documentos (e poderia travá-las).
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str],
+        per_document_paths: Iterable[str] = (),
+        trust_forwarded_for: bool = False
+    ):
+        self.app = app
+        self.paths = tuple(paths)
+        self.per_document_paths = tuple(per_document_paths)
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = self._client_id(scope)
+        retry_after = await client_rate_limiter.check(client)
+        if retry_after is not None:
+            logger.warning(f"Limite de requisições excedido para o cliente {client}")
+            await self._reject(
+                AdmissionRejected(429, "Limite de requisições excedido", retry_after), send
+            )
+            return
+
+        if scope["path"].startswith(self.per_document_paths):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await extraction_admission.acquire()
+        except AdmissionRejected as e:
+            logger.warning(f"Requisição recusada pelo controle de admissão: {e.detail}")
+            await self._reject(e, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            extraction_admission.release()
+
+    def _client_id(self, scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _reject(error: AdmissionRejected, send) -> None:
+        body = orjson.dumps({"detail": error.detail})
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        headers.extend(
+            (name.lower().encode(), value.encode()) for name, value in error.headers().items()
+        )
+        await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {
+        "concurrency": extraction_admission.stats(),
+        "client_rate_limit": client_rate_limiter.stats(),
+        "api_key_rate_limit": api_key_rate_limiter.stats(),
+    }
+
+
+def create_rate_limiter(name: str, per_minute: int) -> RateLimiter:
+    """
+    Limitador em memória ou, com rate_limit_db_path, compartilhado em SQLite.
+    """
+    if settings.rate_limit_db_path and per_minute > 0:
+        return SharedRateLimiter(
+            settings.rate_limit_db_path, name, per_minute,
+            settings.rate_limit_burst, settings.rate_limit_max_keys
+        )
+    return RateLimiter(
+        per_minute=per_minute,
+        burst=settings.rate_limit_burst,
+        max_keys=settings.rate_limit_max_keys
+    )
+
+
+# Instâncias únicas compartilhadas pela aplicação
+client_rate_limiter = create_rate_limiter("client", settings.rate_limit)
+api_key_rate_limiter = create_rate_limiter("api_key", settings.rate_limit_per_api_key)
+extraction_admission = ConcurrencyLimiter(
+    max_in_flight=settings.admission_max_in_flight,
+    max_queue=settings.admission_max_queue,
+    queue_timeout=settings.admission_queue_timeout
+)
@@ -0,0 +1,254 @@
+"""
+Cache de resultados de extração endereçado por conteúdo.
+Evita repetir a chamada ao provedor quando o mesmo arquivo é reenviado.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from ..models import DocumentData
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@lru_cache(maxsize=32)
+def prompt_fingerprint(prompt: str) -> str:
+    """
+    Hash curto do prompt, para invalidar o cache quando o prompt muda.
+    """
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    Camada em disco (SQLite) do cache de extrações.
+    Acessada via threads para não bloquear o event loop. Com vários processos
+    apontando para o mesmo arquivo, é o nível compartilhado entre eles (o LRU
+    em memória continua por processo); escritas concorrentes esperam o lock
+    do SQLite até o timeout.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            " key TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_accessed ON extraction_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Retorna (expires_at, json) da entrada, removendo-a se expirada.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, data FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE extraction_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key: str, data: str, expires_at: float) -> None:
+        """
+        Grava a entrada e aplica a evicção por tamanho (menos acessadas primeiro).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, data, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, data, expires_at, now)
+            )
+            self._conn.execute("DELETE FROM extraction_cache WHERE expires_at <= ?", (now,))
+            count = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM extraction_cache WHERE key IN ("
+                    " SELECT key FROM extraction_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM extraction_cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ExtractionCache:
+    """
+    Cache em dois níveis: LRU em memória e, opcionalmente, SQLite em disco.
+    A chave combina o hash do arquivo decodificado, provedor, modelo e prompt.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        disk_path: str = "",
+        disk_max_entries: int = 10000,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, DocumentData]]" = OrderedDict()
+        self._disk: Optional[DiskCache] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def build_key(file_hash: str, provider: str, model: str, prompt: str) -> str:
+        """
+        Monta a chave do cache a partir do hash do conteúdo e da configuração da extração.
+        """
+        return f"{file_hash}:{provider}:{model}:{prompt_fingerprint(prompt)}"
+
+    def _get_disk(self) -> Optional[DiskCache]:
+        """
+        Abre a camada em disco sob demanda (se configurada).
+        """
+        if self._disk is None and self.disk_path:
+            self._disk = DiskCache(self.disk_path, self.disk_max_entries)
+            logger.info(f"Cache em disco aberto em {self.disk_path}")
+        return self._disk
+
+    def _remember(self, key: str, expires_at: float, document: DocumentData) -> None:
+        """
+        Insere na camada em memória respeitando o limite de entradas.
+        """
+        self._memory[key] = (expires_at, document)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str, count: bool = True) -> Optional[DocumentData]:
+        """
+        Busca o resultado na memória e depois no disco.
+        Com count=False (consultas especulativas) os contadores não mudam.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, document = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.hits += count
+                return document
+            del self._memory[key]
+
+        disk = self._get_disk()
+        if disk is not None:
+            row = await asyncio.to_thread(disk.get, key)
+            if row is not None:
+                expires_at, data = row
+                document = DocumentData.model_validate_json(data)
+                self._remember(key, expires_at, document)
+                self.hits += count
+                self.disk_hits += count
+                return document
+
+        self.misses += count
+        return None
+
+    async def set(self, key: str, document: DocumentData) -> None:
+        """
+        Armazena o resultado validado nas duas camadas.
+        """
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, document)
+
+        disk = self._get_disk()
+        if disk is not None:
+            await asyncio.to_thread(disk.set, key, document.model_dump_json(), expires_at)
+
+    def clear(self) -> None:
+        """
+        Remove todas as entradas (memória e disco).
+        """
+        self._memory.clear()
+        disk = self._get_disk()
+        if disk is not None:
+            disk.clear()
+
+    def close(self) -> None:
+        """
+        Fecha a conexão com a camada em disco.
+        """
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de acertos/falhas e ocupação.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_path": self.disk_path or None,
+            "disk_entries": self._disk.count() if self._disk is not None else None,
+        }
+
+
+# Instância única compartilhada pela aplicação
+extraction_cache = ExtractionCache(
+    max_entries=settings.cache_max_entries,
+    ttl_seconds=settings.cache_ttl_seconds,
+    disk_path=settings.cache_disk_path,
+    disk_max_entries=settings.cache_disk_max_entries,
+    enabled=settings.cache_enabled
+)
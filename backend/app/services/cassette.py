@@ -0,0 +1,337 @@
+"""
+Gravação e reprodução (record/replay) do tráfego com os provedores.
+
+No modo "record" as chamadas reais passam por um transporte httpx que grava
+cada par requisição/resposta (com os tempos até os headers e de cada pedaço
+do corpo) em {cassette_dir}/{provedor}.jsonl, sem as chaves de API e apenas
+com o hash SHA-256 do corpo enviado. No modo "replay" nenhuma conexão é
+aberta: as respostas gravadas são devolvidas pelo mesmo caminho
+(extract_document / stream_document), no tempo gravado ou o mais rápido
+possível (cassette_replay_speed = 0).
+
+A correspondência é pelo hash do corpo (mesmo documento, prompt e modelo)
+ou, com cassette_match = "path", por qualquer gravação do mesmo endpoint,
+em rodízio (útil em testes de carga com arquivos sintéticos).
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+import orjson
+from ..config import get_settings
+from .resilience import ProviderError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REDACTED = "REDACTED"
+# Headers e parâmetros que carregam credenciais
+SECRET_HEADERS = {"x-api-key", "authorization", "x-goog-api-key"}
+SECRET_PARAMS = {"key"}
+# Headers de resposta que não fazem sentido na reprodução
+DROPPED_RESPONSE_HEADERS = {"set-cookie", "date", "connection", "keep-alive", "transfer-encoding"}
+# Marca do pedido em stream no JSON compacto (orjson) do payload do Claude
+STREAM_FLAG = b'"stream":true'
+# Espera pelo restante de um corpo abandonado pelo leitor antes de gravá-lo
+DRAIN_TIMEOUT = 0.5
+
+
+def redact_url(url: httpx.URL) -> str:
+    for param in SECRET_PARAMS:
+        if param in url.params:
+            url = url.copy_set_param(param, REDACTED)
+    return str(url)
+
+
+def redact_headers(headers: httpx.Headers) -> Dict[str, str]:
+    return {
+        name: REDACTED if name.lower() in SECRET_HEADERS else value
+        for name, value in headers.items()
+    }
+
+
+async def body_digest(request: httpx.Request) -> Tuple[str, int, bool]:
+    """
+    SHA-256, tamanho e se a resposta foi pedida em stream ("stream": true,
+    do Claude), lendo o corpo sem juntá-lo em memória (o corpo em partes
+    do payload pode ser iterado de novo no envio).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    streamed = False
+    async for chunk in request.stream:
+        digest.update(chunk)
+        size += len(chunk)
+        streamed = streamed or STREAM_FLAG in chunk
+    return digest.hexdigest(), size, streamed or request.url.path.endswith(":streamGenerateContent")
+
+
+class CassetteStore:
+    """
+    Gravações por provedor em arquivos JSONL (uma interação por linha).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_body: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {}
+        self._by_path: Dict[str, Dict[Tuple[str, bool], List[Dict[str, Any]]]] = {}
+        self._next: Dict[Any, int] = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    def path(self, provider: str) -> str:
+        return os.path.join(self.directory, f"{provider}.jsonl")
+
+    def load(self, provider: str) -> int:
+        """
+        Carrega as gravações do provedor (uma única vez); retorna quantas há.
+        """
+        if provider in self._by_body:
+            return sum(len(v) for v in self._by_body[provider].values())
+        by_body: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        by_path: Dict[Tuple[str, bool], List[Dict[str, Any]]] = {}
+        count = 0
+        if os.path.exists(self.path(provider)):
+            with open(self.path(provider), "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = orjson.loads(line)
+                    request = entry["request"]
+                    by_body.setdefault((request["path"], request["body_sha256"]), []).append(entry)
+                    by_path.setdefault((request["path"], request["stream"]), []).append(entry)
+                    count += 1
+        self._by_body[provider] = by_body
+        self._by_path[provider] = by_path
+        logger.info(f"{count} gravação(ões) de {provider} carregada(s) de {self.path(provider)}")
+        return count
+
+    def find(self, provider: str, path: str, body_sha256: str, stream: bool) -> Optional[Dict[str, Any]]:
+        """
+        Gravação correspondente à requisição (rodízio entre as repetidas).
+        """
+        self.load(provider)
+        if settings.cassette_match == "path":
+            key: Any = (provider, path, stream)
+            entries = self._by_path[provider].get((path, stream))
+        else:
+            key = (provider, path, body_sha256)
+            entries = self._by_body[provider].get((path, body_sha256))
+        if not entries:
+            self.misses += 1
+            return None
+        index = self._next.get(key, 0)
+        self._next[key] = index + 1
+        self.replayed += 1
+        return entries[index % len(entries)]
+
+    def append(self, provider: str, entry: Dict[str, Any]) -> None:
+        """
+        Acrescenta uma interação ao arquivo do provedor (chamado fora do event loop).
+        """
+        line = orjson.dumps(entry) + b"\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(provider), "ab") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.cassette_mode or None,
+            "directory": self.directory,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+
+class RecordingStream(httpx.AsyncByteStream):
+    """
+    Repassa o corpo da resposta ao cliente conforme chega, anotando o
+    instante de cada pedaço; grava a interação quando o corpo termina.
+    """
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_complete, start: float):
+        self.inner = inner
+        self.on_complete = on_complete
+        self.start = start
+        self.chunks: List[Tuple[float, bytes]] = []
+        self.complete = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.inner:
+            self.chunks.append((time.perf_counter() - self.start, chunk))
+            yield chunk
+        self.complete = True
+
+    async def _drain(self) -> None:
+        async for chunk in self.inner:
+            self.chunks.append((time.perf_counter() - self.start, chunk))
+        self.complete = True
+
+    async def aclose(self) -> None:
+        if not self.complete:
+            # Leitor parou antes do fim (ex.: Claude após message_stop): o resto
+            # costuma já ter chegado; corpo que não termina logo (cancelamento)
+            # não é gravado
+            try:
+                await asyncio.wait_for(self._drain(), DRAIN_TIMEOUT)
+            except (asyncio.TimeoutError, httpx.HTTPError):
+                pass
+        await self.inner.aclose()
+        if self.complete:
+            await self.on_complete(self.chunks)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que envia pela rede e grava a interação.
+    """
+
+    def __init__(self, provider: str, inner: httpx.AsyncBaseTransport, store: CassetteStore):
+        self.provider = provider
+        self.inner = inner
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body_sha256, body_bytes, stream = await body_digest(request)
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        ttfb = time.perf_counter() - start
+        recorded_request = {
+            "method": request.method,
+            "url": redact_url(request.url),
+            "path": request.url.path,
+            "headers": redact_headers(request.headers),
+            "body_sha256": body_sha256,
+            "body_bytes": body_bytes,
+            "stream": stream,
+        }
+        headers = [
+            [name, value] for name, value in response.headers.multi_items()
+            if name.lower() not in DROPPED_RESPONSE_HEADERS
+        ]
+
+        async def on_complete(chunks: List[Tuple[float, bytes]]) -> None:
+            binary = "content-encoding" in response.headers
+            if not binary:
+                try:
+                    encoded = [[round(offset, 4), chunk.decode("utf-8")] for offset, chunk in chunks]
+                except UnicodeDecodeError:
+                    binary = True
+            if binary:
+                encoded = [[round(offset, 4), base64.b64encode(chunk).decode("ascii")] for offset, chunk in chunks]
+            entry = {
+                "provider": self.provider,
+                "recorded_at": time.time(),
+                "request": recorded_request,
+                "response": {
+                    "status": response.status_code,
+                    "headers": headers,
+                    "encoding": "base64" if binary else "utf-8",
+                    "ttfb": round(ttfb, 4),
+                    "elapsed": round(chunks[-1][0] if chunks else ttfb, 4),
+                    "chunks": encoded,
+                },
+            }
+            await asyncio.to_thread(self.store.append, self.provider, entry)
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=RecordingStream(response.stream, on_complete, start),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class ReplayStream(httpx.AsyncByteStream):
+    """
+    Corpo gravado, entregue pedaço a pedaço no tempo original (escalado).
+    """
+
+    def __init__(self, chunks: List[Tuple[float, bytes]], start: float, speed: float):
+        self.chunks = chunks
+        self.start = start
+        self.speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for offset, chunk in self.chunks:
+            if self.speed > 0:
+                delay = self.start + offset * self.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield chunk
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte sem rede: responde com a gravação correspondente.
+    """
+
+    def __init__(self, provider: str, store: CassetteStore, speed: float):
+        self.provider = provider
+        self.store = store
+        self.speed = speed
+        store.load(provider)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        body_sha256, _, stream = await body_digest(request)
+        entry = self.store.find(self.provider, request.url.path, body_sha256, stream)
+        if entry is None:
+            raise ProviderError(
+                f"Nenhuma gravação para {self.provider} {request.url.path} (corpo {body_sha256[:12]})",
+                provider=self.provider
+            )
+        recorded = entry["response"]
+        if recorded["encoding"] == "base64":
+            chunks = [(offset, base64.b64decode(data)) for offset, data in recorded["chunks"]]
+        else:
+            chunks = [(offset, data.encode("utf-8")) for offset, data in recorded["chunks"]]
+
+        if self.speed > 0:
+            delay = start + recorded["ttfb"] * self.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        # Mantém as métricas de primeiro byte (extensão trace) também na reprodução
+        trace = request.extensions.get("trace")
+        if trace is not None:
+            await trace("http11.receive_response_headers.complete", {})
+
+        return httpx.Response(
+            status_code=recorded["status"],
+            headers=recorded["headers"],
+            stream=ReplayStream(chunks, start, self.speed),
+        )
+
+
+def wrap_transport(provider: str, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """
+    Aplica o modo configurado ao transporte do provedor.
+    """
+    mode = settings.cassette_mode
+    if mode == "record":
+        logger.info(f"Gravando o tráfego de {provider} em {cassette_store.path(provider)}")
+        return RecordingTransport(provider, transport, cassette_store)
+    if mode == "replay":
+        logger.info(f"Reproduzindo o tráfego gravado de {provider} (velocidade {settings.cassette_replay_speed})")
+        return ReplayTransport(provider, cassette_store, settings.cassette_replay_speed)
+    if mode:
+        logger.warning(f"cassette_mode desconhecido: {mode!r} (use record ou replay)")
+    return transport
+
+
+# Instância única compartilhada pela aplicação
+cassette_store = CassetteStore(settings.cassette_dir)
@@ -3,25 +3,36 @@ Serviço para integração com a API do Claude (Anthropic).
 Implementa a lógica específica para extração usando Claude.
 """
 
-import httpx
-import json
-from typing import Dict, Any, Optional
-import logging
+from typing import Dict, Any, Iterable, Optional, Tuple
 from ..models import DocumentData
 from ..config import get_settings
+from .payload import DOCUMENT_PLACEHOLDER
+from .provider_base import ExtractionProvider
+from .resilience import ProviderError
+from .structured_output import TOOL_NAME, claude_tool
+from .prompts import GENERIC_PROMPT
 
-logger = logging.getLogger(__name__)
 settings = get_settings()
 
-class ClaudeService:
+class ClaudeService(ExtractionProvider):
     
     """
     Classe que encapsula a comunicação com a API do Claude.
     Usa o padrão de classe para facilitar testes e manutenção.
     """  
     
-    BASE_URL = "https://api.anthropic.com/v1/messages"
+    NAME = "claude"
+    LABEL = "Claude"
     MODEL = "claude-3-5-sonnet-20241022"
+    KEY_PREFIX = "sk-ant-api"
+    BASE_URL = f"{settings.claude_base_url.rstrip('/')}/v1/messages"
+    
+    def __init__(self):
+        super().__init__(
+            max_concurrency=settings.claude_max_concurrency,
+            timeout=settings.claude_timeout,
+            cost_per_call=settings.claude_cost_per_call
+        )
     
     @staticmethod
     def get_extraction_prompt() -> str:
@@ -29,146 +40,119 @@ class ClaudeService:
         Retorna o prompt otimizado para extração de documentos.
         Separado em método para facilitar ajustes.
         """
-        return """Analise este documento de identificação brasileiro e extraia TODOS os dados disponíveis. 
-
-IMPORTANTE: 
-- Extraia TODOS os campos visíveis no documento
-- Use formatação brasileira para datas (DD/MM/AAAA)
-- Mantenha CPF e RG com a formatação original
-- Se um campo não existir no documento, use null
-
-Responda APENAS com JSON válido no seguinte formato:
+        return GENERIC_PROMPT
 
-{
-  "tipoDocumento": "tipo do documento (RG, CNH, CPF, etc)",
-  "nome": "nome completo",
-  "nomeDaMae": "nome da mãe",
-  "nomeDoPai": "nome do pai",
-  "cpf": "CPF com formatação (000.000.000-00)",
-  "rg": "RG com formatação",
-  "orgaoExpedidor": "órgão expedidor/UF",
-  "dataExpedicao": "DD/MM/AAAA",
-  "dataVencimento": "DD/MM/AAAA", 
-  "dataNascimento": "DD/MM/AAAA",
-  "naturalidade": "cidade de nascimento",
-  "uf": "estado (sigla)",
-  "nacionalidade": "nacionalidade",
-  "estadoCivil": "estado civil",
-  "endereco": "endereço completo",
-  "cep": "CEP com formatação (00000-000)",
-  "numeroDocumento": "número do documento",
-  "categoria": "categoria CNH (se aplicável)",
-  "numeroRegistro": "número de registro (CNH)",
-  "validade": "validade da CNH",
-  "primeiraHabilitacao": "data primeira habilitação",
-  "observacoes": "observações do documento",
-  "outrosDados": "outros dados relevantes"
-}
-
-Retorne APENAS o JSON, sem explicações ou formatação markdown."""
-
-    async def extract_document(
+    def build_payload(
         self,
-        api_key:str,
-        file_content: str,
-        file_type:  str
-    ) -> DocumentData:
+        file_type: str,
+        document_type: Optional[str] = None,
+        reask: Optional[Dict[str, Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
         """
-        Método assíncrono para extrair dados do documento.
+        Payload da requisição, com o placeholder no lugar do base64 do arquivo.
+        No modo estruturado o Claude é obrigado a responder pela ferramenta,
+        cujo input_schema vem do DocumentData.
         
-        Args:
-            api_key: Chave da API do Claude
-            file_content: Conteúdo do arquivo em base64
-            file_type: Tipo MIME do arquivo
-            
-        Returns:
-            DocumentData: Dados extraídos e validados
-            
-        Raises:
-            httpx.HTTPError: Erro na comunicação HTTP
-            json.JSONDecodeError: Erro ao parsear resposta
-            ValueError: Outros erros de validação
-        """
+        Com o cache de prompt ativo, as instruções vão no system marcado com
+        cache_control: ferramenta + system formam um prefixo fixo por tipo de
+        documento, cobrado como leitura de cache nas chamadas seguintes
+        (o provedor só cacheia prefixos acima do mínimo de tokens do modelo).
         
+        Com reask (campo inválido -> (valor lido, motivo)) o prompt e o schema
+        pedem só esses campos; o prompt varia a cada chamada e não é cacheado.
+        """
         # Determinar tipo de conteúdo (image ou document)
         content_type = "document" if file_type == "application/pdf" else "image"
+        structured = settings.structured_output
+        prompt, fields = self.prompt_and_fields(document_type, reask)
         
-        # Montar o payload da requisição
+        document_block = {
+            "type": content_type,
+            "source": {
+                "type": "base64",
+                "media_type": file_type,
+                "data": DOCUMENT_PLACEHOLDER
+            }
+        }
         payload = {
             "model": self.MODEL,
-            "max_tokens": 3000,
-            "messages": [{
+            "max_tokens": settings.structured_max_tokens if structured else 3000,
+        }
+        if settings.claude_prompt_caching and not reask:
+            payload["system"] = [{
+                "type": "text",
+                "text": prompt,
+                "cache_control": {"type": "ephemeral"}
+            }]
+            payload["messages"] = [{
                 "role": "user",
                 "content": [
-                    {
-                        "type": content_type,
-                        "source": {
-                            "type": "base64",
-                            "media_type": file_type,
-                            "data": file_content
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": self.get_extraction_prompt()
-                    }
+                    document_block,
+                    {"type": "text", "text": "Extraia os dados deste documento."}
                 ]
             }]
-        }       
+        else:
+            payload["messages"] = [{
+                "role": "user",
+                "content": [
+                    document_block,
+                    {"type": "text", "text": prompt}
+                ]
+            }]
+        if structured:
+            payload["tools"] = [claude_tool(document_type, fields)]
+            payload["tool_choice"] = {"type": "tool", "name": TOOL_NAME}
+        return payload
+
+    def stream_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {**payload, "stream": True}
+
+    def url(self, api_key: str, stream: bool = False) -> str:
+        return self.BASE_URL
 
-        # Headers da requisição
-        headers = {
-            "Content-Type": "application/json",
+    def headers(self, api_key: str) -> Dict[str, str]:
+        return {
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01"
         }
+
+    def usage(self, data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        usage = data.get("usage", {})
+        return {
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "cache_read_tokens": usage.get("cache_read_input_tokens"),
+            "cache_creation_tokens": usage.get("cache_creation_input_tokens"),
+        }
+
+    def parse_response(self, data: Dict[str, Any]) -> DocumentData:
+        # Modo estruturado: os dados chegam prontos no bloco tool_use
+        content = data.get("content") or [{}]
+        for block in content:
+            if block.get("type") == "tool_use":
+                return self.parse_structured(block.get("input"))
         
-        # Cliente HTTP assíncrono com timeout
-        async with httpx.AsyncClient(timeout=settings.api_timeout) as client:
-            try:
-                # Fazer requisição POST
-                logger.info("Enviando requisição para Claude API...")
-                response = await client.post(
-                    self.BASE_URL,
-                    json=payload,
-                    headers=headers
-                )
-                
-                # Verificar status HTTP
-                response.raise_for_status()
-                
-                # Parsear resposta JSON
-                data = response.json()
-                
-                # Extrair texto da resposta
-                response_text = data.get("content", [{}])[0].get("text", "")
-                
-                # Limpar resposta (remover markdown se houver)
-                response_text = response_text.strip()
-                if response_text.startswith("```"):
-                    # Remove blocos de código markdown
-                    response_text = response_text.split("```")[1]
-                    if response_text.startswith("json"):
-                        response_text = response_text[4:]
-                
-                # Parsear JSON extraído
-                extracted_data = json.loads(response_text.strip())
-                
-                # Validar e retornar usando modelo Pydantic
-                return DocumentData(**extracted_data)
-                
-            except httpx.HTTPStatusError as e:
-                # Erro HTTP (4xx, 5xx)
-                logger.error(f"Erro HTTP na API Claude: {e.response.status_code}")
-                error_data = e.response.json() if e.response.content else {}
-                raise ValueError(f"Erro Claude API: {error_data.get('error', {}).get('message', 'Erro desconhecido')}")
-                
-            except json.JSONDecodeError as e:
-                # Erro ao parsear JSON
-                logger.error(f"Erro ao parsear resposta JSON: {str(e)}")
-                raise ValueError("Resposta inválida da API Claude")
-                
-            except Exception as e:
-                # Outros erros
-                logger.error(f"Erro inesperado: {str(e)}")
-                raise
\ No newline at end of file
+        # Extrair texto da resposta
+        response_text = next(
+            (block.get("text", "") for block in content if block.get("type") == "text"),
+            content[0].get("text", "")
+        )
+        return self.parse_text(response_text)
+
+    def stream_texts(self, event: Dict[str, Any]) -> Iterable[str]:
+        event_type = event.get("type")
+        if event_type == "content_block_delta":
+            delta = event.get("delta", {})
+            # text_delta (texto livre) ou input_json_delta (tool use)
+            return (delta.get("text") or delta.get("partial_json"),)
+        if event_type == "error":
+            error = event.get("error", {})
+            raise ProviderError(
+                f"Erro Claude API: {error.get('message', 'Erro desconhecido')}",
+                provider=self.NAME,
+                retryable=error.get("type") in ("overloaded_error", "api_error")
+            )
+        return ()
+
+    def stream_done(self, event: Dict[str, Any]) -> bool:
+        return event.get("type") == "message_stop"
@@ -0,0 +1,112 @@
+"""
+Coalescência (single-flight) de extrações idênticas em andamento.
+Requisições com a mesma chave compartilham uma única chamada ao provedor.
+O resultado é compartilhado entre clientes; erros da credencial de quem
+fez a chamada (ex.: 401/429 da chave de API) não: os aguardantes com
+outra credencial refazem a chamada com a própria.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """
+    Agrupa chamadas concorrentes pela chave: a primeira executa,
+    as demais aguardam o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        # Credencial de quem iniciou cada chamada em andamento
+        self._owners: Dict[str, Optional[str]] = {}
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.private_retries = 0
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[T]],
+        owner: Optional[str] = None,
+        private: Optional[Callable[[BaseException], bool]] = None
+    ) -> T:
+        """
+        Executa factory() uma única vez por chave enquanto houver chamada em andamento.
+
+        Args:
+            owner: identificador da credencial usada por factory (ex.: hash da chave de API)
+            private: erros que valem só para a credencial de quem chamou; um
+                aguardante com outro owner refaz a chamada com a própria
+        """
+        self.requests += 1
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            self._waiters[key] = 0
+            self._owners[key] = owner
+            task.add_done_callback(lambda _: self._forget(key, task))
+            task_owner = owner
+        else:
+            self.coalesced += 1
+            task_owner = self._owners.get(key)
+            logger.info(f"Extração idêntica em andamento, aguardando resultado ({key[:12]}...)")
+
+        self._waiters[key] += 1
+        try:
+            # shield: o cancelamento de um cliente não cancela a chamada compartilhada
+            return await asyncio.shield(task)
+        except Exception as e:
+            if private is None or owner == task_owner or not private(e):
+                raise
+            # Erro da credencial de outro cliente: chamada própria, fora do grupo
+            self.private_retries += 1
+            logger.info(f"Erro da credencial de outra requisição, refazendo a chamada ({key[:12]}...)")
+            self.executions += 1
+            return await factory()
+        finally:
+            if key in self._waiters and self._in_flight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and not task.done():
+                    # Ninguém mais aguarda (ex.: perdedor de um hedge): cancelar a chamada
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """
+        Remove a chave ao término da chamada (sucesso ou erro).
+        """
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            self._waiters.pop(key, None)
+            self._owners.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            # Exceção já entregue aos aguardantes; evita aviso de "never retrieved"
+            logger.debug(f"Chamada coalescida terminou com erro: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Métricas de deduplicação e aguardantes por chave.
+        """
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.executions,
+            "coalesced": self.coalesced,
+            "dedup_ratio": round(self.coalesced / self.requests, 4) if self.requests else 0.0,
+            "private_error_retries": self.private_retries,
+            "in_flight": len(self._in_flight),
+            "waiters": {key[:16]: count for key, count in self._waiters.items()},
+        }
+
+
+# Instância única compartilhada pela aplicação
+extraction_coalescer = RequestCoalescer()
@@ -0,0 +1,48 @@
+"""
+Pool de processos compartilhado pelos estágios que usam CPU
+(pré-processamento de imagens, divisão de PDFs).
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CPUPool:
+    """
+    ProcessPoolExecutor aberto no startup e encerrado no shutdown.
+    Fora do lifespan (ex.: scripts), o trabalho roda no executor padrão de threads.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def startup(self, workers: int) -> None:
+        """
+        Abre o pool de processos.
+        """
+        if self._pool is None and workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=workers)
+            logger.info(f"Pool de CPU iniciado com {workers} processo(s)")
+
+    def shutdown(self) -> None:
+        """
+        Encerra o pool de processos.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa func(*args) fora do event loop (func deve ser serializável).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, func, *args)
+
+
+# Instância única compartilhada pela aplicação
+cpu_pool = CPUPool()
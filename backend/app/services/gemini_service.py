@@ -3,24 +3,37 @@ Serviço para integração com a API do Gemini (Google).
 Implementa a lógica específica para extração usando Gemini.
 """
 
-import httpx
-import json
-from typing import Dict, Any, Optional
-import logging
+from typing import Dict, Any, Iterable, Optional, Tuple
 from ..models import DocumentData
 from ..config import get_settings
+from .payload import DOCUMENT_PLACEHOLDER
+from .provider_base import ExtractionProvider
+from .structured_output import gemini_response_schema
 
-logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-class GeminiService:
+class GeminiService(ExtractionProvider):
     """
     Classe que encapsula a comunicação com a API do Gemini.
     """
     
-    # URL base da API (note o placeholder para a chave)
-    BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+    NAME = "gemini"
+    LABEL = "Gemini"
+    MODEL = "gemini-2.0-flash"
+    KEY_PREFIX = "AIza"
+    
+    # URL base da API (a chave vai como query parameter)
+    API_ROOT = f"{settings.gemini_base_url.rstrip('/')}/v1beta/models/{MODEL}"
+    BASE_URL = f"{API_ROOT}:generateContent"
+    STREAM_URL = f"{API_ROOT}:streamGenerateContent"
+    
+    def __init__(self):
+        super().__init__(
+            max_concurrency=settings.gemini_max_concurrency,
+            timeout=settings.gemini_timeout,
+            cost_per_call=settings.gemini_cost_per_call
+        )
     
     @staticmethod
     def get_extraction_prompt() -> str:
@@ -31,29 +44,28 @@ class GeminiService:
         from .claude_service import ClaudeService
         return ClaudeService.get_extraction_prompt()
     
-    async def extract_document(
-        self, 
-        api_key: str, 
-        file_content: str, 
-        file_type: str
-    ) -> DocumentData:
+    def build_payload(
+        self,
+        file_type: str,
+        document_type: Optional[str] = None,
+        reask: Optional[Dict[str, Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
         """
-        Método assíncrono para extrair dados usando Gemini.
-        
-        A estrutura é similar ao Claude, mas o formato da API é diferente.
+        Payload no formato do Gemini, com o placeholder no lugar do base64.
+        No modo estruturado a resposta segue o responseSchema do DocumentData.
+        Com reask, prompt e schema pedem só os campos inválidos.
         """
-        
-        # Montar payload no formato do Gemini
+        prompt, fields = self.prompt_and_fields(document_type, reask)
         payload = {
             "contents": [{
                 "parts": [
                     {
-                        "text": self.get_extraction_prompt()
+                        "text": prompt
                     },
                     {
                         "inlineData": {
                             "mimeType": file_type,
-                            "data": file_content
+                            "data": DOCUMENT_PLACEHOLDER
                         }
                     }
                 ]
@@ -65,46 +77,39 @@ class GeminiService:
                 "maxOutputTokens": 2048  # Limite de tokens na resposta
             }
         }
-        
-        # URL com a chave como query parameter
-        url = f"{self.BASE_URL}?key={api_key}"
-        
-        async with httpx.AsyncClient(timeout=settings.api_timeout) as client:
-            try:
-                logger.info("Enviando requisição para Gemini API...")
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Estrutura de resposta do Gemini é diferente
-                response_text = (
-                    data.get("candidates", [{}])[0]
-                    .get("content", {})
-                    .get("parts", [{}])[0]
-                    .get("text", "")
-                )
-                
-                # Limpar resposta
-                response_text = response_text.strip()
-                if response_text.startswith("```"):
-                    response_text = response_text.split("```")[1]
-                    if response_text.startswith("json"):
-                        response_text = response_text[4:]
-                
-                # Parsear e validar
-                extracted_data = json.loads(response_text.strip())
-                return DocumentData(**extracted_data)
-                
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Erro HTTP na API Gemini: {e.response.status_code}")
-                error_data = e.response.json() if e.response.content else {}
-                raise ValueError(f"Erro Gemini API: {error_data.get('error', {}).get('message', 'Erro desconhecido')}")
-                
-            except Exception as e:
-                logger.error(f"Erro inesperado Gemini: {str(e)}")
-                raise
\ No newline at end of file
+        if settings.structured_output:
+            payload["generationConfig"].update({
+                "responseMimeType": "application/json",
+                "responseSchema": gemini_response_schema(document_type, fields),
+                "maxOutputTokens": settings.structured_max_tokens
+            })
+        return payload
+    
+    def url(self, api_key: str, stream: bool = False) -> str:
+        # Chave como query parameter; streaming via SSE (alt=sse)
+        if stream:
+            return f"{self.STREAM_URL}?alt=sse&key={api_key}"
+        return f"{self.BASE_URL}?key={api_key}"
+    
+    def usage(self, data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        usage = data.get("usageMetadata", {})
+        return {
+            "input_tokens": usage.get("promptTokenCount"),
+            "output_tokens": usage.get("candidatesTokenCount"),
+            "cache_read_tokens": usage.get("cachedContentTokenCount"),
+        }
+    
+    def parse_response(self, data: Dict[str, Any]) -> DocumentData:
+        # Estrutura de resposta do Gemini é diferente
+        response_text = (
+            data.get("candidates", [{}])[0]
+            .get("content", {})
+            .get("parts", [{}])[0]
+            .get("text", "")
+        )
+        return self.parse_text(response_text)
+    
+    def stream_texts(self, event: Dict[str, Any]) -> Iterable[str]:
+        for candidate in event.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                yield part.get("text")
@@ -0,0 +1,104 @@
+"""
+Política de requisições "hedged" entre dois provedores (provider="auto").
+Decide quando disparar a requisição extra para o provedor secundário
+e contabiliza taxa de hedge e de vitória de cada lado.
+"""
+
+from typing import Dict, Any
+from ..config import get_settings
+from .latency_tracker import latency_tracker
+from .provider_registry import provider_registry
+
+settings = get_settings()
+
+
+class HedgingPolicy:
+    """
+    Atraso do hedge baseado no percentil observado do provedor primário,
+    limitado por orçamento global (fração de requisições) e custo por requisição.
+    """
+
+    def __init__(
+        self,
+        default_delay: float,
+        percentile: float,
+        min_delay: float,
+        min_samples: int,
+        budget_ratio: float,
+        budget_burst: int,
+        max_cost: float,
+        costs: Dict[str, float]
+    ):
+        self.default_delay = default_delay
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.max_cost = max_cost
+        self.costs = costs
+        self.requests = 0
+        self.hedges = 0
+        self.failovers = 0
+        self.skipped_budget = 0
+        self.skipped_cost = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+
+    def delay_for(self, provider: str) -> float:
+        """
+        Tempo de espera pelo primário antes de disparar o hedge.
+        """
+        if latency_tracker.count(provider) < self.min_samples:
+            return self.default_delay
+        observed = latency_tracker.percentile(provider, self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+    def allow_hedge(self, primary: str, secondary: str) -> bool:
+        """
+        Verifica custo por requisição e orçamento global de hedges.
+        """
+        cost = self.costs.get(primary, 0.0) + self.costs.get(secondary, 0.0)
+        if cost > self.max_cost:
+            self.skipped_cost += 1
+            return False
+        if self.hedges >= self.budget_ratio * self.requests + self.budget_burst:
+            self.skipped_budget += 1
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Taxas de hedge e de vitória.
+        """
+        decided = self.primary_wins + self.hedge_wins
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            "failovers": self.failovers,
+            "skipped_budget": self.skipped_budget,
+            "skipped_cost": self.skipped_cost,
+            "primary_wins": self.primary_wins,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / decided, 4) if decided else 0.0,
+            "delays": {
+                provider: round(self.delay_for(provider), 3) for provider in self.costs
+            },
+        }
+
+
+# Instância única compartilhada pela aplicação
+hedging_policy = HedgingPolicy(
+    default_delay=settings.hedge_delay_seconds,
+    percentile=settings.hedge_delay_percentile,
+    min_delay=settings.hedge_min_delay_seconds,
+    min_samples=settings.hedge_min_samples,
+    budget_ratio=settings.hedge_budget_ratio,
+    budget_burst=settings.hedge_budget_burst,
+    max_cost=settings.hedge_max_cost_per_request,
+    # Custo declarado por cada provedor registrado
+    costs={service.NAME: service.cost_per_call for service in provider_registry.all()}
+)
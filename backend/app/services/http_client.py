@@ -0,0 +1,186 @@
+"""
+Pool de clientes HTTP compartilhados pelos serviços de IA.
+Mantém um httpx.AsyncClient de longa duração por provedor (HTTP/2 + keep-alive),
+evitando um novo handshake TCP+TLS a cada extração.
+"""
+
+import httpx
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Iterable, Optional
+from ..config import get_settings
+from .metrics import metrics
+from .cassette import wrap_transport
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class HTTPClientPool:
+    """
+    Registro de clientes HTTP por provedor.
+    Os clientes são abertos no startup (lifespan) e fechados no shutdown.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._total_requests: Dict[str, int] = {}
+
+    def _create_client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Cria um cliente com HTTP/2, keep-alive e limites de pool configuráveis.
+        """
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        )
+        timeout = httpx.Timeout(
+            settings.api_timeout,
+            connect=settings.http_connect_timeout
+        )
+        transport = httpx.AsyncHTTPTransport(
+            http2=settings.http2_enabled,
+            limits=limits
+        )
+        self._transports[provider] = transport
+        self._in_flight.setdefault(provider, 0)
+        self._total_requests.setdefault(provider, 0)
+        logger.info(
+            f"Cliente HTTP aberto para {provider} "
+            f"(http2={settings.http2_enabled}, max_connections={settings.http_max_connections})"
+        )
+        # Gravação/reprodução (cassette_mode) envolve o transporte real
+        return httpx.AsyncClient(transport=wrap_transport(provider, transport), timeout=timeout)
+
+    async def startup(self, providers: Iterable[str]) -> None:
+        """
+        Abre os clientes dos provedores informados.
+        """
+        for provider in providers:
+            if provider not in self._clients:
+                self._clients[provider] = self._create_client(provider)
+
+    async def shutdown(self) -> None:
+        """
+        Fecha todos os clientes abertos.
+        """
+        for provider, client in self._clients.items():
+            await client.aclose()
+            logger.info(f"Cliente HTTP fechado para {provider}")
+        self._clients.clear()
+        self._transports.clear()
+
+    def get_client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Retorna o cliente do provedor, criando-o sob demanda
+        caso o lifespan ainda não tenha sido executado.
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._create_client(provider)
+            self._clients[provider] = client
+        return client
+
+    async def post(self, provider: str, url: str, file_type: str = "", **kwargs) -> httpx.Response:
+        """
+        Executa um POST pelo cliente do provedor contabilizando requisições em andamento.
+        `file_type` rotula as métricas de latência (conexão, primeiro byte, total).
+        """
+        client = self.get_client(provider)
+        self._in_flight[provider] += 1
+        self._total_requests[provider] += 1
+        trace = metrics.upstream_trace(provider, file_type)
+        if trace is not None:
+            kwargs["extensions"] = {"trace": trace}
+        response = None
+        try:
+            response = await client.post(url, **kwargs)
+            return response
+        finally:
+            self._in_flight[provider] -= 1
+            if trace is not None:
+                self._record(trace, kwargs.get("content"), response)
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        provider: str,
+        url: str,
+        file_type: str = "",
+        **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        POST em streaming: a resposta é entregue antes do corpo ser lido.
+        A requisição conta como em andamento até o contexto ser fechado.
+        """
+        client = self.get_client(provider)
+        self._in_flight[provider] += 1
+        self._total_requests[provider] += 1
+        trace = metrics.upstream_trace(provider, file_type)
+        if trace is not None:
+            kwargs["extensions"] = {"trace": trace}
+        response = None
+        try:
+            async with client.stream("POST", url, **kwargs) as response:
+                yield response
+        finally:
+            self._in_flight[provider] -= 1
+            if trace is not None:
+                self._record(trace, kwargs.get("content"), response)
+
+    @staticmethod
+    def _record(trace, content: Any, response: Optional[httpx.Response]) -> None:
+        """
+        Duração total, status e bytes da chamada (status "error" = sem resposta).
+        """
+        provider, file_type = trace.labels
+        metrics.observe_stage("upstream_total", provider, file_type, time.perf_counter() - trace.start)
+        sent = getattr(content, "content_length", None)
+        if sent is None and isinstance(content, (bytes, str)):
+            sent = len(content)
+        if sent:
+            metrics.upstream_request_bytes.inc(provider, amount=sent)
+        if response is None:
+            metrics.upstream_responses.inc(provider, "error")
+            return
+        metrics.upstream_responses.inc(provider, str(response.status_code))
+        metrics.upstream_response_bytes.inc(provider, amount=response.num_bytes_downloaded)
+
+    def _pool_connections(self, provider: str) -> Optional[list]:
+        """
+        Lista as conexões do pool do httpcore (None se indisponível).
+        """
+        transport = self._transports.get(provider)
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", [])) if pool is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas de ocupação dos pools, para dimensionamento.
+        """
+        result: Dict[str, Any] = {}
+        for provider in self._total_requests:
+            connections = self._pool_connections(provider)
+            info: Dict[str, Any] = {
+                "open": provider in self._clients and not self._clients[provider].is_closed,
+                "in_flight": self._in_flight.get(provider, 0),
+                "total_requests": self._total_requests.get(provider, 0),
+                "max_connections": settings.http_max_connections,
+                "max_keepalive_connections": settings.http_max_keepalive_connections,
+            }
+            if connections is not None:
+                info["connections"] = len(connections)
+                info["idle_connections"] = sum(1 for c in connections if c.is_idle())
+                info["http2_connections"] = sum(
+                    1 for c in connections if "HTTP/2" in repr(c)
+                )
+            result[provider] = info
+        return result
+
+
+# Instância única compartilhada pela aplicação
+http_clients = HTTPClientPool()
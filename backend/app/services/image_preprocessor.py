@@ -0,0 +1,203 @@
+"""
+Pré-processamento de imagens com Pillow antes do envio ao provedor.
+Corrige a rotação EXIF, reduz a resolução, recomprime e opcionalmente
+converte para tons de cinza ou recorta as bordas do documento.
+O trabalho de CPU roda no pool de processos para não bloquear o event loop.
+"""
+
+import io
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+from PIL import Image, ImageChops, ImageOps
+from ..models import DocumentContent, PreprocessingInfo
+from ..config import get_settings
+from .cpu_pool import cpu_pool
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+IMAGE_TYPES = ("image/jpeg", "image/jpg", "image/png")
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    """
+    Parâmetros do pré-processamento (enviados aos processos do pool).
+    """
+    max_long_edge: int = 2048
+    jpeg_quality: int = 85
+    grayscale: bool = False
+    autocrop: bool = False
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifica a configuração (entra na chave do cache)."""
+        return (
+            f"pre{self.max_long_edge}q{self.jpeg_quality}"
+            f"{'g' if self.grayscale else ''}{'c' if self.autocrop else ''}"
+        )
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """
+    Compõe imagens com transparência (RGBA, LA, paleta com transparência)
+    sobre fundo branco; convertidas direto, as áreas transparentes ficariam
+    pretas no JPEG (e conteúdo escuro sobre fundo transparente sumiria).
+    """
+    if image.mode in ("RGBA", "LA", "RGBa", "La") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        canvas = Image.new("RGB", rgba.size, (255, 255, 255))
+        canvas.paste(rgba, mask=rgba.getchannel("A"))
+        return canvas
+    return image
+
+
+def _autocrop(image: Image.Image, threshold: int = 30, min_area: float = 0.2) -> Image.Image:
+    """
+    Recorta a área do documento comparando com a cor do canto (fundo).
+    Não recorta se a área resultante for pequena demais (provável erro).
+    """
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background).convert("L")
+    mask = diff.point(lambda value: 255 if value > threshold else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    if width * height < min_area * image.width * image.height:
+        return image
+    return image.crop(bbox)
+
+
+def preprocess_image(data: bytes, options: PreprocessOptions) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Executa o pré-processamento (função de módulo para ser serializável no pool).
+
+    Returns:
+        (bytes JPEG resultantes, informações de dimensões)
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        original_size = original.size
+        image = _flatten(ImageOps.exif_transpose(original))
+
+        if options.grayscale:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            # JPEG não suporta alpha/paleta
+            image = image.convert("RGB")
+
+        if options.autocrop:
+            image = _autocrop(image)
+
+        if max(image.size) > options.max_long_edge:
+            image.thumbnail((options.max_long_edge, options.max_long_edge), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=options.jpeg_quality, optimize=True)
+
+    return output.getvalue(), {
+        "original_size": list(original_size),
+        "final_size": list(image.size),
+    }
+
+
+class ImagePreprocessor:
+    """
+    Estágio de pré-processamento com contadores agregados.
+    """
+
+    def __init__(self, options: PreprocessOptions, enabled: bool = True, min_bytes: int = 0):
+        self.options = options
+        self.enabled = enabled
+        self.min_bytes = min_bytes
+        self.processed = 0
+        self.skipped = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_saved = 0
+        self.total_time = 0.0
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifica a configuração ativa ("" quando desativado)."""
+        return self.options.fingerprint if self.enabled else ""
+
+    def applies_to(self, document: DocumentContent, file_type: str) -> bool:
+        """
+        Só imagens acima do tamanho mínimo são processadas.
+        """
+        return self.enabled and file_type in IMAGE_TYPES and document.size >= self.min_bytes
+
+    async def process(
+        self,
+        document: DocumentContent,
+        file_type: str
+    ) -> Tuple[DocumentContent, str, Optional[PreprocessingInfo]]:
+        """
+        Pré-processa a imagem, mantendo o original quando o resultado não é menor.
+
+        Returns:
+            (conteúdo a enviar, tipo MIME a enviar, informações do estágio)
+        """
+        if not self.applies_to(document, file_type):
+            self.skipped += 1
+            return document, file_type, None
+
+        start_time = time.perf_counter()
+        try:
+            data, dimensions = await cpu_pool.run(preprocess_image, document.data, self.options)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Falha no pré-processamento, enviando original: {str(e)}")
+            return document, file_type, None
+
+        elapsed = time.perf_counter() - start_time
+        applied = len(data) < document.size
+        info = PreprocessingInfo(
+            applied=applied,
+            original_bytes=document.size,
+            final_bytes=len(data) if applied else document.size,
+            bytes_saved=document.size - len(data) if applied else 0,
+            duration_ms=round(elapsed * 1000, 1),
+            original_size=dimensions["original_size"],
+            final_size=dimensions["final_size"] if applied else dimensions["original_size"],
+        )
+
+        self.processed += 1
+        self.bytes_in += document.size
+        self.bytes_saved += info.bytes_saved
+        self.total_time += elapsed
+
+        if not applied:
+            return document, file_type, info
+        return DocumentContent(data), "image/jpeg", info
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores agregados do estágio.
+        """
+        return {
+            "enabled": self.enabled,
+            "options": self.fingerprint,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_saved": self.bytes_saved,
+            "avg_ms": round(self.total_time * 1000 / self.processed, 1) if self.processed else 0.0,
+        }
+
+
+# Instância única compartilhada pela aplicação
+image_preprocessor = ImagePreprocessor(
+    PreprocessOptions(
+        max_long_edge=settings.preprocess_max_long_edge,
+        jpeg_quality=settings.preprocess_jpeg_quality,
+        grayscale=settings.preprocess_grayscale,
+        autocrop=settings.preprocess_autocrop
+    ),
+    enabled=settings.preprocess_enabled,
+    min_bytes=settings.preprocess_min_bytes
+)
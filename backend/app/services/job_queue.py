@@ -0,0 +1,461 @@
+"""
+Fila de extrações assíncronas (modo job).
+O envio retorna um ID imediatamente; um pool limitado de workers executa
+as extrações e o resultado fica disponível por um TTL configurável.
+Opcionalmente os jobs são persistidos em SQLite e sobrevivem a reinícios.
+
+Com vários processos (gunicorn) apontando para o mesmo banco, cada job é
+reivindicado atomicamente antes de executar (um único processo o executa),
+a consulta de status lê o banco quando o job não é deste processo e jobs
+"running" só são retomados se o processo dono não existe mais.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+from ..models import DocumentContent, ExtractionResponse
+from ..config import get_settings
+from .admission import extraction_admission
+from .pipeline import extraction_pipeline
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class QueueFullError(Exception):
+    """A fila de jobs atingiu o limite."""
+
+
+@dataclass
+class Job:
+    """
+    Job de extração e seu estado.
+    """
+    id: str
+    provider: str
+    api_key: str
+    file_type: str
+    file_name: str
+    document: Optional[DocumentContent]
+    secondary_api_key: Optional[str] = None
+    document_type: Optional[str] = None
+    status: str = "queued"  # queued, running, done, failed
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[ExtractionResponse] = None
+
+
+def process_token(pid: int) -> Optional[str]:
+    """
+    Identifica o processo por pid e instante de início (/proc), para que um
+    pid reutilizado depois de um reinício do container não pareça o mesmo.
+    Sem /proc, apenas o pid; None se o processo não existe.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except FileNotFoundError:
+        if os.path.isdir("/proc/self"):
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return str(pid)
+    # starttime é o 22º campo; o nome (2º) vem entre parênteses e pode ter espaços
+    fields = stat[stat.rfind(b")") + 2:].split()
+    return f"{pid}:{fields[19].decode()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    if not owner:
+        return False
+    return process_token(int(owner.split(":")[0])) == owner
+
+
+class JobStore:
+    """
+    Persistência dos jobs em SQLite (opcional).
+    O arquivo e a chave de API só ficam gravados até o job terminar.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._owner = process_token(os.getpid())
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " provider TEXT NOT NULL,"
+            " api_key TEXT,"
+            " secondary_api_key TEXT,"
+            " file_type TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " payload BLOB,"
+            " result TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "document_type" not in columns:
+            # Banco criado antes da dica de tipo de documento
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN document_type TEXT")
+        if "owner" not in columns:
+            # Banco criado antes do modo com vários processos
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._conn.commit()
+
+    def insert(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, provider, api_key, secondary_api_key,"
+                " file_type, file_name, payload, created_at, document_type)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.provider, job.api_key, job.secondary_api_key,
+                 job.file_type, job.file_name, job.document.data, job.created_at,
+                 job.document_type)
+            )
+            self._conn.commit()
+
+    def claim(self, job: Job) -> bool:
+        """
+        Marca o job como em execução por este processo se ainda estiver na
+        fila; False se outro processo já o reivindicou.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (job.started_at, self._owner, job.id)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def mark_finished(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?,"
+                " api_key = NULL, secondary_api_key = NULL, payload = NULL WHERE id = ?",
+                (job.status, job.finished_at, job.result.model_dump_json(), job.id)
+            )
+            self._conn.commit()
+
+    COLUMNS = (
+        "SELECT id, status, provider, api_key, file_type, file_name, payload,"
+        " result, created_at, started_at, finished_at, secondary_api_key, document_type, owner"
+        " FROM jobs"
+    )
+
+    @staticmethod
+    def _job(row) -> Job:
+        return Job(
+            id=row[0], status=row[1], provider=row[2], api_key=row[3] or "",
+            file_type=row[4], file_name=row[5],
+            document=DocumentContent(row[6]) if row[6] is not None else None,
+            created_at=row[8], started_at=row[9], finished_at=row[10],
+            secondary_api_key=row[11], document_type=row[12],
+            result=ExtractionResponse.model_validate_json(row[7]) if row[7] else None
+        )
+
+    def load(self) -> List[Job]:
+        """
+        Carrega os jobs gravados. Jobs "running" de processos que já não
+        existem (interrompidos no meio) voltam para a fila; os de processos
+        vivos ficam com eles.
+        """
+        with self._lock:
+            rows = self._conn.execute(f"{self.COLUMNS} ORDER BY created_at").fetchall()
+            jobs = []
+            for row in rows:
+                job = self._job(row)
+                if job.status == "running" and _owner_alive(row[13]):
+                    # Em execução em outro processo: consultado pelo banco
+                    continue
+                if job.status == "running":
+                    job.status = "queued"
+                    job.started_at = None
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL"
+                        " WHERE id = ? AND status = 'running'",
+                        (job.id,)
+                    )
+                jobs.append(job)
+            self._conn.commit()
+        return jobs
+
+    def fetch(self, job_id: str) -> Optional[Job]:
+        """
+        Estado atual do job no banco (pode ter sido criado por outro processo).
+        """
+        with self._lock:
+            row = self._conn.execute(f"{self.COLUMNS} WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def delete_finished_before(self, limit: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (limit,)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Fila limitada com pool de workers e retenção de resultados por TTL.
+    """
+
+    def __init__(self, workers: int, max_queue: int, result_ttl: int, db_path: str = ""):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.db_path = db_path
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._store: Optional[JobStore] = None
+        self._running = 0
+        self._wait_times: deque = deque(maxlen=500)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def startup(self) -> None:
+        """
+        Inicia os workers, a limpeza periódica e recupera jobs persistidos.
+        """
+        self._queue = asyncio.Queue()
+        if self.db_path:
+            self._store = JobStore(self.db_path)
+            for job in self._store.load():
+                self._jobs[job.id] = job
+                if job.status == "queued":
+                    self._queue.put_nowait(job.id)
+            logger.info(f"{self._queue.qsize()} job(s) pendente(s) recuperado(s) de {self.db_path}")
+
+        self._tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    async def shutdown(self) -> None:
+        """
+        Para os workers (jobs pendentes continuam gravados, se houver SQLite).
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    async def submit(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        file_name: str,
+        secondary_api_key: Optional[str] = None,
+        document_type: Optional[str] = None
+    ) -> Job:
+        """
+        Enfileira uma extração e retorna o job criado.
+
+        Raises:
+            QueueFullError: fila cheia
+        """
+        if self._queue is None:
+            raise RuntimeError("Fila de jobs não iniciada")
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError()
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            provider=provider,
+            api_key=api_key,
+            file_type=file_type,
+            file_name=file_name,
+            document=document,
+            secondary_api_key=secondary_api_key,
+            document_type=document_type,
+            created_at=time.time()
+        )
+        if self._store is not None:
+            await asyncio.to_thread(self._store.insert, job)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str) -> Optional[Job]:
+        """
+        Job para consulta de status: o deste processo se já terminou ou não
+        há banco; senão o estado gravado, que pode ter sido atualizado por
+        outro processo (o job pode ter sido recebido ou executado por ele).
+        """
+        job = self._jobs.get(job_id)
+        if self._store is None or (job is not None and job.finished_at is not None):
+            return job
+        stored = await asyncio.to_thread(self._store.fetch, job_id)
+        return stored if stored is not None else job
+
+    async def _worker(self, index: int) -> None:
+        """
+        Consome a fila executando o pipeline de extração. Uma falha num job
+        (inclusive no banco) é registrada e o worker segue para o próximo.
+        """
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Erro no worker {index} com o job {job_id}: {str(e)}", exc_info=True)
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "queued":
+                    # Não chegou a executar (ex.: falha no claim): encerrar como falha
+                    job.result = self._internal_error(job)
+                    job.status = "failed"
+                    self._finish(job)
+
+    @staticmethod
+    def _internal_error(job: Job) -> ExtractionResponse:
+        return ExtractionResponse(
+            success=False,
+            error="Erro interno no servidor",
+            provider=job.provider,
+            processing_time=round(time.time() - (job.started_at or job.created_at), 2)
+        )
+
+    def _finish(self, job: Job) -> None:
+        job.finished_at = time.time()
+        # Liberar arquivo e chave assim que o job termina
+        job.document = None
+        job.api_key = ""
+        job.secondary_api_key = None
+        if job.status == "done":
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    async def _run_job(self, job_id: str) -> None:
+        """
+        Executa um job da fila: claim no banco, pipeline e registro do fim.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return
+
+        # Vaga do controle de admissão, como uma requisição síncrona; a
+        # fila de jobs já é limitada, então a espera não tem limite. O job
+        # só começa (e conta a espera) depois de obter a vaga
+        await extraction_admission.acquire(bounded=False)
+        try:
+            job.started_at = time.time()
+            if self._store is not None and not await asyncio.to_thread(self._store.claim, job):
+                # Outro processo já executa (ou executou) este job
+                del self._jobs[job_id]
+                return
+            job.status = "running"
+            self._wait_times.append(job.started_at - job.created_at)
+            self._running += 1
+
+            try:
+                job.result = await extraction_pipeline.run(
+                    provider=job.provider,
+                    api_key=job.api_key,
+                    document=job.document,
+                    file_type=job.file_type,
+                    file_name=job.file_name,
+                    secondary_api_key=job.secondary_api_key,
+                    document_type=job.document_type
+                )
+                job.status = "done" if job.result.success else "failed"
+            except Exception as e:
+                logger.error(f"Erro inesperado no job {job.id}: {str(e)}", exc_info=True)
+                job.result = self._internal_error(job)
+                job.status = "failed"
+            finally:
+                self._running -= 1
+        finally:
+            extraction_admission.release()
+
+        self._finish(job)
+        if self._store is not None:
+            await asyncio.to_thread(self._store.mark_finished, job)
+
+    async def _cleanup_loop(self) -> None:
+        """
+        Remove periodicamente os resultados com TTL vencido.
+        """
+        while True:
+            await asyncio.sleep(min(60, self.result_ttl))
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Erro na limpeza de jobs: {str(e)}", exc_info=True)
+
+    async def purge_expired(self) -> None:
+        limit = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < limit
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self._store is not None:
+            # DELETE no SQLite fora do event loop
+            await asyncio.to_thread(self._store.delete_finished_before, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Profundidade da fila e tempos de espera recentes.
+        """
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "retained_jobs": len(self._jobs),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3)
+            if waits else 0.0,
+            "persistent": self.db_path or None,
+        }
+
+
+# Instância única compartilhada pela aplicação
+job_queue = JobQueue(
+    workers=settings.jobs_workers,
+    max_queue=settings.jobs_max_queue,
+    result_ttl=settings.jobs_result_ttl_seconds,
+    db_path=settings.jobs_db_path
+)
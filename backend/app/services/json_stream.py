@@ -0,0 +1,148 @@
+"""
+Leitura das respostas em streaming dos provedores.
+Decodifica os eventos SSE e, com um parser JSON incremental, entrega
+cada campo do objeto raiz assim que o seu valor termina.
+"""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_sse_json(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Decodifica os eventos SSE (linhas "data: {...}") da resposta em JSON.
+    """
+    data_lines: List[str] = []
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+        elif not line and data_lines:
+            # Linha em branco encerra o evento
+            data = "\n".join(data_lines)
+            data_lines = []
+            if data == "[DONE]":
+                return
+            try:
+                yield json.loads(data)
+            except ValueError:
+                logger.warning(f"Evento SSE ignorado (JSON inválido): {data[:80]}")
+    if data_lines:
+        try:
+            yield json.loads("\n".join(data_lines))
+        except ValueError:
+            pass
+
+
+class IncrementalJSONParser:
+    """
+    Varre o texto acumulado uma única vez, acompanhando strings, escapes
+    e profundidade. Ignora o que vier antes do objeto raiz (ex.: cerca
+    markdown ```json) e depois dele.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"  # start, key, colon, value, after_value, done
+        self._key_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Acrescenta texto e retorna os campos (chave, valor) concluídos nele.
+        """
+        self._text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self._text
+        i = self._pos
+
+        while i < len(text) and self._state != "done":
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._state == "key":
+                            self._key = json.loads(text[self._key_start:i + 1])
+                            self._state = "colon"
+                        elif self._state == "value":
+                            self._complete(text[self._value_start:i + 1], completed)
+                i += 1
+                continue
+
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._state = "key"
+                i += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == "key":
+                        self._key_start = i
+                    elif self._state == "value" and self._value_start is None:
+                        self._value_start = i
+            elif c in "{[":
+                if self._depth == 1 and self._state == "value" and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == "value":
+                    self._complete(text[self._value_start:i + 1], completed)
+                elif self._depth == 0:
+                    if self._state == "value" and self._value_start is not None:
+                        self._complete(text[self._value_start:i], completed)
+                    self._state = "done"
+            elif self._depth == 1:
+                if c == ":" and self._state == "colon":
+                    self._state = "value"
+                    self._value_start = None
+                elif c == ",":
+                    if self._state == "value" and self._value_start is not None:
+                        self._complete(text[self._value_start:i], completed)
+                    self._state = "key"
+                elif self._state == "value" and self._value_start is None and not c.isspace():
+                    self._value_start = i
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def _complete(self, raw: str, completed: List[Tuple[str, Any]]) -> None:
+        """
+        Decodifica o valor do campo atual e o registra.
+        """
+        self._state = "after_value"
+        try:
+            value = json.loads(raw.strip())
+        except ValueError:
+            # Valor malformado: a validação final do objeto reportará o erro
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+    @property
+    def text(self) -> str:
+        """Texto recebido até agora (para a validação final)."""
+        return self._text
@@ -0,0 +1,64 @@
+"""
+Registro das latências observadas nas chamadas aos provedores.
+Mantém uma janela deslizante por provedor para cálculo de percentis.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Any, Optional, Tuple
+
+
+class LatencyTracker:
+    """
+    Janela deslizante de (latência, sucesso) por provedor.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+
+    def record(self, provider: str, seconds: float, success: bool) -> None:
+        """
+        Registra uma chamada ao provedor.
+        """
+        samples = self._samples.get(provider)
+        if samples is None:
+            samples = self._samples[provider] = deque(maxlen=self.window)
+        samples.append((seconds, success))
+
+    def count(self, provider: str) -> int:
+        return len(self._samples.get(provider, ()))
+
+    def percentile(self, provider: str, q: float) -> Optional[float]:
+        """
+        Percentil q (0-1) das latências bem-sucedidas, ou None sem amostras.
+        """
+        latencies = sorted(s for s, ok in self._samples.get(provider, ()) if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def error_rate(self, provider: str) -> float:
+        samples = self._samples.get(provider)
+        if not samples:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Resumo por provedor.
+        """
+        result = {}
+        for provider in self._samples:
+            p50 = self.percentile(provider, 0.5)
+            p95 = self.percentile(provider, 0.95)
+            result[provider] = {
+                "samples": self.count(provider),
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "error_rate": round(self.error_rate(provider), 4),
+            }
+        return result
+
+
+# Instância única compartilhada pela aplicação
+latency_tracker = LatencyTracker()
@@ -0,0 +1,496 @@
+"""
+Caminho rápido local: OCR (Tesseract) antes do provedor de IA.
+
+Documentos impressos e limpos (cartão do CPF, RG, CNH) são lidos pelo
+Tesseract no pool de CPU e os campos são localizados por modelos por tipo
+de documento (rótulo + padrão do valor). O resultado só é usado quando
+todos os campos obrigatórios foram encontrados, a confiança do OCR de cada
+campo atinge local_ocr_min_confidence e nenhum campo falha na validação;
+caso contrário a extração segue para o provedor (escalonamento).
+
+Imagens apenas (PDFs vão direto ao provedor). Requer o binário tesseract
+com o idioma configurado (pacotes tesseract-ocr e tesseract-ocr-por).
+"""
+
+import io
+import logging
+import re
+import shutil
+import subprocess
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
+from ..models import DocumentContent, DocumentData
+from ..config import get_settings
+from .cpu_pool import cpu_pool
+from .image_preprocessor import IMAGE_TYPES
+from .latency_tracker import LatencyTracker, latency_tracker
+from .provider_registry import provider_registry
+from .validation import document_validator
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Nome do "provedor" nas respostas e métricas
+LOCAL_PROVIDER = "local_ocr"
+
+# Lado maior da imagem enviada ao OCR (texto pequeno é ampliado)
+MIN_LONG_EDGE = 1600
+MAX_LONG_EDGE = 3200
+
+CPF = r"\d{3}\.?\d{3}\.?\d{3}\s?[-/.]?\s?\d{2}"
+DATE = r"\d{2}/\d{2}/\d{4}"
+NAME = r"[A-ZÀ-Ý][A-ZÀ-Ý']+(?: [A-ZÀ-Ý][A-ZÀ-Ý']*)+"
+RG = r"\d{1,2}\.?\d{3}\.?\d{3}\s?-?\s?[\dX]"
+CNH_REGISTRATION = r"\d{11}"
+CATEGORY = r"\b(?:ACC|AB|AC|AD|AE|A|B|C|D|E)\b"
+PLACE = r"[A-ZÀ-Ý][A-ZÀ-Ý]+(?: [A-ZÀ-Ý]+)*(?:\s*[-/]\s*[A-Z]{2})?"
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """
+    Campo de um modelo: valor no padrão `pattern`, na mesma linha do rótulo
+    (depois dele) ou nas linhas seguintes, onde vale o valor mais alinhado
+    com o rótulo (rótulos lado a lado, valores em colunas); sem rótulo, a
+    primeira ocorrência no documento. `skip` pula ocorrências (ex.: pai e
+    mãe após "FILIAÇÃO").
+    """
+    name: str
+    pattern: str
+    label: Optional[str] = None
+    skip: int = 0
+    required: bool = False
+
+
+# Tipo -> regra de classificação (texto sem acentos, maiúsculo) e campos.
+# A ordem importa: a CNH também traz "REGISTRO" e "IDENTIDADE".
+TEMPLATES: Dict[str, Tuple[str, Tuple[FieldRule, ...]]] = {
+    "CNH": (r"CARTEIRA NACIONAL DE HABILITACAO|\bHABILITACAO\b", (
+        FieldRule("nome", NAME, r"\bNOME\b", required=True),
+        FieldRule("cpf", CPF, r"\bCPF\b", required=True),
+        FieldRule("numeroRegistro", CNH_REGISTRATION, r"REGISTRO", required=True),
+        FieldRule("validade", DATE, r"VALIDADE", required=True),
+        FieldRule("primeiraHabilitacao", DATE, r"1\S?\s*HABILITACAO"),
+        FieldRule("dataNascimento", DATE, r"NASCIMENTO"),
+        FieldRule("categoria", CATEGORY, r"CAT\.?\s*HAB"),
+    )),
+    "CPF": (r"CADASTRO DE PESSOAS? FISICAS?", (
+        FieldRule("cpf", CPF, required=True),
+        FieldRule("nome", NAME, r"\bNOME\b", required=True),
+        FieldRule("dataNascimento", DATE, r"NASCIMENTO"),
+    )),
+    "RG": (r"REGISTRO GERAL|CARTEIRA DE IDENTIDADE", (
+        FieldRule("rg", RG, r"REGISTRO GERAL|\bRG\b", required=True),
+        FieldRule("nome", NAME, r"\bNOME\b", required=True),
+        FieldRule("dataNascimento", DATE, r"NASCIMENTO", required=True),
+        FieldRule("nomeDoPai", NAME, r"FILIACAO"),
+        FieldRule("nomeDaMae", NAME, r"FILIACAO", skip=1),
+        FieldRule("dataExpedicao", DATE, r"EXPEDICAO"),
+        FieldRule("naturalidade", PLACE, r"NATURALIDADE"),
+        FieldRule("cpf", CPF),
+    )),
+}
+
+# Linhas após o rótulo em que o valor é procurado
+LABEL_LOOKAHEAD = 3
+# Palavras impressas dos documentos: um "nome" que as contém é outro rótulo
+LABEL_WORDS = frozenset((
+    "NOME", "FILIACAO", "DATA", "NASCIMENTO", "REGISTRO", "GERAL", "VALIDADE", "EXPEDICAO",
+    "NATURALIDADE", "DOC", "IDENTIDADE", "CPF", "HABILITACAO", "CATEGORIA", "ASSINATURA",
+    "REPUBLICA", "FEDERATIVA", "BRASIL", "MINISTERIO", "CARTEIRA", "NACIONAL", "CADASTRO",
+    "PESSOAS", "FISICAS", "INSCRICAO", "ORGAO", "EMISSOR", "LOCAL", "PERMISSAO", "OBSERVACOES",
+))
+
+
+@dataclass(frozen=True)
+class OcrOptions:
+    """
+    Parâmetros do OCR (enviados aos processos do pool).
+    """
+    binary: str = "tesseract"
+    language: str = "por"
+    psm: int = 3
+    timeout: float = 10.0
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.language}psm{self.psm}"
+
+
+# Palavra do OCR: (texto, confiança 0-100, x inicial, x final) em pixels
+Word = Tuple[str, float, int, int]
+
+
+class OcrLine:
+    """
+    Linha reconhecida: texto, posição de cada palavra no texto e na imagem
+    e confiança de cada uma.
+    """
+
+    __slots__ = ("text", "folded", "words", "spans")
+
+    def __init__(self, words: List[Word]):
+        self.words = words
+        self.text = " ".join(word[0] for word in words)
+        self.folded = _fold(self.text)
+        self.spans: List[Tuple[int, int]] = []
+        position = 0
+        for word in words:
+            self.spans.append((position, position + len(word[0])))
+            position += len(word[0]) + 1
+
+    def _covering(self, start: int, end: int) -> List[Word]:
+        return [
+            word for (word_start, word_end), word in zip(self.spans, self.words)
+            if word_start < end and word_end > start
+        ]
+
+    def confidence(self, start: int, end: int) -> float:
+        """
+        Menor confiança entre as palavras que cobrem o trecho [start, end).
+        """
+        return min((word[1] for word in self._covering(start, end)), default=0.0)
+
+    def center(self, start: int, end: int) -> float:
+        """
+        Centro horizontal (pixels) do trecho [start, end).
+        """
+        covering = self._covering(start, end)
+        if not covering:
+            return 0.0
+        return (covering[0][2] + covering[-1][3]) / 2
+
+
+def _fold(text: str) -> str:
+    """
+    Maiúsculas sem acentos, com o mesmo tamanho (posições valem no original).
+    """
+    return "".join(unicodedata.normalize("NFKD", c)[0].upper()[0] for c in text)
+
+
+def parse_tsv(tsv: str) -> List[OcrLine]:
+    """
+    Saída TSV do Tesseract -> linhas (palavras agrupadas por bloco/parágrafo/linha).
+    """
+    lines: "OrderedDict[Tuple[str, str, str, str], List[Word]]" = OrderedDict()
+    for row in tsv.splitlines()[1:]:
+        columns = row.split("\t")
+        if len(columns) < 12 or columns[0] != "5":
+            continue
+        text = columns[11].strip()
+        try:
+            confidence = float(columns[10])
+            left = int(columns[6])
+            right = left + int(columns[8])
+        except ValueError:
+            continue
+        if not text or confidence < 0:
+            continue
+        lines.setdefault(tuple(columns[1:5]), []).append((text, confidence, left, right))
+    return [OcrLine(words) for words in lines.values()]
+
+
+def classify_lines(lines: List[OcrLine]) -> Optional[str]:
+    """
+    Tipo do documento pelo texto reconhecido (None se nenhum modelo reconhece).
+    """
+    text = "\n".join(line.folded for line in lines)
+    for document_type, (pattern, _) in TEMPLATES.items():
+        if re.search(pattern, text):
+            return document_type
+    return None
+
+
+def _find(rule: FieldRule, lines: List[OcrLine]) -> Optional[Tuple[str, float]]:
+    """
+    Valor e confiança do campo, ou None se não encontrado.
+    """
+    pattern = re.compile(rule.pattern)
+    # Linhas candidatas: (linha, início da busca, centro do rótulo)
+    candidates: List[Tuple[OcrLine, int, Optional[float]]] = []
+    if rule.label is None:
+        candidates = [(line, 0, None) for line in lines]
+    else:
+        label = re.compile(rule.label)
+        for index, line in enumerate(lines):
+            found = label.search(line.folded)
+            if found is not None:
+                column = line.center(found.start(), found.end())
+                candidates.append((line, found.end(), None))
+                candidates.extend((following, 0, column) for following in lines[index + 1:index + 1 + LABEL_LOOKAHEAD])
+                break
+    skip = rule.skip
+    for line, start, column in candidates:
+        matches = [
+            match for match in pattern.finditer(line.text, start)
+            if LABEL_WORDS.isdisjoint(line.folded[match.start():match.end()].split())
+        ]
+        if not matches:
+            continue
+        if column is not None:
+            # Valor da coluna do rótulo primeiro
+            matches.sort(key=lambda match: abs(line.center(match.start(), match.end()) - column))
+        if skip:
+            skip -= 1
+            continue
+        match = matches[0]
+        return match.group().strip(), line.confidence(match.start(), match.end())
+    return None
+
+
+def extract_fields(
+    lines: List[OcrLine],
+    document_type: Optional[str] = None
+) -> Tuple[Optional[str], Dict[str, Tuple[str, float]], List[str]]:
+    """
+    Aplica o modelo do tipo (ou do tipo reconhecido no texto).
+
+    Returns:
+        (tipo, campo -> (valor, confiança), campos obrigatórios ausentes)
+    """
+    document_type = document_type or classify_lines(lines)
+    if document_type not in TEMPLATES:
+        return None, {}, []
+    fields: Dict[str, Tuple[str, float]] = {}
+    missing = []
+    for rule in TEMPLATES[document_type][1]:
+        found = _find(rule, lines)
+        if found is not None:
+            fields[rule.name] = found
+        elif rule.required:
+            missing.append(rule.name)
+    return document_type, fields, missing
+
+
+def run_tesseract(data: bytes, options: OcrOptions) -> str:
+    """
+    Prepara a imagem (rotação EXIF, tons de cinza, escala, contraste) e
+    devolve o TSV do Tesseract (função de módulo para o pool de CPU).
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert("L")
+    long_edge = max(image.size)
+    if long_edge < MIN_LONG_EDGE or long_edge > MAX_LONG_EDGE:
+        scale = (MIN_LONG_EDGE if long_edge < MIN_LONG_EDGE else MAX_LONG_EDGE) / long_edge
+        image = image.resize(
+            (round(image.width * scale), round(image.height * scale)), Image.Resampling.LANCZOS
+        )
+    image = ImageOps.autocontrast(image, cutoff=1)
+    png = io.BytesIO()
+    image.save(png, format="PNG")
+    completed = subprocess.run(
+        [options.binary, "stdin", "stdout", "-l", options.language, "--psm", str(options.psm), "tsv"],
+        input=png.getvalue(),
+        capture_output=True,
+        timeout=options.timeout,
+        check=True
+    )
+    return completed.stdout.decode("utf-8", "replace")
+
+
+def ocr_document(
+    data: bytes,
+    options: OcrOptions,
+    document_type: Optional[str] = None
+) -> Tuple[Optional[str], Dict[str, Tuple[str, float]], List[str]]:
+    """
+    OCR + modelo do tipo, inteiro no pool de CPU.
+    """
+    return extract_fields(parse_tsv(run_tesseract(data, options)), document_type)
+
+
+class LocalOcr:
+    """
+    Camada local antes dos provedores: tenta o OCR e decide se o resultado
+    basta ou se a extração deve escalar para o provedor.
+    """
+
+    def __init__(self, options: OcrOptions, enabled: bool = False, min_confidence: float = 80.0,
+                 memo_size: int = 256):
+        self.options = options
+        self.enabled = enabled
+        self.available = False
+        self.min_confidence = min_confidence
+        self.memo_size = memo_size
+        # Resultado por (arquivo, tipo): repetição ou hedge não refaz o OCR
+        self._memo: "OrderedDict[Tuple[str, Optional[str]], Tuple[Optional[DocumentData], str]]" = OrderedDict()
+        # Campos lidos por arquivo, para a conferência de quase-duplicatas
+        self._fields: "OrderedDict[str, Optional[Dict[str, str]]]" = OrderedDict()
+        self.attempts = 0
+        self.hits = 0
+        self.escalations: Dict[str, int] = {}
+        # Latência do OCR quando aproveitado ("hit") e quando escalou ("escalated")
+        self.latency = LatencyTracker(window=500)
+
+    @property
+    def fingerprint(self) -> str:
+        return self.options.fingerprint
+
+    def startup(self, needed: bool = False) -> None:
+        """
+        Confere o binário e o idioma; sem eles o caminho rápido fica desligado.
+        `needed`: o OCR é usado por outro estágio (conferência de quase-duplicatas)
+        mesmo com o caminho rápido desligado.
+        """
+        if not self.enabled and not needed:
+            return
+        binary = shutil.which(self.options.binary)
+        if binary is None:
+            logger.warning(f"OCR local desativado: {self.options.binary} não encontrado")
+            return
+        try:
+            languages = subprocess.run(
+                [binary, "--list-langs"], capture_output=True, timeout=10, check=True
+            ).stdout.decode().split()
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"OCR local desativado: {str(e)}")
+            return
+        missing = [lang for lang in self.options.language.split("+") if lang not in languages]
+        if missing:
+            logger.warning(f"OCR local desativado: idioma(s) {', '.join(missing)} não instalado(s)")
+            return
+        self.available = True
+        logger.info(f"OCR local ativo ({binary}, {self.options.language}, psm {self.options.psm})")
+
+    def applies_to(self, file_type: str, document_type: Optional[str] = None) -> bool:
+        """
+        Imagens de tipo com modelo (ou desconhecido, classificado pelo texto).
+        """
+        return (
+            self.enabled and self.available and file_type in IMAGE_TYPES
+            and (document_type is None or document_type in TEMPLATES)
+        )
+
+    async def extract(
+        self,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> Optional[DocumentData]:
+        """
+        Dados do documento pelo OCR, ou None quando deve escalar ao provedor.
+        """
+        key = (document.sha256, document_type)
+        memo = self._memo.get(key)
+        if memo is not None:
+            self._memo.move_to_end(key)
+            return memo[0]
+
+        self.attempts += 1
+        start_time = time.perf_counter()
+        data, reason = await self._run(document, document_type)
+        elapsed = time.perf_counter() - start_time
+        self.latency.record("escalated" if data is None else "hit", elapsed, True)
+        if data is None:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+            logger.info(f"OCR local insuficiente ({reason}) em {elapsed * 1000:.0f}ms, seguindo para o provedor")
+        else:
+            self.hits += 1
+            logger.info(f"OCR local aproveitado em {elapsed * 1000:.0f}ms ({data.tipoDocumento})")
+
+        self._memo[key] = (data, reason)
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return data
+
+    async def read_fields(
+        self,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Campos lidos pelo OCR, sem os critérios de aceitação (para conferir o
+        conteúdo de uma quase-duplicata). None se o OCR estiver indisponível,
+        o arquivo não for imagem ou a leitura falhar.
+        """
+        if not self.available or file_type not in IMAGE_TYPES:
+            return None
+        key = document.sha256
+        if key in self._fields:
+            self._fields.move_to_end(key)
+            return self._fields[key]
+        try:
+            _, fields, _ = await cpu_pool.run(ocr_document, document.data, self.options, document_type)
+            result: Optional[Dict[str, str]] = {name: value for name, (value, _) in fields.items()}
+        except Exception as e:
+            logger.warning(f"Falha no OCR local: {str(e)}")
+            result = None
+        self._fields[key] = result
+        if len(self._fields) > self.memo_size:
+            self._fields.popitem(last=False)
+        return result
+
+    async def _run(
+        self,
+        document: DocumentContent,
+        document_type: Optional[str]
+    ) -> Tuple[Optional[DocumentData], str]:
+        """
+        OCR e critérios de aceitação; retorna (dados ou None, motivo).
+        """
+        try:
+            found_type, fields, missing = await cpu_pool.run(
+                ocr_document, document.data, self.options, document_type
+            )
+        except subprocess.TimeoutExpired:
+            return None, "timeout"
+        except Exception as e:
+            logger.warning(f"Falha no OCR local: {str(e)}")
+            return None, "error"
+        if found_type is None:
+            return None, "unknown_type"
+        if missing:
+            return None, "missing_fields"
+        if any(confidence < self.min_confidence for _, confidence in fields.values()):
+            return None, "low_confidence"
+        data = DocumentData(tipoDocumento=found_type, **{name: value for name, (value, _) in fields.items()})
+        if document_validator.invalid(data):
+            return None, "invalid_fields"
+        return data, "hit"
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Taxa de aproveitamento e latência do OCR frente à dos provedores.
+        """
+        def milliseconds(tracker: LatencyTracker, key: str, q: float) -> Optional[float]:
+            value = tracker.percentile(key, q)
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "enabled": self.enabled,
+            "available": self.available,
+            "options": self.fingerprint,
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+            "escalations": self.escalations,
+            "hit_ms": {"p50": milliseconds(self.latency, "hit", 0.5), "p95": milliseconds(self.latency, "hit", 0.95)},
+            "escalated_ms": {
+                "p50": milliseconds(self.latency, "escalated", 0.5),
+                "p95": milliseconds(self.latency, "escalated", 0.95),
+            },
+            "provider_ms": {
+                provider: {"p50": milliseconds(latency_tracker, provider, 0.5),
+                           "p95": milliseconds(latency_tracker, provider, 0.95)}
+                for provider in provider_registry.names()
+                if latency_tracker.count(provider)
+            },
+        }
+
+
+# Instância única compartilhada pela aplicação
+local_ocr = LocalOcr(
+    OcrOptions(
+        binary=settings.local_ocr_binary,
+        language=settings.local_ocr_language,
+        psm=settings.local_ocr_psm,
+        timeout=settings.local_ocr_timeout
+    ),
+    enabled=settings.local_ocr_enabled,
+    min_confidence=settings.local_ocr_min_confidence
+)
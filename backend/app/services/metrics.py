@@ -0,0 +1,559 @@
+"""
+Métricas no formato de exposição do Prometheus (text/plain 0.0.4).
+Histogramas de latência por estágio da extração (validação, pré-processamento,
+conexão/primeiro byte/total no provedor, interpretação e serialização),
+contadores de status e bytes e gauges de requisições em andamento.
+
+Implementação própria e mínima: a observação é um bisect e duas somas num
+dicionário, sem locks (tudo roda no event loop); agregação e formatação
+só acontecem no scrape de /metrics.
+
+Com vários processos (gunicorn), cada um grava periodicamente um snapshot
+das suas séries em metrics_multiprocess_dir e o scrape, atendido por
+qualquer worker, soma os snapshots de todos (ver MultiprocessStore).
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import orjson
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Limites (segundos) dos histogramas: de estágios sub-milissegundo a chamadas longas
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+# Início da requisição HTTP em andamento (definido pelo MetricsMiddleware)
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """
+    Contador monotônico por combinação de labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        return self._values
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> Iterable[str]:
+        for labels, value in (self._values if values is None else values).items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    """
+    Valor instantâneo; inc/dec no caminho da requisição.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+
+class FunctionMetric:
+    """
+    Métrica lida de outro serviço no momento do scrape (custo zero no
+    caminho da requisição). A função retorna {labels: valor}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        function: Callable[[], Dict[Tuple[str, ...], float]],
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.kind = kind
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        return self.function()
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> Iterable[str]:
+        for labels, value in (self.function() if values is None else values).items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """
+    Histograma com limites fixos; as contagens são guardadas por faixa
+    e acumuladas apenas na exposição.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _HistogramChild(len(self.buckets) + 1)
+        # le é inclusivo: a primeira faixa com limite >= valor
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+
+    def values(self) -> Dict[Tuple[str, ...], _HistogramChild]:
+        return self._children
+
+    def samples(self, values: Optional[Dict[Tuple[str, ...], _HistogramChild]] = None) -> Iterable[str]:
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for labels, child in (self._children if values is None else values).items():
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                le = 'le="' + bound + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_number(child.sum)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class StageTimer:
+    """
+    Context manager que observa a duração de um estágio.
+    """
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class UpstreamTrace:
+    """
+    Callback da extensão "trace" do httpx/httpcore para uma requisição ao
+    provedor: mede o estabelecimento de conexão (só quando uma nova é aberta)
+    e o tempo até os headers da resposta (primeiro byte).
+    """
+
+    __slots__ = ("registry", "labels", "start", "connect_start", "connect_end", "ttfb")
+
+    def __init__(self, registry: "MetricsRegistry", provider: str, file_type: str):
+        self.registry = registry
+        self.labels = (provider, file_type)
+        self.start = time.perf_counter()
+        self.connect_start: Optional[float] = None
+        self.connect_end: Optional[float] = None
+        self.ttfb: Optional[float] = None
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.started":
+            self.connect_start = time.perf_counter()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # Com TLS, o fim do handshake substitui o fim do TCP
+            self.connect_end = time.perf_counter()
+        elif event.endswith(".receive_response_headers.complete") and self.ttfb is None:
+            now = time.perf_counter()
+            self.ttfb = now - self.start
+            stages = self.registry.stage_seconds
+            if self.connect_start is not None and self.connect_end is not None:
+                stages.observe(self.connect_end - self.connect_start, "upstream_connect", *self.labels)
+            stages.observe(self.ttfb, "upstream_ttfb", *self.labels)
+
+
+class MetricsRegistry:
+    """
+    Registro das métricas da aplicação e exposição no formato texto.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self.stage_seconds = self.register(Histogram(
+            "extractor_stage_seconds",
+            "Duração de cada estágio da extração",
+            ("stage", "provider", "file_type")
+        ))
+        self.http_requests = self.register(Counter(
+            "extractor_http_requests_total",
+            "Requisições HTTP atendidas",
+            ("handler", "method", "status")
+        ))
+        self.http_request_seconds = self.register(Histogram(
+            "extractor_http_request_seconds",
+            "Duração das requisições HTTP (até o fim da resposta)",
+            ("handler",)
+        ))
+        self.http_request_bytes = self.register(Counter(
+            "extractor_http_request_bytes_total",
+            "Bytes recebidos no corpo das requisições HTTP",
+            ("handler",)
+        ))
+        self.http_response_bytes = self.register(Counter(
+            "extractor_http_response_bytes_total",
+            "Bytes enviados no corpo das respostas HTTP",
+            ("handler",)
+        ))
+        self.http_in_flight = self.register(Gauge(
+            "extractor_http_requests_in_flight",
+            "Requisições HTTP em andamento"
+        ))
+        self.upstream_responses = self.register(Counter(
+            "extractor_upstream_responses_total",
+            "Respostas dos provedores por status HTTP (error = sem resposta)",
+            ("provider", "status")
+        ))
+        self.upstream_request_bytes = self.register(Counter(
+            "extractor_upstream_request_bytes_total",
+            "Bytes enviados aos provedores",
+            ("provider",)
+        ))
+        self.upstream_response_bytes = self.register(Counter(
+            "extractor_upstream_response_bytes_total",
+            "Bytes recebidos dos provedores",
+            ("provider",)
+        ))
+        self.multiprocess: Optional[MultiprocessStore] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_function(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        function: Callable[[], Dict[Tuple[str, ...], float]],
+        kind: str = "gauge"
+    ) -> FunctionMetric:
+        """
+        Registra uma métrica lida de outro serviço a cada scrape.
+        """
+        return self.register(FunctionMetric(name, documentation, labelnames, function, kind))
+
+    def time_stage(self, stage: str, provider: str, file_type: str) -> StageTimer:
+        return StageTimer(self.stage_seconds, (stage, provider, file_type))
+
+    def observe_stage(self, stage: str, provider: str, file_type: str, seconds: float) -> None:
+        self.stage_seconds.observe(seconds, stage, provider, file_type)
+
+    def observe_validation(self, provider: str, file_type: str) -> None:
+        """
+        Estágio de validação: do início da requisição (leitura e validação
+        do corpo) até o endpoint ter os dados validados.
+        """
+        started = request_started.get()
+        if started is not None:
+            self.stage_seconds.observe(time.perf_counter() - started, "validation", provider, file_type)
+
+    def upstream_trace(self, provider: str, file_type: str) -> Optional[UpstreamTrace]:
+        return UpstreamTrace(self, provider, file_type) if settings.metrics_enabled else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Valores brutos de todas as séries deste processo (serializáveis).
+        Chamado no event loop, onde as séries são alteradas.
+        """
+        series: Dict[str, List[Any]] = {}
+        for metric in self._metrics:
+            if metric.kind == "histogram":
+                series[metric.name] = [
+                    [list(labels), list(child.counts), child.sum]
+                    for labels, child in metric.values().items()
+                ]
+            else:
+                series[metric.name] = [[list(labels), value] for labels, value in metric.values().items()]
+        return {"pid": os.getpid(), "series": series}
+
+    def render(self, merged: Optional[Dict[str, Dict[Tuple[str, ...], Any]]] = None) -> str:
+        """
+        Texto de exposição das séries deste processo ou, com `merged`,
+        das séries agregadas entre processos.
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(None if merged is None else merged.get(metric.name, {})))
+        return "\n".join(lines) + "\n"
+
+    async def render_all(self) -> str:
+        """
+        Exposição para o scrape: agregada entre processos quando configurado.
+        """
+        if self.multiprocess is None:
+            return self.render()
+        snapshot = self.snapshot()
+        await asyncio.to_thread(self.multiprocess.write, snapshot)
+        return self.render(await asyncio.to_thread(self.multiprocess.collect))
+
+    def start_multiprocess(self, directory: str, interval: float) -> None:
+        """
+        Passa a gravar snapshots periódicos no diretório compartilhado.
+        """
+        self.multiprocess = MultiprocessStore(directory, {m.name: m.kind for m in self._metrics})
+        self._flush_task = asyncio.create_task(self._flush_loop(interval))
+        logger.info(f"Métricas multiprocesso em {directory} (a cada {interval}s)")
+
+    async def stop_multiprocess(self) -> None:
+        """
+        Grava o snapshot final do processo (seus contadores continuam somados).
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self.multiprocess is not None:
+            await asyncio.to_thread(self.multiprocess.write, self.snapshot())
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.multiprocess.write, self.snapshot())
+            except OSError as e:
+                logger.warning(f"Falha ao gravar snapshot de métricas: {e}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiprocessStore:
+    """
+    Snapshots das métricas de cada processo em {diretório}/{pid}.json.
+
+    Contadores e histogramas são somados entre todos os snapshots, inclusive
+    de workers já encerrados (reciclados pelo gunicorn), para que os totais
+    continuem monotônicos; gauges só contam processos vivos. Os snapshots de
+    processos mortos são incorporados a archive.json e removidos, sob um
+    flock, por quem estiver atendendo o scrape.
+    """
+
+    ARCHIVE = "archive.json"
+    LOCK = ".lock"
+
+    def __init__(self, directory: str, kinds: Dict[str, str]):
+        self.directory = directory
+        self.kinds = kinds
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, snapshot: Dict[str, Any]) -> None:
+        path = os.path.join(self.directory, f"{snapshot['pid']}.json")
+        self._write_file(path, snapshot)
+
+    def _write_file(self, path: str, data: Dict[str, Any]) -> None:
+        # Escrita atômica: quem lê nunca vê um arquivo pela metade
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(temporary, path)
+
+    def _read_file(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+    def _merge(
+        self,
+        merged: Dict[str, Dict[Tuple[str, ...], Any]],
+        snapshot: Dict[str, Any],
+        include_gauges: bool
+    ) -> None:
+        for name, values in snapshot.get("series", {}).items():
+            kind = self.kinds.get(name)
+            if kind is None or (kind == "gauge" and not include_gauges):
+                continue
+            series = merged.setdefault(name, {})
+            for entry in values:
+                labels = tuple(entry[0])
+                if kind == "histogram":
+                    child = series.get(labels)
+                    if child is None:
+                        child = series[labels] = _HistogramChild(len(entry[1]))
+                    if len(child.counts) == len(entry[1]):
+                        child.counts = [a + b for a, b in zip(child.counts, entry[1])]
+                        child.sum += entry[2]
+                else:
+                    series[labels] = series.get(labels, 0.0) + entry[1]
+
+    def _to_snapshot(self, merged: Dict[str, Dict[Tuple[str, ...], Any]]) -> Dict[str, Any]:
+        series: Dict[str, List[Any]] = {}
+        for name, values in merged.items():
+            if self.kinds.get(name) == "histogram":
+                series[name] = [[list(labels), child.counts, child.sum] for labels, child in values.items()]
+            else:
+                series[name] = [[list(labels), value] for labels, value in values.items()]
+        return {"pid": 0, "series": series}
+
+    def collect(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """
+        Séries agregadas de todos os processos (chamado fora do event loop).
+        """
+        archive_path = os.path.join(self.directory, self.ARCHIVE)
+        with open(os.path.join(self.directory, self.LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                archived: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+                archive = self._read_file(archive_path)
+                if archive is not None:
+                    self._merge(archived, archive, include_gauges=False)
+                live: List[Dict[str, Any]] = []
+                dead: List[str] = []
+                for name in os.listdir(self.directory):
+                    if not name.endswith(".json") or name == self.ARCHIVE:
+                        continue
+                    pid = name[:-len(".json")]
+                    if not pid.isdigit():
+                        continue
+                    path = os.path.join(self.directory, name)
+                    snapshot = self._read_file(path)
+                    if snapshot is None:
+                        continue
+                    if _pid_alive(int(pid)):
+                        live.append(snapshot)
+                    else:
+                        self._merge(archived, snapshot, include_gauges=False)
+                        dead.append(path)
+                if dead:
+                    self._write_file(archive_path, self._to_snapshot(archived))
+                    for path in dead:
+                        os.remove(path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        merged = archived
+        for snapshot in live:
+            self._merge(merged, snapshot, include_gauges=True)
+        return merged
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro: contagem, duração, bytes e requisições em andamento,
+    rotuladas pelo template da rota (sem ids de path, cardinalidade fixa).
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        start = time.perf_counter()
+        request_started.set(start)
+        received = 0
+        sent = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        registry.http_in_flight.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            registry.http_in_flight.dec()
+            # O roteador grava a rota encontrada no próprio scope
+            route = scope.get("route")
+            handler = getattr(route, "path", None) or "unmatched"
+            registry.http_requests.inc(handler, scope["method"], str(status))
+            registry.http_request_seconds.observe(time.perf_counter() - start, handler)
+            if received:
+                registry.http_request_bytes.inc(handler, amount=received)
+            if sent:
+                registry.http_response_bytes.inc(handler, amount=sent)
+
+
+# Instância única compartilhada pela aplicação
+metrics = MetricsRegistry()
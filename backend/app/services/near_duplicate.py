@@ -0,0 +1,698 @@
+"""
+Detecção de quase-duplicatas por hash perceptual.
+Um documento fotografado ou escaneado de novo tem bytes diferentes (o cache
+por SHA-256 não o reconhece), mas a mesma aparência: o dHash da imagem (ou
+da maior imagem de cada página do PDF) fica a poucos bits do original, e a
+extração anterior, guardada no cache de extrações, é reaproveitada.
+
+Cada página gera dois hashes de 64 bits (gradientes horizontal e vertical);
+os dois precisam estar dentro do limite de distância de Hamming. O índice
+(multi-index hashing) divide o hash horizontal em 3 blocos: pelo princípio
+da casa dos pombos, um hash a distância <= r tem algum bloco a distância
+<= r // 3 do consultado, então basta sondar as variações desses blocos em
+3 tabelas e conferir os poucos candidatos.
+
+O hash reflete sobretudo o modelo do documento (fundo, brasão, foto,
+rótulos), não os dados da pessoa: dois documentos do mesmo modelo de
+pessoas diferentes podem ficar a 1-2 bits. Por isso a extração só é
+reaproveitada se o conteúdo confirmar: o OCR local do novo arquivo precisa
+ler o mesmo CPF (ou registro/RG, ou nome) da extração em cache. Sem essa
+confirmação a semelhança é só uma dica e o provedor é consultado.
+"""
+
+import asyncio
+import fcntl
+import io
+import logging
+import os
+import re
+import struct
+import unicodedata
+import time
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, combinations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import orjson
+from PIL import Image, ImageOps
+from PyPDF2 import PdfReader
+from ..models import DocumentContent, DocumentData
+from ..config import get_settings
+from .cpu_pool import cpu_pool
+from .image_preprocessor import IMAGE_TYPES
+from .local_ocr import local_ocr
+from .pdf_service import PDF_TYPE
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Hashes (horizontal, vertical) de cada página
+Signature = Tuple[Tuple[int, int], ...]
+
+# Blocos (deslocamento, bits) do hash horizontal usados nas tabelas
+CHUNKS = ((0, 22), (22, 21), (43, 21))
+# Maior distância aceita: acima disso as sondagens por bloco explodem
+MAX_THRESHOLD = 8
+# Bits ligados mínimos (nos dois hashes) para a página ter detalhe suficiente:
+# imagens lisas ou quase (página em branco) teriam hashes todos iguais
+MIN_HASH_BITS = 8
+# Campos que identificam a pessoa, na ordem de confiança da conferência
+IDENTIFIERS = ("cpf", "numeroRegistro", "rg")
+# Snapshot com o instante de inclusão de cada entrada (NDUP1: sem ele)
+SNAPSHOT_MAGIC = b"NDUP2"
+LEGACY_SNAPSHOT_MAGIC = b"NDUP1"
+SNAPSHOT_HEADER = struct.Struct("<5sII")
+
+
+def _dhash(image: Image.Image) -> Tuple[int, int]:
+    """
+    dHash horizontal (9x8) e vertical (8x9) de uma imagem em tons de cinza.
+    """
+    horizontal = list(image.resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    vertical = list(image.resize((8, 9), Image.Resampling.LANCZOS).getdata())
+    h = 0
+    v = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (horizontal[row * 9 + col] > horizontal[row * 9 + col + 1])
+            v = (v << 1) | (vertical[row * 8 + col] > vertical[(row + 1) * 8 + col])
+    return h, v
+
+
+def image_hash(data: bytes) -> Tuple[int, int]:
+    with Image.open(io.BytesIO(data)) as original:
+        # JPEG decodificado já em escala reduzida (muito mais rápido)
+        original.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(original).convert("L")
+        if max(image.size) > 256:
+            image = image.reduce(max(1, max(image.size) // 128))
+        return _dhash(image)
+
+
+def document_signature(data: bytes, file_type: str, max_pages: int) -> Optional[Signature]:
+    """
+    Hashes por página (função de módulo para ser serializável no pool).
+    PDFs sem imagem em alguma página (gerados digitalmente) e páginas sem
+    detalhe suficiente não têm assinatura.
+    """
+    if file_type in IMAGE_TYPES:
+        hashes = [image_hash(data)]
+    elif file_type == PDF_TYPE:
+        reader = PdfReader(io.BytesIO(data))
+        if len(reader.pages) > max_pages:
+            return None
+        hashes = []
+        for page in reader.pages:
+            images = page.images
+            if not images:
+                return None
+            # Página escaneada: a maior imagem é a digitalização
+            largest = max(images, key=lambda image: len(image.data))
+            hashes.append(image_hash(largest.data))
+    else:
+        return None
+    if not hashes or any(h.bit_count() + v.bit_count() < MIN_HASH_BITS for h, v in hashes):
+        return None
+    return tuple(hashes)
+
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _name(value: Optional[str]) -> str:
+    folded = unicodedata.normalize("NFKD", value or "").encode("ascii", "ignore").decode()
+    return " ".join(folded.upper().split())
+
+
+def same_person(read: Dict[str, str], cached: DocumentData) -> Optional[bool]:
+    """
+    Compara os campos lidos no novo arquivo com a extração em cache:
+    o primeiro identificador presente nos dois lados decide; sem nenhum,
+    o nome. None quando não há o que comparar.
+    """
+    for name in IDENTIFIERS:
+        read_value = _digits(read.get(name))
+        cached_value = _digits(getattr(cached, name))
+        if read_value and cached_value:
+            return read_value == cached_value
+    read_name = _name(read.get("nome"))
+    cached_name = _name(cached.nome)
+    if read_name and cached_name:
+        return read_name == cached_name
+    return None
+
+
+def _probe_masks(bits: int, radius: int) -> List[int]:
+    """
+    Máscaras com até `radius` bits ligados num bloco de `bits` bits.
+    """
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in combinations(range(bits), count):
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            masks.append(mask)
+    return masks
+
+
+def _build_table(values: array, shift: int, bits: int) -> Tuple[array, array]:
+    """
+    Tabela de um bloco em formato CSR (ordenação por contagem): as posições
+    com valor k no bloco ficam em order[offsets[k]:offsets[k + 1]].
+    """
+    mask = (1 << bits) - 1
+    counts = array("I", bytes(4 * ((1 << bits) + 1)))
+    keys = [(value >> shift) & mask for value in values]
+    for key in keys:
+        counts[key + 1] += 1
+    offsets = array("I", accumulate(counts))
+    cursor = offsets[:-1]
+    order = array("I", bytes(4 * len(keys)))
+    for position, key in enumerate(keys):
+        order[cursor[key]] = position
+        cursor[key] += 1
+    return offsets, order
+
+
+def newest_entries(snapshot: Dict[str, Any], limit: int) -> Tuple[Dict[str, Any], float]:
+    """
+    As `limit` entradas mais recentes do snapshot, em ordem de inclusão, e
+    o instante da mais nova descartada (0.0 se nenhuma foi).
+    """
+    added_at = snapshot["added_at"]
+    order = sorted(range(len(added_at)), key=added_at.__getitem__)
+    dropped = added_at[order[-limit - 1]] if len(order) > limit else 0.0
+    keep = order[-limit:]
+    if keep == list(range(len(added_at))):
+        return snapshot, dropped
+    digests = snapshot["digests"]
+    extra = snapshot["extra"]
+    return {
+        "horizontal": array("Q", (snapshot["horizontal"][i] for i in keep)),
+        "vertical": array("Q", (snapshot["vertical"][i] for i in keep)),
+        "pages": array("H", (snapshot["pages"][i] for i in keep)),
+        "added_at": array("d", (added_at[i] for i in keep)),
+        "digests": b"".join(digests[i * 32:(i + 1) * 32] for i in keep),
+        "extra": {new: extra[old] for new, old in enumerate(keep) if old in extra},
+    }, dropped
+
+
+class HammingIndex:
+    """
+    Índice em arrays compactos: hashes (array de uint64), número de páginas,
+    instante de inclusão e SHA-256 do arquivo original (32 bytes por
+    entrada). Páginas além da primeira ficam num dicionário à parte (só
+    PDFs com várias páginas).
+
+    O hash horizontal é dividido em 3 blocos de ~21 bits (cerca de log2 de
+    1M entradas, poucos candidatos por sondagem), cada um com uma tabela
+    CSR. Entradas novas vão para tabelas pequenas em dicionários até a
+    próxima reconstrução (rebuild, fora do event loop). Cheio, sobrescreve
+    as entradas mais antigas (buffer circular); posições que mudaram de
+    valor podem continuar listadas na tabela antiga, mas a conferência usa
+    sempre o hash atual.
+    """
+
+    # Entradas novas que disparam a reconstrução das tabelas
+    REBUILD_AFTER = 50000
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self.horizontal = array("Q")
+        self.vertical = array("Q")
+        self.pages = array("H")
+        self.added_at = array("d")
+        self.digests = bytearray()
+        self.extra: Dict[int, List[Tuple[int, int]]] = {}
+        # Instante da entrada mais nova já descartada: o que for mais antigo
+        # (ex.: vindo do snapshot de outro processo) não volta ao índice
+        self.evicted_before = 0.0
+        self._tables: List[Tuple[array, array]] = [(array("I", [0]), array("I")) for _ in CHUNKS]
+        self._recent: List[Dict[int, List[int]]] = [{} for _ in CHUNKS]
+        self._recent_count = 0
+        # Durante uma reconstrução, o que entra depois do início
+        self._pending: Optional[List[Dict[int, List[int]]]] = None
+        self._pending_count = 0
+        self._next = 0
+        self._masks: Dict[Tuple[int, int], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.horizontal)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self._pending is None and self._recent_count >= self.REBUILD_AFTER
+
+    def digest(self, position: int) -> bytes:
+        return bytes(self.digests[position * 32:(position + 1) * 32])
+
+    def _link(self, tables: List[Dict[int, List[int]]], position: int, value: int) -> None:
+        for (shift, bits), table in zip(CHUNKS, tables):
+            table.setdefault((value >> shift) & ((1 << bits) - 1), []).append(position)
+
+    def add(self, signature: Signature, digest: bytes, added_at: Optional[float] = None) -> None:
+        h, v = signature[0]
+        if added_at is None:
+            added_at = time.time()
+        if len(self) < self.max_entries:
+            position = len(self)
+            self.horizontal.append(h)
+            self.vertical.append(v)
+            self.pages.append(len(signature))
+            self.added_at.append(added_at)
+            self.digests += digest
+        else:
+            position = self._next
+            self._next = (self._next + 1) % self.max_entries
+            self.evicted_before = max(self.evicted_before, self.added_at[position])
+            self.horizontal[position] = h
+            self.vertical[position] = v
+            self.pages[position] = len(signature)
+            self.added_at[position] = added_at
+            self.digests[position * 32:(position + 1) * 32] = digest
+            self.extra.pop(position, None)
+        if len(signature) > 1:
+            self.extra[position] = list(signature[1:])
+        self._link(self._recent, position, h)
+        self._recent_count += 1
+        if self._pending is not None:
+            self._link(self._pending, position, h)
+            self._pending_count += 1
+
+    def load(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Substitui o conteúdo pelas entradas mais recentes do snapshot e
+        reconstrói as tabelas (bloqueante). Em ordem de inclusão, o buffer
+        circular volta a sobrescrever a mais antiga primeiro.
+        """
+        snapshot, self.evicted_before = newest_entries(snapshot, self.max_entries)
+        self.horizontal = snapshot["horizontal"]
+        self.vertical = snapshot["vertical"]
+        self.pages = snapshot["pages"]
+        self.added_at = snapshot["added_at"]
+        self.digests = bytearray(snapshot["digests"])
+        self.extra = {k: [tuple(page) for page in v] for k, v in snapshot["extra"].items()}
+        self._next = 0
+        self._tables = [_build_table(self.horizontal, shift, bits) for shift, bits in CHUNKS]
+        self._recent = [{} for _ in CHUNKS]
+        self._recent_count = 0
+
+    def start_rebuild(self) -> array:
+        """
+        Início da reconstrução (no event loop): cópia dos hashes a indexar.
+        """
+        self._pending = [{} for _ in CHUNKS]
+        self._pending_count = 0
+        return self.horizontal[:]
+
+    @staticmethod
+    def build_tables(values: array) -> List[Tuple[array, array]]:
+        return [_build_table(values, shift, bits) for shift, bits in CHUNKS]
+
+    def finish_rebuild(self, tables: Optional[List[Tuple[array, array]]]) -> None:
+        """
+        Troca as tabelas (no event loop); o que entrou durante a
+        reconstrução continua nas tabelas pequenas.
+        """
+        if tables is not None:
+            self._tables = tables
+            self._recent = self._pending
+            self._recent_count = self._pending_count
+        self._pending = None
+        self._pending_count = 0
+
+    def search(self, signature: Signature, threshold: int) -> List[Tuple[int, int]]:
+        """
+        (distância, posição) das entradas com todas as páginas dentro do
+        limite, da mais próxima para a mais distante. A distância é a maior
+        entre os hashes de todas as páginas.
+        """
+        h, v = signature[0]
+        radius = threshold // len(CHUNKS)
+        candidates = set()
+        for (shift, bits), (offsets, order), recent in zip(CHUNKS, self._tables, self._recent):
+            masks = self._masks.get((bits, radius))
+            if masks is None:
+                masks = self._masks[(bits, radius)] = _probe_masks(bits, radius)
+            key = (h >> shift) & ((1 << bits) - 1)
+            # Sem tabela CSR até a primeira reconstrução
+            built = len(offsets) > 1
+            for mask in masks:
+                probe = key ^ mask
+                if built:
+                    start, end = offsets[probe], offsets[probe + 1]
+                    if start != end:
+                        candidates.update(order[start:end])
+                if recent:
+                    positions = recent.get(probe)
+                    if positions is not None:
+                        candidates.update(positions)
+
+        matches = []
+        horizontal, vertical, pages = self.horizontal, self.vertical, self.pages
+        for position in candidates:
+            distance = (horizontal[position] ^ h).bit_count()
+            if distance > threshold or pages[position] != len(signature):
+                continue
+            distance = max(distance, (vertical[position] ^ v).bit_count())
+            for (eh, ev), (sh, sv) in zip(self.extra.get(position, ()), signature[1:]):
+                distance = max(distance, (eh ^ sh).bit_count(), (ev ^ sv).bit_count())
+            if distance <= threshold:
+                matches.append((distance, position))
+        matches.sort()
+        return matches
+
+    def export(self) -> Dict[str, Any]:
+        """
+        Cópia consistente das entradas para o snapshot.
+        """
+        count = len(self)
+        return {
+            "horizontal": self.horizontal[:count],
+            "vertical": self.vertical[:count],
+            "pages": self.pages[:count],
+            "added_at": self.added_at[:count],
+            "digests": bytes(self.digests[:count * 32]),
+            "extra": {position: list(pages) for position, pages in self.extra.items() if position < count},
+        }
+
+    @staticmethod
+    def entries(snapshot: Dict[str, Any]) -> Iterable[Tuple[Signature, bytes, float]]:
+        for position in range(len(snapshot["horizontal"])):
+            signature = ((snapshot["horizontal"][position], snapshot["vertical"][position]),)
+            extra = snapshot["extra"].get(position)
+            if extra:
+                signature += tuple(tuple(page) for page in extra)
+            yield (
+                signature,
+                snapshot["digests"][position * 32:(position + 1) * 32],
+                snapshot["added_at"][position]
+            )
+
+
+def write_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    extra = orjson.dumps({str(k): v for k, v in snapshot["extra"].items()})
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(snapshot["horizontal"]), len(extra)))
+        snapshot["horizontal"].tofile(f)
+        snapshot["vertical"].tofile(f)
+        snapshot["pages"].tofile(f)
+        snapshot["added_at"].tofile(f)
+        f.write(snapshot["digests"])
+        f.write(extra)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            magic, count, extra_size = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+            if magic not in (SNAPSHOT_MAGIC, LEGACY_SNAPSHOT_MAGIC):
+                raise ValueError("formato desconhecido")
+            snapshot: Dict[str, Any] = {}
+            fields = [("horizontal", "Q"), ("vertical", "Q"), ("pages", "H")]
+            if magic == SNAPSHOT_MAGIC:
+                fields.append(("added_at", "d"))
+            for name, typecode in fields:
+                values = array(typecode)
+                values.fromfile(f, count)
+                snapshot[name] = values
+            if magic == LEGACY_SNAPSHOT_MAGIC:
+                # Sem instantes: todas igualmente antigas, na ordem do arquivo
+                snapshot["added_at"] = array("d", bytes(8 * count))
+            snapshot["digests"] = f.read(count * 32)
+            snapshot["extra"] = {int(k): v for k, v in orjson.loads(f.read(extra_size) or b"{}").items()}
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, struct.error) as e:
+        logger.warning(f"Snapshot de quase-duplicatas ilegível ({path}): {e}")
+        return None
+    return snapshot
+
+
+class NearDuplicateIndex:
+    """
+    Estágio de quase-duplicatas: assinatura no pool de CPU, consulta e
+    inclusão no índice, snapshot periódico em disco e contadores.
+
+    Com vários processos apontando para o mesmo snapshot, a gravação junta
+    ao arquivo as entradas dos outros (e as incorpora ao índice local). O
+    arquivo fica limitado a max_entries, com as entradas mais recentes.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        threshold: int,
+        max_entries: int,
+        snapshot_path: str = "",
+        snapshot_interval: float = 300.0
+    ):
+        self.enabled = enabled
+        self.threshold = min(max(0, threshold), MAX_THRESHOLD)
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.index = HammingIndex(max_entries)
+        # Assinaturas recentes por SHA-256 (o modo auto consulta dois provedores)
+        self._signatures: "OrderedDict[str, Optional[Signature]]" = OrderedDict()
+        self._snapshot_mtime: Optional[float] = None
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self.hashed = 0
+        self.lookups = 0
+        self.matches = 0
+        # Conferência pelo conteúdo: confirmadas, de outra pessoa, sem como decidir
+        self.confirmed = 0
+        self.rejected = 0
+        self.unconfirmed = 0
+        self.added = 0
+        self.failures = 0
+        self.lookup_time = 0.0
+        self.hash_time = 0.0
+
+    async def startup(self) -> None:
+        """
+        Carrega o snapshot (se houver) e inicia a gravação periódica.
+        """
+        if not self.enabled or not self.snapshot_path:
+            return
+        snapshot = await asyncio.to_thread(read_snapshot, self.snapshot_path)
+        if snapshot is not None:
+            await asyncio.to_thread(self.index.load, snapshot)
+            self._snapshot_mtime = os.path.getmtime(self.snapshot_path)
+            logger.info(f"{len(self.index)} hash(es) de quase-duplicatas carregado(s) de {self.snapshot_path}")
+        self._task = asyncio.create_task(self._snapshot_loop())
+
+    async def shutdown(self) -> None:
+        """
+        Grava o snapshot final.
+        """
+        if self._rebuild_task is not None:
+            await asyncio.gather(self._rebuild_task, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self.save()
+
+    async def signature(self, document: DocumentContent, file_type: str) -> Optional[Signature]:
+        """
+        Assinatura do documento (None se não for possível calculá-la).
+        """
+        key = document.sha256
+        if key in self._signatures:
+            self._signatures.move_to_end(key)
+            return self._signatures[key]
+        start_time = time.perf_counter()
+        try:
+            signature = await cpu_pool.run(
+                document_signature, document.data, file_type, settings.pdf_max_pages
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Falha no hash perceptual: {str(e)}")
+            signature = None
+        self.hashed += 1
+        self.hash_time += time.perf_counter() - start_time
+        self._signatures[key] = signature
+        while len(self._signatures) > 256:
+            self._signatures.popitem(last=False)
+        return signature
+
+    async def find(self, document: DocumentContent, file_type: str) -> List[Tuple[int, str]]:
+        """
+        (distância, SHA-256 do original) dos documentos parecidos já
+        extraídos, do mais próximo para o mais distante.
+        """
+        if not self.enabled:
+            return []
+        signature = await self.signature(document, file_type)
+        if signature is None:
+            return []
+        start_time = time.perf_counter()
+        own = bytes.fromhex(document.sha256)
+        matches = [
+            (distance, self.index.digest(position).hex())
+            for distance, position in self.index.search(signature, self.threshold)
+            if self.index.digest(position) != own
+        ]
+        self.lookups += 1
+        self.lookup_time += time.perf_counter() - start_time
+        return matches
+
+    async def confirm(
+        self,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str],
+        cached: DocumentData
+    ) -> bool:
+        """
+        Confere pelo OCR do novo arquivo se a extração em cache é da mesma
+        pessoa. Sem OCR disponível (ou PDFs) nada é confirmado.
+        """
+        read = await local_ocr.read_fields(document, file_type, document_type)
+        verdict = same_person(read, cached) if read else None
+        if verdict:
+            self.confirmed += 1
+            return True
+        if verdict is False:
+            self.rejected += 1
+        else:
+            self.unconfirmed += 1
+        return False
+
+    async def remember(self, document: DocumentContent, file_type: str) -> None:
+        """
+        Inclui o documento recém-extraído no índice.
+        """
+        if not self.enabled:
+            return
+        signature = await self.signature(document, file_type)
+        if signature is None:
+            return
+        digest = bytes.fromhex(document.sha256)
+        if any(self.index.digest(position) == digest for _, position in self.index.search(signature, 0)):
+            return
+        self._add(signature, digest)
+        self.added += 1
+        self._dirty = True
+
+    def _add(self, signature: Signature, digest: bytes, added_at: Optional[float] = None) -> None:
+        self.index.add(signature, digest, added_at)
+        if self.index.needs_rebuild and self._rebuild_task is None:
+            self._rebuild_task = asyncio.create_task(self._rebuild())
+
+    async def _rebuild(self) -> None:
+        """
+        Reconstrói as tabelas CSR fora do event loop.
+        """
+        start_time = time.perf_counter()
+        values = self.index.start_rebuild()
+        tables = None
+        try:
+            tables = await asyncio.to_thread(HammingIndex.build_tables, values)
+        finally:
+            self.index.finish_rebuild(tables)
+            self._rebuild_task = None
+        logger.info(
+            f"Índice de quase-duplicatas reconstruído ({len(values)} entradas) "
+            f"em {time.perf_counter() - start_time:.2f}s"
+        )
+
+    async def save(self) -> None:
+        """
+        Grava o snapshot (fora do event loop), juntando as entradas que
+        outros processos gravaram desde a última leitura.
+        """
+        if not self.snapshot_path or not self._dirty:
+            return
+        self._dirty = False
+        foreign = await asyncio.to_thread(self._write_merged, self.index.export())
+        for signature, digest, added_at in foreign:
+            self._add(signature, digest, added_at)
+        if foreign:
+            logger.info(f"{len(foreign)} hash(es) de outros processos incorporado(s) ao índice")
+
+    def _write_merged(self, snapshot: Dict[str, Any]) -> List[Tuple[Signature, bytes, float]]:
+        """
+        Grava o snapshot local somado às entradas que só o arquivo tem,
+        limitado às max_entries mais recentes. Retorna, em ordem de
+        inclusão, as entradas alheias que sobraram e são mais novas que as
+        já descartadas pelo índice local.
+        """
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        foreign: List[Tuple[Signature, bytes, float]] = []
+        with open(f"{self.snapshot_path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                mtime = os.path.getmtime(self.snapshot_path) if os.path.exists(self.snapshot_path) else None
+                if mtime is not None and mtime != self._snapshot_mtime:
+                    stored = read_snapshot(self.snapshot_path)
+                    if stored is not None:
+                        digests = snapshot["digests"]
+                        known = {digests[i:i + 32] for i in range(0, len(digests), 32)}
+                        foreign = [
+                            entry for entry in self.index.entries(stored) if entry[1] not in known
+                        ]
+                        for signature, _, added_at in foreign:
+                            snapshot["horizontal"].append(signature[0][0])
+                            snapshot["vertical"].append(signature[0][1])
+                            snapshot["pages"].append(len(signature))
+                            snapshot["added_at"].append(added_at)
+                            if len(signature) > 1:
+                                snapshot["extra"][len(snapshot["horizontal"]) - 1] = list(signature[1:])
+                        snapshot["digests"] += b"".join(digest for _, digest, _ in foreign)
+                        snapshot, dropped = newest_entries(snapshot, self.index.max_entries)
+                        cutoff = max(dropped, self.index.evicted_before)
+                        foreign = sorted(
+                            (entry for entry in foreign if entry[2] > cutoff), key=lambda entry: entry[2]
+                        )
+                write_snapshot(self.snapshot_path, snapshot)
+                self._snapshot_mtime = os.path.getmtime(self.snapshot_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return foreign
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.save()
+            except OSError as e:
+                self._dirty = True
+                logger.warning(f"Falha ao gravar o snapshot de quase-duplicatas: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": len(self.index),
+            "max_entries": self.index.max_entries,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "confirmed": self.confirmed,
+            "rejected": self.rejected,
+            "unconfirmed": self.unconfirmed,
+            "added": self.added,
+            "failures": self.failures,
+            "avg_lookup_us": round(self.lookup_time * 1e6 / self.lookups, 1) if self.lookups else 0.0,
+            "avg_hash_ms": round(self.hash_time * 1000 / self.hashed, 1) if self.hashed else 0.0,
+            "snapshot_path": self.snapshot_path or None,
+        }
+
+
+# Instância única compartilhada pela aplicação
+near_duplicate_index = NearDuplicateIndex(
+    enabled=settings.near_duplicate_enabled,
+    threshold=settings.near_duplicate_threshold,
+    max_entries=settings.near_duplicate_max_entries,
+    snapshot_path=settings.near_duplicate_snapshot_path,
+    snapshot_interval=settings.near_duplicate_snapshot_interval
+)
@@ -0,0 +1,102 @@
+"""
+Serviço para APIs compatíveis com a da OpenAI (chat/completions com imagem).
+Atende a própria OpenAI e endpoints de visão auto-hospedados (vLLM, Ollama)
+que expõem o mesmo formato.
+"""
+
+from typing import Dict, Any, Iterable, Optional, Tuple
+from ..models import DocumentData
+from ..config import get_settings
+from .payload import DOCUMENT_PLACEHOLDER
+from .provider_base import ExtractionProvider
+from .structured_output import TOOL_NAME, document_json_schema
+
+settings = get_settings()
+
+
+class OpenAICompatibleService(ExtractionProvider):
+    """
+    Classe que encapsula a comunicação com APIs no formato da OpenAI.
+    """
+
+    NAME = "openai"
+    LABEL = "OpenAI"
+    MODEL = settings.openai_model
+    KEY_PREFIX = settings.openai_key_prefix
+    BASE_URL = f"{settings.openai_base_url.rstrip('/')}/v1/chat/completions"
+
+    def __init__(self):
+        super().__init__(
+            max_concurrency=settings.openai_max_concurrency,
+            timeout=settings.openai_timeout,
+            cost_per_call=settings.openai_cost_per_call
+        )
+
+    def build_payload(
+        self,
+        file_type: str,
+        document_type: Optional[str] = None,
+        reask: Optional[Dict[str, Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Payload de chat/completions com o arquivo em data URI (placeholder
+        no lugar do base64): imagens como image_url, PDFs como file.
+        No modo estruturado a resposta segue o JSON Schema do DocumentData
+        (response_format json_schema).
+        """
+        prompt, fields = self.prompt_and_fields(document_type, reask)
+        data_uri = f"data:{file_type};base64,{DOCUMENT_PLACEHOLDER}"
+        if file_type == "application/pdf":
+            document_block = {
+                "type": "file",
+                "file": {"filename": "documento.pdf", "file_data": data_uri}
+            }
+        else:
+            document_block = {"type": "image_url", "image_url": {"url": data_uri}}
+        payload = {
+            "model": self.MODEL,
+            "temperature": 0.1,
+            "max_tokens": settings.structured_max_tokens if settings.structured_output else 3000,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    document_block
+                ]
+            }]
+        }
+        if settings.structured_output:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": TOOL_NAME,
+                    "schema": document_json_schema(document_type, fields)
+                }
+            }
+        return payload
+
+    def stream_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {**payload, "stream": True}
+
+    def url(self, api_key: str, stream: bool = False) -> str:
+        return self.BASE_URL
+
+    def headers(self, api_key: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def usage(self, data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        usage = data.get("usage") or {}
+        return {
+            "input_tokens": usage.get("prompt_tokens"),
+            "output_tokens": usage.get("completion_tokens"),
+            "cache_read_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+        }
+
+    def parse_response(self, data: Dict[str, Any]) -> DocumentData:
+        message = (data.get("choices") or [{}])[0].get("message") or {}
+        # O JSON vem como texto, mesmo com response_format
+        return self.parse_text(message.get("content") or "")
+
+    def stream_texts(self, event: Dict[str, Any]) -> Iterable[str]:
+        for choice in (event.get("choices") or [])[:1]:
+            yield (choice.get("delta") or {}).get("content")
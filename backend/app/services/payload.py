@@ -0,0 +1,59 @@
+"""
+Montagem do corpo JSON das requisições aos provedores.
+O esqueleto do payload é serializado com orjson e o base64 do arquivo é
+enviado como um pedaço separado, sem ser copiado para dentro do JSON.
+"""
+
+import orjson
+from typing import Any, AsyncIterator, Dict, List
+
+# Marcador substituído pelo base64 do arquivo (só contém caracteres seguros em JSON)
+DOCUMENT_PLACEHOLDER = "__DOCUMENT_BASE64__"
+
+
+class JSONBody:
+    """
+    Corpo JSON em partes: [prefixo, base64, sufixo].
+    Pode ser iterado mais de uma vez (reenvios) e informa o Content-Length exato.
+    """
+
+    __slots__ = ("chunks", "content_length")
+
+    def __init__(self, chunks: List[bytes]):
+        self.chunks = chunks
+        self.content_length = sum(len(chunk) for chunk in chunks)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            yield chunk
+
+    def headers(self) -> Dict[str, str]:
+        """
+        Headers que descrevem o corpo (evita Transfer-Encoding: chunked).
+        """
+        return {
+            "Content-Type": "application/json",
+            "Content-Length": str(self.content_length),
+        }
+
+    def to_bytes(self) -> bytes:
+        """
+        Corpo completo em um único bloco (usado apenas para depuração/benchmarks).
+        """
+        return b"".join(self.chunks)
+
+
+def build_json_body(payload: Dict[str, Any], document_b64: bytes) -> JSONBody:
+    """
+    Serializa o payload substituindo DOCUMENT_PLACEHOLDER pelo base64 do arquivo.
+
+    Args:
+        payload: Payload do provedor contendo o marcador exatamente uma vez
+        document_b64: Conteúdo do arquivo em base64 (ASCII)
+    """
+    skeleton = orjson.dumps(payload)
+    marker = DOCUMENT_PLACEHOLDER.encode("ascii")
+    prefix, separator, suffix = skeleton.partition(marker)
+    if not separator or marker in suffix:
+        raise ValueError("Payload deve conter o marcador do documento exatamente uma vez")
+    return JSONBody([prefix, document_b64, suffix])
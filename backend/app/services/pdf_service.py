@@ -0,0 +1,137 @@
+"""
+Divisão de PDFs em janelas de páginas com PyPDF2.
+Cada janela é enviada ao provedor separadamente (em paralelo, com limite)
+e os resultados por página são combinados numa única resposta.
+"""
+
+import io
+import logging
+import time
+from typing import Dict, Any, List, Optional
+from PyPDF2 import PdfReader, PdfWriter
+from ..models import DocumentContent, DocumentData
+from ..config import get_settings
+from .cpu_pool import cpu_pool
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PDF_TYPE = "application/pdf"
+
+
+def split_pdf(data: bytes, pages_per_chunk: int) -> List[bytes]:
+    """
+    Divide o PDF em janelas de `pages_per_chunk` páginas
+    (função de módulo para ser serializável no pool).
+    """
+    reader = PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    chunks = []
+    for first in range(0, total, pages_per_chunk):
+        writer = PdfWriter()
+        for index in range(first, min(first + pages_per_chunk, total)):
+            writer.add_page(reader.pages[index])
+        output = io.BytesIO()
+        writer.write(output)
+        chunks.append(output.getvalue())
+    return chunks
+
+
+def count_pages(data: bytes) -> int:
+    """
+    Conta as páginas do PDF.
+    """
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def merge_documents(documents: List[DocumentData]) -> DocumentData:
+    """
+    Combina os resultados por página: cada campo recebe o primeiro valor
+    não nulo; tipos de documento distintos são concatenados.
+    """
+    merged: Dict[str, Any] = {}
+    tipos: List[str] = []
+    for document in documents:
+        for field, value in document.model_dump().items():
+            if field == "tipoDocumento":
+                if value and value not in tipos:
+                    tipos.append(value)
+            elif value is not None and merged.get(field) is None:
+                merged[field] = value
+    merged["tipoDocumento"] = " + ".join(tipos) if tipos else "Desconhecido"
+    return DocumentData(**merged)
+
+
+class PDFSplitter:
+    """
+    Estágio de divisão de PDFs com contadores agregados.
+    """
+
+    def __init__(self, enabled: bool, pages_per_chunk: int, max_pages: int):
+        self.enabled = enabled
+        self.pages_per_chunk = max(1, pages_per_chunk)
+        self.max_pages = max_pages
+        self.split_documents = 0
+        self.chunks_created = 0
+        self.failures = 0
+        self.total_time = 0.0
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifica a configuração ativa ("" quando desativado)."""
+        return f"pdf{self.pages_per_chunk}" if self.enabled else ""
+
+    async def split(self, document: DocumentContent, file_type: str) -> Optional[List[DocumentContent]]:
+        """
+        Retorna as janelas do PDF, ou None quando não há o que dividir
+        (não é PDF, estágio desativado, uma única janela ou PDF ilegível).
+
+        Raises:
+            ValueError: PDF com mais páginas que o permitido
+        """
+        if not self.enabled or file_type != PDF_TYPE:
+            return None
+
+        start_time = time.perf_counter()
+        try:
+            pages = await cpu_pool.run(count_pages, document.data)
+        except Exception as e:
+            # PDFs criptografados/corrompidos seguem inteiros para o provedor
+            self.failures += 1
+            logger.warning(f"Não foi possível ler o PDF, enviando inteiro: {str(e)}")
+            return None
+
+        if pages > self.max_pages:
+            raise ValueError(f"PDF com {pages} páginas. Máximo: {self.max_pages}")
+        if pages <= self.pages_per_chunk:
+            return None
+
+        chunks = await cpu_pool.run(split_pdf, document.data, self.pages_per_chunk)
+        self.split_documents += 1
+        self.chunks_created += len(chunks)
+        self.total_time += time.perf_counter() - start_time
+        logger.info(f"PDF com {pages} páginas dividido em {len(chunks)} partes")
+        return [DocumentContent(chunk) for chunk in chunks]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores agregados do estágio.
+        """
+        return {
+            "enabled": self.enabled,
+            "pages_per_chunk": self.pages_per_chunk,
+            "max_pages": self.max_pages,
+            "split_documents": self.split_documents,
+            "chunks_created": self.chunks_created,
+            "failures": self.failures,
+            "avg_split_ms": round(self.total_time * 1000 / self.split_documents, 1)
+            if self.split_documents else 0.0,
+        }
+
+
+# Instância única compartilhada pela aplicação
+pdf_splitter = PDFSplitter(
+    enabled=settings.pdf_split_enabled,
+    pages_per_chunk=settings.pdf_pages_per_chunk,
+    max_pages=settings.pdf_max_pages
+)
@@ -0,0 +1,618 @@
+"""
+Pipeline de extração compartilhado pelos endpoints.
+Coordena cache (exato e de quase-duplicatas), coalescência, OCR local,
+pré-processamento, divisão de PDFs, hedge entre provedores, chamada ao
+provedor escolhido e validação/normalização dos dados extraídos.
+"""
+
+import asyncio
+import time
+import logging
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from ..models import (
+    ExtractionResponse, DocumentData, DocumentContent, TokenUsage, ROUTING_MODES, provider_for_key
+)
+from .provider_registry import provider_registry
+from .cache_service import extraction_cache
+from .near_duplicate import near_duplicate_index
+from .coalescer import extraction_coalescer
+from .local_ocr import LOCAL_PROVIDER, local_ocr
+from .image_preprocessor import image_preprocessor
+from .pdf_service import pdf_splitter, merge_documents
+from .latency_tracker import latency_tracker
+from .hedging import hedging_policy
+from .adaptive_router import adaptive_router
+from .resilience import is_key_specific, resilience
+from .admission import api_key_id
+from .json_stream import IncrementalJSONParser
+from .response_parser import response_parser
+from .structured_output import output_mode
+from .prompts import classify_document, extraction_prompt
+from .validation import document_validator
+from .usage_tracker import RequestUsage, current_usage
+from .metrics import metrics
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ExtractionPipeline:
+    """
+    Executa uma extração a partir de um arquivo já validado
+    e devolve sempre um ExtractionResponse.
+    """
+
+    def __init__(self):
+        # Serviços dos provedores registrados
+        self.services = {service.NAME: service for service in provider_registry.all()}
+        # Limite de chamadas simultâneas declarado por provedor (usado pelo lote)
+        self.limits = {
+            service.NAME: asyncio.Semaphore(service.max_concurrency)
+            for service in provider_registry.all()
+        }
+
+    async def run(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        file_name: str,
+        secondary_api_key: Optional[str] = None,
+        document_type: Optional[str] = None
+    ) -> ExtractionResponse:
+        """
+        Extrai os dados do documento.
+
+        Args:
+            provider: provedor registrado, auto (hedge entre dois) ou adaptive
+                (primário escolhido pela latência observada, hedge no outro)
+            api_key: Chave da API do provedor (primário, no modo auto)
+            document: Conteúdo do arquivo decodificado
+            file_type: Tipo MIME do arquivo
+            file_name: Nome original (apenas para logs)
+            secondary_api_key: Chave do provedor secundário (modos auto e adaptive)
+            document_type: Dica do tipo de documento (senão, pelo nome do arquivo)
+        """
+        start_time = time.time()
+        document_type = classify_document(file_name, document_type)
+        # Tokens e tempo de todas as chamadas feitas por esta requisição
+        usage = RequestUsage()
+        current_usage.set(usage)
+
+        try:
+            if provider == "adaptive":
+                api_key, secondary_api_key = self._route(
+                    api_key, secondary_api_key, file_type, document.size
+                )
+            if provider in ROUTING_MODES:
+                result = await self._run_hedged(
+                    api_key, secondary_api_key, document, file_type, file_name, document_type
+                )
+            else:
+                result = await self._run_single(
+                    provider, api_key, document, file_type, file_name, document_type
+                )
+
+            # Normalização sobre o resultado (também o do cache): a chamada
+            # atual ou a que gerou o cache pode ter pedido campos de novo
+            reasked = result.pop("reasked", None)
+            if document_validator.enabled:
+                with metrics.time_stage("normalization", result["provider"], file_type):
+                    result["data"], result["validation"] = document_validator.validate(
+                        result["data"], reasked
+                    )
+
+            # Retornar resposta de sucesso
+            return ExtractionResponse(
+                success=True,
+                processing_time=round(time.time() - start_time, 2),
+                document_type=document_type,
+                usage=TokenUsage(**usage.as_dict()) if usage.calls else None,
+                **result
+            )
+
+        except ValueError as e:
+            # Erros de validação ou API
+            logger.error(f"Erro de validação: {str(e)}")
+            return ExtractionResponse(
+                success=False,
+                error=str(e),
+                provider=provider,
+                processing_time=round(time.time() - start_time, 2)
+            )
+
+        except Exception as e:
+            # Erros inesperados
+            logger.error(f"Erro inesperado: {str(e)}", exc_info=True)
+            return ExtractionResponse(
+                success=False,
+                error="Erro interno no servidor",
+                provider=provider,
+                processing_time=round(time.time() - start_time, 2)
+            )
+
+    async def stream(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        file_name: str,
+        document_type: Optional[str] = None,
+        secondary_api_key: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Extração em streaming: emite {"event": "field", ...} para cada campo
+        do DocumentData assim que o provedor o conclui e, por último,
+        {"event": "result", ...} com o ExtractionResponse validado.
+        
+        No modo auto usa o provedor da chave primária e no adaptive o
+        escolhido pelo roteador, sem hedge; PDFs são enviados inteiros
+        (sem divisão em partes).
+        """
+        start_time = time.time()
+        if provider == "adaptive":
+            api_key, _ = self._route(api_key, secondary_api_key, file_type, document.size)
+        if provider in ROUTING_MODES:
+            provider = provider_for_key(api_key)
+        document_type = classify_document(file_name, document_type)
+        
+        # Quase-duplicata encontrada (confirmada ou só como dica)
+        near: Dict[str, Any] = {}
+
+        def result_event(**fields) -> Dict[str, Any]:
+            fields = {**near, **fields}
+            if fields.get("data") is not None and document_validator.enabled:
+                fields["data"], fields["validation"] = document_validator.validate(fields["data"])
+            fields.setdefault("provider", provider)
+            return {
+                "event": "result",
+                "data": ExtractionResponse(
+                    processing_time=round(time.time() - start_time, 2),
+                    document_type=document_type,
+                    **fields
+                )
+            }
+        
+        try:
+            cache_key = self.cache_key(provider, document.sha256, document_type)
+            cached_data = await extraction_cache.get(cache_key)
+            if cached_data is None:
+                found = await self._near_duplicate(provider, document, file_type, document_type)
+                if found is not None:
+                    cached_data, distance = found
+                    near = {
+                        "near_duplicate_distance": distance,
+                        "near_duplicate_confirmed": cached_data is not None,
+                    }
+                    if cached_data is None:
+                        logger.info(f"Quase-duplicata (distância {distance}) não confirmada: {file_name}")
+                    else:
+                        logger.info(f"Quase-duplicata (distância {distance}) em cache: {file_name}")
+            else:
+                logger.info(f"Resultado em cache: {file_name}")
+            if cached_data is not None:
+                for name, value in cached_data.model_dump(exclude_none=True).items():
+                    yield {"event": "field", "data": {"name": name, "value": value}}
+                yield result_event(success=True, data=cached_data, cached=True)
+                return
+            
+            local_data = await self._local_ocr(provider, document, file_type, document_type)
+            if local_data is not None:
+                for name, value in local_data.model_dump(exclude_none=True).items():
+                    yield {"event": "field", "data": {"name": name, "value": value}}
+                yield result_event(success=True, data=local_data, provider=LOCAL_PROVIDER)
+                return
+            
+            logger.info(f"Processando em streaming com {provider}: {file_name}")
+            with metrics.time_stage("preprocessing", provider, file_type):
+                content, content_type, preprocessing = await image_preprocessor.process(
+                    document, file_type
+                )
+            parser = IncrementalJSONParser()
+            service = self.services[provider]
+            call_start = time.perf_counter()
+            first_field_time = None
+            success = False
+            try:
+                async with resilience.guard(provider):
+                    async for text in service.stream_document(
+                        api_key, content, content_type, document_type
+                    ):
+                        for name, value in parser.feed(text):
+                            if name not in DocumentData.model_fields:
+                                continue
+                            if first_field_time is None:
+                                first_field_time = time.perf_counter() - call_start
+                                logger.info(f"Primeiro campo em {first_field_time:.2f}s: {file_name}")
+                            yield {"event": "field", "data": {"name": name, "value": value}}
+                with metrics.time_stage("response_parse", provider, file_type):
+                    data = response_parser.parse(parser.text, provider, service.LABEL)
+                success = True
+            finally:
+                latency_tracker.record(provider, time.perf_counter() - call_start, success)
+                adaptive_router.record(
+                    provider, file_type, document.size, time.perf_counter() - call_start, success
+                )
+            
+            # PDFs divididos geram outro resultado; só o caso sem divisão vai ao cache
+            if not pdf_splitter.fingerprint or file_type != "application/pdf":
+                await extraction_cache.set(cache_key, data)
+                await near_duplicate_index.remember(document, file_type)
+            yield result_event(success=True, data=data, preprocessing=preprocessing)
+        
+        except ValueError as e:
+            logger.error(f"Erro de validação: {str(e)}")
+            yield result_event(success=False, error=str(e))
+        
+        except Exception as e:
+            logger.error(f"Erro inesperado: {str(e)}", exc_info=True)
+            yield result_event(success=False, error="Erro interno no servidor")
+
+    def cache_key(
+        self,
+        provider: str,
+        file_hash: str,
+        document_type: Optional[str] = None
+    ) -> str:
+        """
+        Chave do cache/coalescência para o arquivo (SHA-256) neste provedor.
+        O modo de saída e a configuração do pré-processamento/divisão também
+        diferenciam o resultado.
+        """
+        service = self.services[provider]
+        return extraction_cache.build_key(
+            file_hash,
+            provider,
+            service.MODEL + output_mode() + image_preprocessor.fingerprint + pdf_splitter.fingerprint,
+            extraction_prompt(document_type, settings.structured_output)
+        )
+
+    async def _run_single(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        file_name: str,
+        document_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Extração num único provedor, passando por cache e coalescência.
+        Retorna os campos do ExtractionResponse.
+        """
+        # Consultar cache pelo conteúdo do arquivo
+        cache_key = self.cache_key(provider, document.sha256, document_type)
+        cached_data = await extraction_cache.get(cache_key)
+        if cached_data is not None:
+            logger.info(f"Resultado em cache: {file_name}")
+            return {"data": cached_data, "provider": provider, "cached": True}
+
+        near: Dict[str, Any] = {}
+        found = await self._near_duplicate(provider, document, file_type, document_type)
+        if found is not None:
+            data, distance = found
+            if data is not None:
+                logger.info(f"Quase-duplicata (distância {distance}) em cache: {file_name}")
+                return {
+                    "data": data, "provider": provider, "cached": True,
+                    "near_duplicate_distance": distance, "near_duplicate_confirmed": True
+                }
+            # Semelhança sem confirmação do conteúdo: só uma dica, o provedor é consultado
+            logger.info(f"Quase-duplicata (distância {distance}) não confirmada: {file_name}")
+            near = {"near_duplicate_distance": distance, "near_duplicate_confirmed": False}
+
+        # Documentos simples resolvidos pelo OCR local não chegam ao provedor
+        local_data = await self._local_ocr(provider, document, file_type, document_type)
+        if local_data is not None:
+            return {"data": local_data, "provider": LOCAL_PROVIDER, **near}
+
+        logger.info(f"Processando com {self.services[provider].LABEL}: {file_name}")
+
+        async def call_provider() -> Dict[str, Any]:
+            call_start = time.perf_counter()
+            try:
+                result = await self._extract(provider, api_key, document, file_type, document_type)
+            except asyncio.CancelledError:
+                # Hedge perdedor: sem resultado para as estimativas de roteamento
+                raise
+            except Exception:
+                adaptive_router.record(
+                    provider, file_type, document.size, time.perf_counter() - call_start, False
+                )
+                raise
+            adaptive_router.record(
+                provider, file_type, document.size, time.perf_counter() - call_start, True
+            )
+            # PDF com partes que falharam: resultado incompleto, fora do cache
+            if "error" not in result:
+                await extraction_cache.set(cache_key, result["data"])
+                await near_duplicate_index.remember(document, file_type)
+            return result
+
+        # Requisições idênticas em andamento compartilham a mesma chamada
+        # Erros da chave (401/429/cota) não são repassados a quem usa outra chave
+        result = await extraction_coalescer.run(
+            cache_key, call_provider, owner=api_key_id(api_key), private=is_key_specific
+        )
+        return {**result, "provider": provider, **near}
+
+    def _route(
+        self,
+        api_key: str,
+        secondary_api_key: Optional[str],
+        file_type: str,
+        size: int
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Modo adaptive: as duas chaves na ordem escolhida pelo roteador
+        (primário primeiro).
+        """
+        keys = {provider_for_key(key): key for key in (api_key, secondary_api_key) if key}
+        decision = adaptive_router.choose(list(keys), file_type, size)
+        ordered = [keys[provider] for provider in decision["order"]]
+        return ordered[0], (ordered[1] if len(ordered) > 1 else None)
+
+    async def _local_ocr(
+        self,
+        provider: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> Optional[DocumentData]:
+        """
+        Caminho rápido local (OCR) ou None para seguir ao provedor.
+        Tentativas idênticas simultâneas (ex.: hedge) compartilham o mesmo OCR.
+        """
+        if not local_ocr.applies_to(file_type, document_type):
+            return None
+        with metrics.time_stage("local_ocr", provider, file_type):
+            return await extraction_coalescer.run(
+                f"{LOCAL_PROVIDER}:{local_ocr.fingerprint}:{document.sha256}:{document_type}",
+                lambda: local_ocr.extract(document, file_type, document_type)
+            )
+
+    async def _near_duplicate(
+        self,
+        provider: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> Optional[Tuple[Optional[DocumentData], int]]:
+        """
+        Extração em cache de um documento visualmente quase idêntico
+        (mesmo provedor e configuração), com a distância de Hamming.
+        A extração só é devolvida se o conteúdo confirmar que é a mesma
+        pessoa; senão vem None com a distância do mais próximo (dica).
+        """
+        if not near_duplicate_index.enabled or not extraction_cache.enabled:
+            return None
+        with metrics.time_stage("near_duplicate", provider, file_type):
+            candidates = await near_duplicate_index.find(document, file_type)
+        # Os mais próximos primeiro; resultados expirados do cache são pulados
+        hint = None
+        for distance, file_hash in candidates[:3]:
+            data = await extraction_cache.get(
+                self.cache_key(provider, file_hash, document_type), count=False
+            )
+            if data is None:
+                continue
+            if await near_duplicate_index.confirm(document, file_type, document_type, data):
+                near_duplicate_index.matches += 1
+                return data, distance
+            if hint is None:
+                hint = distance
+        return (None, hint) if hint is not None else None
+
+    async def _run_hedged(
+        self,
+        api_key: str,
+        secondary_api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        file_name: str,
+        document_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Modo auto: consulta o primário e, se ele demorar além do atraso
+        de hedge, dispara o secundário; vence a primeira resposta válida
+        e a outra chamada é cancelada. Falha rápida do primário vira failover.
+        """
+        primary = provider_for_key(api_key)
+        secondary = provider_for_key(secondary_api_key)
+        hedging_policy.requests += 1
+
+        def start(provider: str, key: str) -> asyncio.Task:
+            return asyncio.ensure_future(
+                self._run_single(provider, key, document, file_type, file_name, document_type)
+            )
+
+        primary_task = start(primary, api_key)
+        delay = hedging_policy.delay_for(primary)
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+
+        if done:
+            if primary_task.exception() is None:
+                hedging_policy.primary_wins += 1
+                return primary_task.result()
+            # Primário falhou antes do atraso: tentar o secundário
+            logger.warning(f"Falha em {primary}, tentando {secondary}: {primary_task.exception()}")
+            hedging_policy.failovers += 1
+            result = await self._run_single(
+                secondary, secondary_api_key, document, file_type, file_name, document_type
+            )
+            return {**result, "hedged": True}
+
+        if not hedging_policy.allow_hedge(primary, secondary):
+            return await primary_task
+
+        logger.info(f"{primary} acima de {delay:.2f}s, disparando hedge para {secondary}")
+        hedging_policy.hedges += 1
+        pending = {primary_task, start(secondary, secondary_api_key)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is primary_task:
+                            hedging_policy.primary_wins += 1
+                        else:
+                            hedging_policy.hedge_wins += 1
+                        return {**task.result(), "hedged": True}
+            # Os dois falharam: reportar o erro do primário
+            raise primary_task.exception()
+        finally:
+            # Cancelar a chamada perdedora
+            for task in pending:
+                task.cancel()
+
+    async def _call_service(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> DocumentData:
+        """
+        Chamada ao serviço do provedor (com retry e circuit breaker),
+        registrando a latência observada.
+        """
+        service = self.services[provider]
+        start_time = time.perf_counter()
+        success = False
+        try:
+            data = await resilience.execute(provider, lambda: service.extract_document(
+                api_key=api_key,
+                document=document,
+                file_type=file_type,
+                document_type=document_type
+            ), deadline=service.deadline)
+            success = True
+            return data
+        finally:
+            latency_tracker.record(provider, time.perf_counter() - start_time, success)
+
+    async def _reask(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str],
+        data: DocumentData,
+        parts: Optional[List[Tuple[DocumentContent, DocumentData]]] = None
+    ) -> Tuple[DocumentData, Optional[List[str]]]:
+        """
+        Com validation_reask_enabled, consulta de novo só os campos que não
+        passaram na validação (prompt e schema reduzidos, resposta curta) e
+        aproveita os que voltarem válidos. Em PDFs divididos (`parts`: parte
+        e resultado), cada campo é reconsultado só na parte de onde veio o
+        valor, nunca no PDF inteiro. Retorna os dados e os campos
+        consultados; uma falha mantém a extração original.
+        """
+        if not settings.validation_reask_enabled or not document_validator.enabled:
+            return data, None
+        invalid = document_validator.invalid(data)
+        if not invalid:
+            return data, None
+        invalid = dict(list(invalid.items())[:settings.validation_reask_max_fields])
+        service = self.services[provider]
+        document_validator.reasks += 1
+        logger.info(f"Consultando de novo campos inválidos em {provider}: {', '.join(invalid)}")
+
+        # Campos por documento consultado: a parte cujo valor o merge usou
+        targets: List[Tuple[DocumentContent, Dict[str, Tuple[str, str]]]] = []
+        if parts is None:
+            targets.append((document, invalid))
+        else:
+            by_part: Dict[int, Dict[str, Tuple[str, str]]] = {}
+            for name, reason in invalid.items():
+                source = next(
+                    (i for i, (_, part) in enumerate(parts) if getattr(part, name) is not None), 0
+                )
+                by_part.setdefault(source, {})[name] = reason
+            targets.extend((parts[i][0], fields) for i, fields in by_part.items())
+
+        async def ask(target: DocumentContent, fields: Dict[str, Tuple[str, str]]) -> DocumentData:
+            return await resilience.execute(provider, lambda: service.extract_document(
+                api_key=api_key,
+                document=target,
+                file_type=file_type,
+                document_type=document_type,
+                reask=fields
+            ), deadline=service.deadline)
+
+        with metrics.time_stage("reask", provider, file_type):
+            answers = await asyncio.gather(
+                *(ask(target, fields) for target, fields in targets),
+                return_exceptions=True
+            )
+        asked: List[str] = []
+        for (_, fields), answer in zip(targets, answers):
+            if isinstance(answer, BaseException):
+                document_validator.reask_failures += 1
+                logger.warning(f"Falha na nova consulta dos campos inválidos: {str(answer)}")
+                continue
+            data = document_validator.merge_reask(data, answer, list(fields))
+            asked.extend(fields)
+        return data, asked or None
+
+    async def _extract(
+        self,
+        provider: str,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Chama o provedor, dividindo PDFs de várias páginas em partes
+        extraídas em paralelo. Retorna os campos do ExtractionResponse.
+        """
+        with metrics.time_stage("preprocessing", provider, file_type):
+            chunks = await pdf_splitter.split(document, file_type)
+            if chunks is None:
+                # Reduzir a imagem antes do envio (pool de processos)
+                content, content_type, preprocessing = await image_preprocessor.process(
+                    document, file_type
+                )
+        if chunks is None:
+            data = await self._call_service(provider, api_key, content, content_type, document_type)
+            data, reasked = await self._reask(provider, api_key, content, content_type, document_type, data)
+            return {"data": data, "preprocessing": preprocessing, "reasked": reasked}
+
+        semaphore = asyncio.Semaphore(settings.pdf_max_concurrency)
+
+        async def extract_chunk(chunk: DocumentContent) -> DocumentData:
+            async with semaphore:
+                return await self._call_service(provider, api_key, chunk, file_type, document_type)
+
+        results = await asyncio.gather(
+            *(extract_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        documents = [r for r in results if isinstance(r, DocumentData)]
+        failures = [r for r in results if not isinstance(r, DocumentData)]
+        if not documents:
+            raise failures[0]
+
+        data, reasked = await self._reask(
+            provider, api_key, document, file_type, document_type, merge_documents(documents),
+            parts=[(chunk, r) for chunk, r in zip(chunks, results) if isinstance(r, DocumentData)]
+        )
+        result: Dict[str, Any] = {
+            "data": data,
+            "documents": documents,
+            "reasked": reasked,
+        }
+        if failures:
+            logger.warning(f"Falha em {len(failures)} de {len(chunks)} partes do PDF")
+            result["error"] = f"Falha na extração de {len(failures)} de {len(chunks)} partes do PDF"
+        return result
+
+
+# Instância única compartilhada pelos routers
+extraction_pipeline = ExtractionPipeline()
@@ -0,0 +1,210 @@
+"""
+Prompts de extração por tipo de documento.
+O prompt genérico pede todos os campos do DocumentData; as variantes
+(RG, CNH, CPF, comprovante de endereço) pedem só os campos relevantes,
+reduzindo tokens de entrada e de saída.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Optional, Tuple
+from ..models import DocumentData
+from ..config import get_settings
+
+settings = get_settings()
+
+# Prompt completo (todos os campos), usado quando o tipo é desconhecido
+GENERIC_PROMPT = """Analise este documento de identificação brasileiro e extraia TODOS os dados disponíveis. 
+
+IMPORTANTE: 
+- Extraia TODOS os campos visíveis no documento
+- Use formatação brasileira para datas (DD/MM/AAAA)
+- Mantenha CPF e RG com a formatação original
+- Se um campo não existir no documento, use null
+
+Responda APENAS com JSON válido no seguinte formato:
+
+{
+  "tipoDocumento": "tipo do documento (RG, CNH, CPF, etc)",
+  "nome": "nome completo",
+  "nomeDaMae": "nome da mãe",
+  "nomeDoPai": "nome do pai",
+  "cpf": "CPF com formatação (000.000.000-00)",
+  "rg": "RG com formatação",
+  "orgaoExpedidor": "órgão expedidor/UF",
+  "dataExpedicao": "DD/MM/AAAA",
+  "dataVencimento": "DD/MM/AAAA", 
+  "dataNascimento": "DD/MM/AAAA",
+  "naturalidade": "cidade de nascimento",
+  "uf": "estado (sigla)",
+  "nacionalidade": "nacionalidade",
+  "estadoCivil": "estado civil",
+  "endereco": "endereço completo",
+  "cep": "CEP com formatação (00000-000)",
+  "numeroDocumento": "número do documento",
+  "categoria": "categoria CNH (se aplicável)",
+  "numeroRegistro": "número de registro (CNH)",
+  "validade": "validade da CNH",
+  "primeiraHabilitacao": "data primeira habilitação",
+  "observacoes": "observações do documento",
+  "outrosDados": "outros dados relevantes"
+}
+
+Retorne APENAS o JSON, sem explicações ou formatação markdown."""
+
+# Instruções curtas do modo estruturado: o formato vem do schema
+STRUCTURED_PROMPT = """Analise este documento de identificação brasileiro e registre TODOS os dados visíveis com a ferramenta/schema fornecido.
+
+- Datas no formato DD/MM/AAAA
+- CPF e RG com a formatação original
+- Campos inexistentes no documento: null"""
+
+# Nome legível e campos relevantes de cada tipo
+DOCUMENT_TYPES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "RG": ("carteira de identidade (RG)", (
+        "tipoDocumento", "nome", "nomeDaMae", "nomeDoPai", "rg", "cpf", "orgaoExpedidor",
+        "dataExpedicao", "dataNascimento", "naturalidade", "uf", "observacoes",
+    )),
+    "CNH": ("carteira nacional de habilitação (CNH)", (
+        "tipoDocumento", "nome", "cpf", "rg", "orgaoExpedidor", "dataNascimento",
+        "nomeDaMae", "nomeDoPai", "numeroRegistro", "categoria", "validade",
+        "primeiraHabilitacao", "dataExpedicao", "uf", "observacoes",
+    )),
+    "CPF": ("cartão do CPF", (
+        "tipoDocumento", "nome", "cpf", "dataNascimento", "dataExpedicao", "observacoes",
+    )),
+    "COMPROVANTE_ENDERECO": ("comprovante de endereço", (
+        "tipoDocumento", "nome", "endereco", "cep", "uf", "dataExpedicao",
+        "dataVencimento", "outrosDados",
+    )),
+}
+
+# Rótulo da nova consulta de campos inválidos (consumo por prompt)
+REASK_PROMPT = "reask"
+
+# Palavras do nome do arquivo que indicam o tipo (classificação sem custo)
+FILE_NAME_KEYWORDS: Dict[str, str] = {
+    "rg": "RG", "identidade": "RG",
+    "cnh": "CNH", "habilitacao": "CNH",
+    "cpf": "CPF",
+    "comprovante": "COMPROVANTE_ENDERECO", "endereco": "COMPROVANTE_ENDERECO",
+    "residencia": "COMPROVANTE_ENDERECO", "conta": "COMPROVANTE_ENDERECO",
+    "fatura": "COMPROVANTE_ENDERECO",
+}
+
+
+def normalize_document_type(value: Optional[str]) -> Optional[str]:
+    """
+    Converte a dica do cliente num tipo conhecido (None se vazia).
+
+    Raises:
+        ValueError: tipo desconhecido
+    """
+    if value is None or not value.strip():
+        return None
+    key = value.strip().upper().replace(" ", "_")
+    if key not in DOCUMENT_TYPES:
+        raise ValueError(f"document_type deve ser um de: {', '.join(DOCUMENT_TYPES)}")
+    return key
+
+
+def classify_document(file_name: str, hint: Optional[str] = None) -> Optional[str]:
+    """
+    Tipo do documento: dica do cliente ou palavras do nome do arquivo.
+    None = desconhecido (prompt genérico).
+    """
+    if hint:
+        return hint
+    if not settings.prompt_variants_enabled or not file_name:
+        return None
+    plain = unicodedata.normalize("NFKD", file_name.lower()).encode("ascii", "ignore").decode()
+    found = {
+        FILE_NAME_KEYWORDS[word]
+        for word in re.split(r"[^a-z0-9]+", plain.rsplit(".", 1)[0])
+        if word in FILE_NAME_KEYWORDS
+    }
+    # Nome ambíguo (ex.: "rg_e_cpf.pdf"): prompt genérico
+    return found.pop() if len(found) == 1 else None
+
+
+def fields_for(document_type: Optional[str]) -> Tuple[str, ...]:
+    """
+    Campos pedidos ao provedor para o tipo (todos, se desconhecido).
+    """
+    if document_type is None:
+        return tuple(DocumentData.model_fields)
+    return DOCUMENT_TYPES[document_type][1]
+
+
+def _hint(name: str) -> str:
+    return DocumentData.model_fields[name].description or name
+
+
+def extraction_prompt(document_type: Optional[str] = None, structured: bool = False) -> str:
+    """
+    Prompt de extração para o tipo de documento e modo de saída.
+    """
+    if document_type is None:
+        return STRUCTURED_PROMPT if structured else GENERIC_PROMPT
+
+    label = DOCUMENT_TYPES[document_type][0]
+    if structured:
+        return f"""Analise este documento ({label}) e registre os dados visíveis com a ferramenta/schema fornecido.
+
+- Datas no formato DD/MM/AAAA
+- CPF e RG com a formatação original
+- Campos inexistentes no documento: null"""
+
+    template = ",\n".join(f'  "{name}": "{_hint(name)}"' for name in fields_for(document_type))
+    return f"""Analise este documento ({label}) e extraia os dados disponíveis.
+
+IMPORTANTE:
+- Use formatação brasileira para datas (DD/MM/AAAA)
+- Mantenha CPF e RG com a formatação original
+- Se um campo não existir no documento, use null
+
+Responda APENAS com JSON válido no seguinte formato:
+
+{{
+{template}
+}}
+
+Retorne APENAS o JSON, sem explicações ou formatação markdown."""
+
+
+def reask_fields(invalid: Dict[str, Tuple[str, str]]) -> Tuple[str, ...]:
+    """
+    Campos pedidos na nova consulta: os inválidos e o tipo do documento
+    (obrigatório no DocumentData).
+    """
+    return ("tipoDocumento", *invalid)
+
+
+def reask_prompt(invalid: Dict[str, Tuple[str, str]], structured: bool = False) -> str:
+    """
+    Prompt curto para reler só os campos que não passaram na validação,
+    com o valor lido antes e o motivo.
+
+    Args:
+        invalid: nome do campo -> (valor lido, motivo)
+    """
+    lines = "\n".join(
+        f'- {name} ({_hint(name)}): lido "{value}", {reason}'
+        for name, (value, reason) in invalid.items()
+    )
+    intro = f"""Releia com atenção neste documento apenas os campos abaixo. A leitura anterior não passou na validação:
+
+{lines}
+
+- Datas no formato DD/MM/AAAA
+- Se o campo realmente não estiver legível, use null"""
+    if structured:
+        return f"{intro}\n\nRegistre os valores com a ferramenta/schema fornecido."
+    template = ",\n".join(f'  "{name}": "{_hint(name)}"' for name in reask_fields(invalid))
+    return f"""{intro}
+
+Responda APENAS com JSON válido no seguinte formato:
+
+{{
+{template}
+}}"""
@@ -0,0 +1,253 @@
+"""
+Base comum dos provedores de extração.
+Concentra o que é igual entre eles (transporte HTTP, registro de uso,
+interpretação da resposta e mapeamento de erros); cada provedor só
+descreve o próprio formato de payload, URL, headers e resposta.
+"""
+
+import httpx
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, AsyncIterator, Iterable, Optional, Tuple
+import logging
+from ..models import DocumentData, DocumentContent
+from ..config import get_settings
+from .http_client import http_clients
+from .payload import build_json_body
+from .resilience import provider_error_from_response
+from .json_stream import iter_sse_json
+from .response_parser import response_parser
+from .structured_output import output_mode
+from .prompts import REASK_PROMPT, extraction_prompt, reask_fields, reask_prompt
+from .usage_tracker import usage_tracker
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ExtractionProvider(ABC):
+    """
+    Provedor de extração: subclasses definem NAME, LABEL, MODEL e os
+    métodos de formato (build_payload, url, headers, usage, parse_response,
+    stream_texts); extract_document/stream_document são compartilhados.
+    Os métodos abstratos faltando impedem a instanciação, então um provedor
+    incompleto falha já no registro, não na primeira requisição.
+
+    Cada instância declara o limite de chamadas simultâneas, o timeout e o
+    custo estimado por chamada, usados pelo lote, pelo retry e pelo hedge.
+    """
+
+    NAME = ""
+    LABEL = ""
+    MODEL = ""
+    # Prefixo que identifica a chave do provedor (vazio = qualquer chave,
+    # mas o provedor não é reconhecido pela chave no modo auto)
+    KEY_PREFIX = ""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        timeout: Optional[float] = None,
+        cost_per_call: float = 0.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = float(timeout or settings.api_timeout)
+        self.cost_per_call = cost_per_call
+
+    @property
+    def http_timeout(self) -> httpx.Timeout:
+        """Timeout das chamadas deste provedor (conexão com o valor global)."""
+        return httpx.Timeout(self.timeout, connect=settings.http_connect_timeout)
+
+    @property
+    def deadline(self) -> float:
+        """Prazo total das tentativas (retry) de uma chamada."""
+        return self.timeout * settings.retry_deadline_factor
+
+    def accepts_key(self, api_key: Optional[str]) -> bool:
+        return bool(api_key) and api_key.startswith(self.KEY_PREFIX)
+
+    # --- Formato específico de cada provedor -------------------------------
+
+    @abstractmethod
+    def build_payload(
+        self,
+        file_type: str,
+        document_type: Optional[str] = None,
+        reask: Optional[Dict[str, Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Payload da requisição, com DOCUMENT_PLACEHOLDER no lugar do base64.
+        """
+
+    def stream_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajuste do payload para a variante em streaming."""
+        return payload
+
+    @abstractmethod
+    def url(self, api_key: str, stream: bool = False) -> str:
+        """URL da chamada (normal ou em streaming)."""
+
+    def headers(self, api_key: str) -> Dict[str, str]:
+        """Headers de autenticação/versão (o Content-Type vem do corpo)."""
+        return {}
+
+    def usage(self, data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """
+        Tokens da resposta: input_tokens, output_tokens e, se houver,
+        cache_read_tokens e cache_creation_tokens.
+        """
+        return {}
+
+    @abstractmethod
+    def parse_response(self, data: Dict[str, Any]) -> DocumentData:
+        """
+        JSON de resposta do provedor -> DocumentData (via parse_text ou
+        parse_structured).
+        """
+
+    @abstractmethod
+    def stream_texts(self, event: Dict[str, Any]) -> Iterable[str]:
+        """Trechos de texto de um evento do stream (pode levantar ProviderError)."""
+
+    def stream_done(self, event: Dict[str, Any]) -> bool:
+        """Se o evento encerra o stream."""
+        return False
+
+    # --- Compartilhado ------------------------------------------------------
+
+    @staticmethod
+    def prompt_and_fields(
+        document_type: Optional[str],
+        reask: Optional[Dict[str, Tuple[str, str]]]
+    ) -> Tuple[str, Optional[Tuple[str, ...]]]:
+        """
+        Prompt e campos pedidos: o prompt do tipo de documento ou, com
+        reask, só os campos inválidos.
+        """
+        structured = settings.structured_output
+        if reask:
+            return reask_prompt(reask, structured), reask_fields(reask)
+        return extraction_prompt(document_type, structured), None
+
+    def parse_text(self, text: str) -> DocumentData:
+        """Localiza o JSON no texto (cercas, texto ao redor, truncamento) e valida."""
+        return response_parser.parse(text, self.NAME, self.LABEL)
+
+    def parse_structured(self, value: Any) -> DocumentData:
+        """Valida os dados já estruturados (tool use, JSON schema)."""
+        return response_parser.parse_structured(value, self.NAME, self.LABEL)
+
+    async def extract_document(
+        self,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None,
+        reask: Optional[Dict[str, Tuple[str, str]]] = None
+    ) -> DocumentData:
+        """
+        Método assíncrono para extrair dados do documento.
+
+        Args:
+            api_key: Chave da API do provedor
+            document: Conteúdo do arquivo (já decodificado/codificado uma vez)
+            file_type: Tipo MIME do arquivo
+            document_type: Tipo do documento (prompt reduzido) ou None
+            reask: Campos inválidos a reler (valor lido e motivo) ou None
+
+        Returns:
+            DocumentData: Dados extraídos e validados
+
+        Raises:
+            ProviderError: Erro HTTP do provedor
+            ValueError: Resposta inválida ou outros erros de validação
+        """
+        # Corpo serializado sem copiar o base64 do arquivo
+        body = build_json_body(self.build_payload(file_type, document_type, reask), document.b64)
+        headers = {**body.headers(), **self.headers(api_key)}
+
+        try:
+            logger.info(f"Enviando requisição para {self.LABEL} API...")
+            start_time = time.perf_counter()
+            # Cliente HTTP compartilhado (conexão reaproveitada entre requisições)
+            response = await http_clients.post(
+                self.NAME,
+                self.url(api_key),
+                file_type=file_type,
+                content=body,
+                headers=headers,
+                timeout=self.http_timeout
+            )
+            response.raise_for_status()
+
+            # Interpretação da resposta (JSON do provedor -> DocumentData)
+            with metrics.time_stage("response_parse", self.NAME, file_type):
+                data = response.json()
+                usage = self.usage(data)
+                usage_tracker.record(
+                    self.NAME,
+                    output_mode(),
+                    time.perf_counter() - start_time,
+                    usage.get("input_tokens"),
+                    usage.get("output_tokens"),
+                    prompt=REASK_PROMPT if reask else document_type,
+                    cache_read_tokens=usage.get("cache_read_tokens"),
+                    cache_creation_tokens=usage.get("cache_creation_tokens")
+                )
+                return self.parse_response(data)
+
+        except httpx.HTTPStatusError as e:
+            # Erro HTTP (4xx, 5xx)
+            logger.error(f"Erro HTTP na API {self.LABEL}: {e.response.status_code}")
+            raise provider_error_from_response(self.NAME, self.LABEL, e.response)
+
+        except Exception as e:
+            logger.error(f"Erro inesperado {self.LABEL}: {str(e)}")
+            raise
+
+    async def stream_document(
+        self,
+        api_key: str,
+        document: DocumentContent,
+        file_type: str,
+        document_type: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Variante em streaming: entrega os trechos de texto (ou do JSON
+        estruturado) conforme o modelo os gera.
+
+        Raises:
+            ProviderError: erro HTTP ou evento de erro no stream
+        """
+        payload = self.stream_payload(self.build_payload(file_type, document_type))
+        body = build_json_body(payload, document.b64)
+        headers = {**body.headers(), **self.headers(api_key)}
+
+        logger.info(f"Enviando requisição em streaming para {self.LABEL} API...")
+        async with http_clients.stream(
+            self.NAME, self.url(api_key, stream=True), file_type=file_type,
+            content=body, headers=headers, timeout=self.http_timeout
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                logger.error(f"Erro HTTP na API {self.LABEL}: {response.status_code}")
+                raise provider_error_from_response(self.NAME, self.LABEL, response)
+
+            async for event in iter_sse_json(response):
+                for text in self.stream_texts(event):
+                    if text:
+                        yield text
+                if self.stream_done(event):
+                    return
+
+    def describe(self) -> Dict[str, Any]:
+        """Configuração declarada (para /api/info e /api/stats)."""
+        return {
+            "label": self.LABEL,
+            "model": self.MODEL,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "cost_per_call": self.cost_per_call,
+        }
@@ -0,0 +1,77 @@
+"""
+Registro dos provedores de extração disponíveis.
+Pipeline, validação das requisições, hedge e endpoints informativos
+consultam o registro em vez de listar provedores fixos; um provedor novo
+só precisa herdar de ExtractionProvider e ser registrado aqui.
+"""
+
+from typing import Dict, Any, List, Optional
+import logging
+from ..config import get_settings
+from .provider_base import ExtractionProvider
+from .claude_service import ClaudeService
+from .gemini_service import GeminiService
+from .openai_service import OpenAICompatibleService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ProviderRegistry:
+    """
+    Provedores por nome, na ordem de registro.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, ExtractionProvider] = {}
+
+    def register(self, provider: ExtractionProvider) -> ExtractionProvider:
+        if provider.NAME in self._providers:
+            raise ValueError(f"Provedor já registrado: {provider.NAME}")
+        self._providers[provider.NAME] = provider
+        logger.info(
+            f"Provedor {provider.NAME} registrado ({provider.MODEL}, "
+            f"max_concurrency={provider.max_concurrency}, timeout={provider.timeout}s)"
+        )
+        return provider
+
+    def get(self, name: str) -> ExtractionProvider:
+        """
+        Raises:
+            KeyError: provedor não registrado
+        """
+        return self._providers[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._providers
+
+    def names(self) -> List[str]:
+        return list(self._providers)
+
+    def all(self) -> List[ExtractionProvider]:
+        return list(self._providers.values())
+
+    def provider_for_key(self, api_key: Optional[str]) -> Optional[str]:
+        """
+        Identifica o provedor pelo prefixo da chave de API. O prefixo mais
+        longo vence (ex.: sk-ant-api do Claude antes de sk- da OpenAI);
+        provedores sem prefixo não são identificáveis.
+        """
+        best = None
+        for provider in self._providers.values():
+            if provider.KEY_PREFIX and provider.accepts_key(api_key):
+                if best is None or len(provider.KEY_PREFIX) > len(best.KEY_PREFIX):
+                    best = provider
+        return best.NAME if best else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: provider.describe() for name, provider in self._providers.items()}
+
+
+# Instância única compartilhada pela aplicação
+provider_registry = ProviderRegistry()
+provider_registry.register(ClaudeService())
+provider_registry.register(GeminiService())
+if settings.openai_enabled:
+    provider_registry.register(OpenAICompatibleService())
+
@@ -0,0 +1,351 @@
+"""
+Camada de resiliência compartilhada pelos provedores.
+Repete chamadas com backoff exponencial e jitter (respeitando Retry-After)
+dentro de um prazo total, e mantém um circuit breaker por provedor.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+import httpx
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Status que indicam sobrecarga/indisponibilidade temporária do provedor
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+# Erros que dependem da chave de API (autenticação, cota, limite de taxa)
+KEY_SPECIFIC_STATUS = {401, 402, 403, 429}
+
+
+class ProviderError(ValueError):
+    """
+    Erro de comunicação com o provedor.
+    Herda de ValueError para manter o tratamento existente nos endpoints.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        provider: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: bool = False
+    ):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+class CircuitOpenError(ProviderError):
+    """O circuit breaker do provedor está aberto (falha rápida)."""
+
+
+def is_key_specific(error: BaseException) -> bool:
+    """
+    Se o erro é da chave usada na chamada (outra chave poderia ter sucesso).
+    """
+    return isinstance(error, ProviderError) and error.status_code in KEY_SPECIFIC_STATUS
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Converte o header Retry-After (segundos ou data HTTP) em segundos.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def provider_error_from_response(provider: str, label: str, response: httpx.Response) -> ProviderError:
+    """
+    Monta o ProviderError a partir de uma resposta HTTP de erro.
+    """
+    try:
+        error_data = response.json() if response.content else {}
+    except ValueError:
+        error_data = {}
+    message = error_data.get("error", {}).get("message", "Erro desconhecido") \
+        if isinstance(error_data.get("error"), dict) else "Erro desconhecido"
+    return ProviderError(
+        f"Erro {label} API: {message}",
+        provider=provider,
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers.get("retry-after")),
+        retryable=response.status_code in RETRYABLE_STATUS
+    )
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de erro numa janela de chamadas recentes.
+    closed -> open (falha rápida por open_seconds) -> half_open (uma sonda).
+    """
+
+    def __init__(self, provider: str, window: int, min_requests: int, threshold: float, open_seconds: float):
+        self.provider = provider
+        self.window = window
+        self.min_requests = min_requests
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probe_in_flight = False
+
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def allow(self) -> bool:
+        """
+        Verifica se a chamada pode seguir para o provedor.
+        """
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record(self, success: bool) -> None:
+        """
+        Registra o resultado de uma chamada e atualiza o estado.
+        """
+        if self.state == "half_open":
+            self._probe_in_flight = False
+            if success:
+                logger.info(f"Circuito de {self.provider} fechado")
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        if (
+            self.state == "closed"
+            and len(self._outcomes) >= self.min_requests
+            and self.error_rate() >= self.threshold
+        ):
+            self._open()
+
+    def release_probe(self) -> None:
+        """
+        Libera a sonda do estado half_open sem registrar resultado.
+        """
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        logger.warning(f"Circuito de {self.provider} aberto (taxa de erro {self.error_rate():.0%})")
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 4),
+            "recent_calls": len(self._outcomes),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+        if self.state == "open":
+            info["retry_in"] = round(max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1)
+        return info
+
+
+class ResilienceLayer:
+    """
+    Executa chamadas aos provedores com retry, prazo total e circuit breaker.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        deadline: float,
+        breaker_options: Dict[str, Any]
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider)
+        if breaker is None:
+            breaker = self.breakers[provider] = CircuitBreaker(provider, **self.breaker_options)
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Backoff exponencial com "full jitter".
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def execute(
+        self,
+        provider: str,
+        func: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None
+    ) -> T:
+        """
+        Executa func() com as políticas de resiliência do provedor.
+        `deadline` substitui o prazo total padrão (ex.: pelo timeout do provedor);
+        cada tentativa é limitada ao tempo que ainda resta dele.
+
+        Raises:
+            CircuitOpenError: circuito aberto (falha rápida)
+            ProviderError: erro definitivo ou prazo esgotado
+        """
+        breaker = self.breaker(provider)
+        deadline = deadline or self.deadline
+        start_time = time.monotonic()
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(
+                    f"Provedor {provider} temporariamente indisponível (circuito aberto)",
+                    provider=provider
+                )
+            remaining = deadline - (time.monotonic() - start_time)
+            try:
+                result = await asyncio.wait_for(func(), timeout=max(remaining, 0.001))
+            except asyncio.CancelledError:
+                # Chamada cancelada (ex.: hedge perdedor) não conta como resultado
+                breaker.release_probe()
+                raise
+            except ProviderError as e:
+                error = e
+            except asyncio.TimeoutError:
+                error = ProviderError(
+                    f"Prazo total esgotado na chamada a {provider}",
+                    provider=provider,
+                    retryable=True
+                )
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = ProviderError(
+                    f"Falha de comunicação com {provider}: {type(e).__name__}",
+                    provider=provider,
+                    retryable=True
+                )
+            except Exception:
+                # O provedor respondeu; o erro é do conteúdo (ex.: resposta ilegível)
+                breaker.record(True)
+                raise
+            else:
+                breaker.record(True)
+                return result
+
+            # Erros do cliente (ex.: chave inválida) não indicam falha do provedor
+            if not error.retryable:
+                breaker.record(True)
+                raise error
+            breaker.record(False)
+
+            attempt += 1
+            delay = error.retry_after if error.retry_after is not None else self.backoff(attempt)
+            elapsed = time.monotonic() - start_time
+            if attempt >= self.max_attempts or elapsed + delay >= deadline:
+                raise error
+
+            logger.warning(
+                f"{provider} retornou {error.status_code or 'erro de rede'}, "
+                f"nova tentativa {attempt + 1}/{self.max_attempts} em {delay:.2f}s"
+            )
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def guard(self, provider: str) -> AsyncIterator[None]:
+        """
+        Apenas o circuit breaker, sem retry: para respostas em streaming,
+        que não podem ser repetidas depois de entregues ao cliente.
+
+        Raises:
+            CircuitOpenError: circuito aberto (falha rápida)
+        """
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"Provedor {provider} temporariamente indisponível (circuito aberto)",
+                provider=provider
+            )
+        try:
+            yield
+        except ProviderError as e:
+            breaker.record(not e.retryable)
+            raise
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            breaker.record(False)
+            raise ProviderError(
+                f"Falha de comunicação com {provider}: {type(e).__name__}",
+                provider=provider,
+                retryable=True
+            ) from e
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelamento ou cliente desconectado: sem resultado
+            breaker.release_probe()
+            raise
+        except Exception:
+            # O provedor respondeu; o erro é do conteúdo
+            breaker.record(True)
+            raise
+        else:
+            breaker.record(True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "circuit_breakers": self.breaker_stats(),
+        }
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        return {provider: breaker.stats() for provider, breaker in self.breakers.items()}
+
+
+# Instância única compartilhada pela aplicação
+resilience = ResilienceLayer(
+    max_attempts=settings.retry_max_attempts,
+    base_delay=settings.retry_base_delay,
+    max_delay=settings.retry_max_delay,
+    deadline=settings.api_timeout * settings.retry_deadline_factor,
+    breaker_options={
+        "window": settings.breaker_window,
+        "min_requests": settings.breaker_min_requests,
+        "threshold": settings.breaker_error_threshold,
+        "open_seconds": settings.breaker_open_seconds,
+    }
+)
@@ -0,0 +1,285 @@
+"""
+Interpretação das respostas de texto dos provedores.
+Localiza o objeto JSON numa única varredura (tolerando cercas markdown e
+texto ao redor), repara vírgulas finais e respostas truncadas e mapeia
+o resultado para DocumentData, contabilizando as falhas por categoria.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import orjson
+from pydantic import ValidationError
+from ..models import DocumentData
+
+logger = logging.getLogger(__name__)
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class ResponseParseError(ValueError):
+    """
+    Resposta do provedor que não pôde ser convertida em DocumentData.
+    """
+
+    def __init__(self, message: str, category: str):
+        super().__init__(message)
+        self.category = category
+
+
+class ScanResult:
+    """
+    Resultado da varredura: posição do objeto raiz e reparos necessários.
+    """
+
+    __slots__ = ("start", "end", "trailing_commas", "safe_end", "safe_stack", "in_string")
+
+    def __init__(self):
+        self.start = 0
+        self.end: Optional[int] = None
+        self.trailing_commas: List[int] = []
+        # Último ponto em que o texto pode ser cortado e fechado (truncamento)
+        self.safe_end: Optional[int] = None
+        self.safe_stack: Tuple[str, ...] = ()
+        self.in_string = False
+
+
+# Tokens estruturais; strings inteiras (ou até o fim, se truncadas) num só passo
+TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(?P<close>")?|[{}\[\],:]')
+
+
+def scan(text: str, start: int) -> ScanResult:
+    """
+    Varredura linear a partir do "{" em `start`, acompanhando strings
+    e a pilha de objetos/listas abertos.
+    """
+    result = ScanResult()
+    result.start = start
+
+    # Pilha de [abertura, esperando_chave]
+    stack: List[list] = []
+    last_comma: Optional[int] = None
+
+    for match in TOKEN.finditer(text, start):
+        token = match.group()
+        i = match.start()
+        c = token[0]
+
+        if c == '"':
+            if match.group("close") is None:
+                result.in_string = True
+                return result
+            frame = stack[-1]
+            if not (frame[0] == "{" and frame[1]):
+                # Fim de um valor string
+                result.safe_end = match.end()
+                result.safe_stack = tuple(f[0] for f in stack)
+            last_comma = None
+        elif c == "{" or c == "[":
+            stack.append([c, c == "{"])
+            last_comma = None
+            result.safe_end = i + 1
+            result.safe_stack = tuple(f[0] for f in stack)
+        elif c == "}" or c == "]":
+            if last_comma is not None and not text[last_comma + 1:i].strip():
+                result.trailing_commas.append(last_comma)
+            last_comma = None
+            stack.pop()
+            if not stack:
+                result.end = i + 1
+                return result
+            result.safe_end = i + 1
+            result.safe_stack = tuple(f[0] for f in stack)
+        elif c == ",":
+            frame = stack[-1]
+            if not (frame[0] == "{" and frame[1]):
+                # O que vem antes da vírgula é um valor completo
+                result.safe_end = i
+                result.safe_stack = tuple(f[0] for f in stack)
+            if frame[0] == "{":
+                frame[1] = True
+            last_comma = i
+        else:  # ":"
+            stack[-1][1] = False
+            last_comma = None
+
+    return result
+
+
+def _without(text: str, positions: List[int]) -> str:
+    """
+    Remove os caracteres nas posições informadas (em ordem crescente).
+    """
+    parts = []
+    previous = 0
+    for position in positions:
+        parts.append(text[previous:position])
+        previous = position + 1
+    parts.append(text[previous:])
+    return "".join(parts)
+
+
+def _coerce(value: Any) -> Optional[str]:
+    """
+    Converte valores não textuais para os campos string do DocumentData.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class ResponseParser:
+    """
+    Converte o texto do provedor em DocumentData, com reparos baratos
+    antes de desistir (uma nova extração custa muito mais).
+    """
+
+    CATEGORIES = ("empty", "no_json", "invalid_json", "not_object", "schema")
+
+    def __init__(self):
+        self.parsed = 0
+        self.surrounding_text = 0
+        self.repaired_trailing_comma = 0
+        self.repaired_truncation = 0
+        self.coerced_fields = 0
+        self.failures: Dict[str, Dict[str, int]] = {}
+
+    def extract_json(self, text: str) -> Dict[str, Any]:
+        """
+        Localiza e decodifica o objeto JSON da resposta.
+
+        Raises:
+            ResponseParseError: sem JSON aproveitável
+        """
+        if not text or not text.strip():
+            raise ResponseParseError("Resposta vazia", "empty")
+
+        start = text.find("{")
+        if start < 0:
+            raise ResponseParseError("Nenhum objeto JSON na resposta", "no_json")
+
+        # Caminho rápido: do primeiro "{" ao último "}" já é JSON válido
+        end = text.rfind("}") + 1
+        if end > start:
+            try:
+                data = orjson.loads(text[start:end])
+            except orjson.JSONDecodeError:
+                pass
+            else:
+                if isinstance(data, dict):
+                    self._count_surrounding(text, start, end)
+                    return data
+
+        found = scan(text, start)
+        if found.end is not None:
+            candidate = text[found.start:found.end]
+            if found.trailing_commas:
+                candidate = _without(
+                    candidate, [p - found.start for p in found.trailing_commas]
+                )
+                self.repaired_trailing_comma += 1
+        else:
+            # Truncado: cortar no último valor completo e fechar o que ficou aberto
+            if found.safe_end is None:
+                raise ResponseParseError("JSON truncado sem campos completos", "invalid_json")
+            commas = [p - found.start for p in found.trailing_commas if p < found.safe_end]
+            candidate = _without(text[found.start:found.safe_end], commas) + "".join(
+                CLOSERS[opener] for opener in reversed(found.safe_stack)
+            )
+            self.repaired_truncation += 1
+            logger.warning("Resposta truncada reparada (campos incompletos descartados)")
+
+        self._count_surrounding(text, start, found.end)
+
+        try:
+            data = orjson.loads(candidate)
+        except orjson.JSONDecodeError as e:
+            raise ResponseParseError(f"JSON inválido na resposta: {e}", "invalid_json")
+        if not isinstance(data, dict):
+            raise ResponseParseError("JSON da resposta não é um objeto", "not_object")
+        return data
+
+    def _count_surrounding(self, text: str, start: int, end: Optional[int]) -> None:
+        """
+        Conta respostas com texto além da cerca markdown ao redor do JSON.
+        """
+        if text[:start].strip() not in ("```json", "```", ""):
+            self.surrounding_text += 1
+        elif end is not None and text[end:].strip() not in ("```", ""):
+            self.surrounding_text += 1
+
+    def to_document(self, data: Dict[str, Any]) -> DocumentData:
+        """
+        Mapeia o objeto para DocumentData (campos desconhecidos são ignorados,
+        valores não textuais viram texto).
+
+        Raises:
+            ResponseParseError: campos obrigatórios ausentes
+        """
+        fields: Dict[str, Any] = {}
+        for name in DocumentData.model_fields:
+            if name not in data:
+                continue
+            value = data[name]
+            coerced = _coerce(value)
+            if coerced is not value:
+                self.coerced_fields += 1
+            fields[name] = coerced
+        try:
+            return DocumentData(**fields)
+        except ValidationError as e:
+            missing = ", ".join(str(error["loc"][0]) for error in e.errors())
+            raise ResponseParseError(f"Campos inválidos na resposta: {missing}", "schema")
+
+    def parse(self, text: str, provider: str, label: str) -> DocumentData:
+        """
+        Texto do provedor -> DocumentData.
+
+        Raises:
+            ValueError: resposta inaproveitável (mensagem com o nome do provedor)
+        """
+        return self._checked(lambda: self.to_document(self.extract_json(text)), provider, label)
+
+    def parse_structured(self, data: Any, provider: str, label: str) -> DocumentData:
+        """
+        Objeto já estruturado pelo provedor (tool use) -> DocumentData.
+
+        Raises:
+            ValueError: objeto incompatível com o DocumentData
+        """
+        def convert() -> DocumentData:
+            if not isinstance(data, dict):
+                raise ResponseParseError("Saída estruturada não é um objeto", "not_object")
+            return self.to_document(data)
+        return self._checked(convert, provider, label)
+
+    def _checked(self, convert, provider: str, label: str) -> DocumentData:
+        """
+        Executa a conversão contabilizando falhas por provedor e categoria.
+        """
+        try:
+            document = convert()
+        except ResponseParseError as e:
+            by_provider = self.failures.setdefault(provider, {})
+            by_provider[e.category] = by_provider.get(e.category, 0) + 1
+            logger.error(f"Erro ao interpretar resposta de {label} ({e.category}): {str(e)}")
+            raise ResponseParseError(f"Resposta inválida da API {label}", e.category) from e
+        self.parsed += 1
+        return document
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "parsed": self.parsed,
+            "surrounding_text": self.surrounding_text,
+            "repaired_trailing_comma": self.repaired_trailing_comma,
+            "repaired_truncation": self.repaired_truncation,
+            "coerced_fields": self.coerced_fields,
+            "failures": self.failures,
+        }
+
+
+# Instância única compartilhada pela aplicação
+response_parser = ResponseParser()
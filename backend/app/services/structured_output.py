@@ -0,0 +1,88 @@
+"""
+Saída estruturada nativa dos provedores.
+Gera a partir do DocumentData o schema usado como ferramenta do Claude
+(tool use) e como responseSchema do Gemini, dispensando o pedido de
+"APENAS o JSON" em texto livre.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from ..models import DocumentData
+from ..config import get_settings
+from .prompts import fields_for
+
+settings = get_settings()
+
+TOOL_NAME = "registrar_documento"
+
+
+def output_mode() -> str:
+    """
+    Modo de saída ativo ("structured" ou "text"), usado em métricas e no cache.
+    """
+    return "structured" if settings.structured_output else "text"
+
+
+@lru_cache(maxsize=None)
+def document_json_schema(
+    document_type: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
+    """
+    JSON Schema do DocumentData restrito aos campos do tipo de documento
+    ou aos informados (campos string, opcionais aceitam null).
+    """
+    properties: Dict[str, Any] = {}
+    required = []
+    for name in fields or fields_for(document_type):
+        field = DocumentData.model_fields[name]
+        schema: Dict[str, Any] = {"type": "string" if field.is_required() else ["string", "null"]}
+        if field.description:
+            schema["description"] = field.description
+        properties[name] = schema
+        if field.is_required():
+            required.append(name)
+    return {"type": "object", "properties": properties, "required": required}
+
+
+@lru_cache(maxsize=None)
+def gemini_response_schema(
+    document_type: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
+    """
+    O mesmo schema no subconjunto OpenAPI aceito pelo Gemini.
+    """
+    properties: Dict[str, Any] = {}
+    required = []
+    for name in fields or fields_for(document_type):
+        field = DocumentData.model_fields[name]
+        schema: Dict[str, Any] = {"type": "STRING"}
+        if not field.is_required():
+            schema["nullable"] = True
+        else:
+            required.append(name)
+        if field.description:
+            schema["description"] = field.description
+        properties[name] = schema
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": required,
+        "propertyOrdering": list(properties),
+    }
+
+
+@lru_cache(maxsize=None)
+def claude_tool(
+    document_type: Optional[str] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
+    """
+    Definição da ferramenta que o Claude é obrigado a chamar.
+    """
+    return {
+        "name": TOOL_NAME,
+        "description": "Registra os dados extraídos do documento de identificação.",
+        "input_schema": document_json_schema(document_type, fields),
+    }
@@ -0,0 +1,194 @@
+"""
+Recebimento de uploads multipart/form-data em streaming.
+O arquivo é gravado em partes num SpooledTemporaryFile e o limite de
+tamanho é aplicado durante a leitura, sem carregar o corpo inteiro em memória.
+"""
+
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Acima deste tamanho o arquivo temporário sai da memória para o disco
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+@dataclass
+class UploadedFile:
+    """
+    Arquivo recebido: conteúdo em arquivo temporário, tamanho exato e hash.
+    """
+    field_name: str
+    file_name: str
+    content_type: str
+    file: tempfile.SpooledTemporaryFile
+    size: int = 0
+    sha256: str = ""
+
+    def read(self) -> bytes:
+        """
+        Lê o conteúdo completo do arquivo.
+        """
+        self.file.seek(0)
+        return self.file.read()
+
+
+@dataclass
+class MultipartUpload:
+    """
+    Resultado do parse: campos de texto e arquivos recebidos.
+    """
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: List[UploadedFile] = field(default_factory=list)
+
+    def close(self) -> None:
+        """
+        Libera os arquivos temporários.
+        """
+        for uploaded in self.files:
+            uploaded.file.close()
+
+
+class UploadTooLargeError(Exception):
+    """Arquivo excedeu o tamanho máximo durante o streaming."""
+
+
+def _too_large(max_file_bytes: int) -> HTTPException:
+    """
+    Erro 413 padronizado com o limite em MB.
+    """
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Máximo: {max_file_bytes // (1024 * 1024)}MB"
+    )
+
+
+class _PartState:
+    """
+    Estado da parte multipart sendo lida.
+    """
+
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.name = ""
+        self.file: Optional[UploadedFile] = None
+        self.hasher = None
+        self.value = bytearray()
+
+
+async def receive_multipart(
+    request: Request,
+    max_file_bytes: int,
+    max_files: int = 1,
+    max_field_bytes: int = 64 * 1024
+) -> MultipartUpload:
+    """
+    Lê o corpo multipart em streaming.
+
+    Args:
+        request: Requisição FastAPI
+        max_file_bytes: Tamanho máximo por arquivo
+        max_files: Quantidade máxima de arquivos
+        max_field_bytes: Tamanho máximo de cada campo de texto
+
+    Raises:
+        HTTPException: 400 (corpo inválido), 413 (arquivo grande demais)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Esperado multipart/form-data")
+
+    # Rejeitar cedo quando o Content-Length já denuncia o excesso
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_file_bytes * max_files + max_field_bytes * 8:
+            raise _too_large(max_file_bytes)
+
+    upload = MultipartUpload()
+    state = _PartState()
+
+    def on_part_begin():
+        nonlocal state
+        state = _PartState()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state.header_field += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state.header_value += data[start:end]
+
+    def on_header_end():
+        state.headers[state.header_field.lower()] = state.header_value
+        state.header_field = b""
+        state.header_value = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state.headers.get(b"content-disposition", b""))
+        state.name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options:
+            if len(upload.files) >= max_files:
+                raise HTTPException(status_code=400, detail=f"Máximo de {max_files} arquivo(s)")
+            state.file = UploadedFile(
+                field_name=state.name,
+                file_name=options[b"filename"].decode("utf-8", "replace"),
+                content_type=state.headers.get(
+                    b"content-type", b"application/octet-stream"
+                ).decode("latin-1"),
+                file=tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            )
+            state.hasher = hashlib.sha256()
+            upload.files.append(state.file)
+
+    def on_part_data(data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if state.file is not None:
+            state.file.size += len(chunk)
+            if state.file.size > max_file_bytes:
+                raise UploadTooLargeError()
+            state.file.file.write(chunk)
+            state.hasher.update(chunk)
+        else:
+            state.value += chunk
+            if len(state.value) > max_field_bytes:
+                raise HTTPException(status_code=400, detail=f"Campo muito grande: {state.name}")
+
+    def on_part_end():
+        if state.file is not None:
+            state.file.sha256 = state.hasher.hexdigest()
+            state.file.file.seek(0)
+        else:
+            upload.fields[state.name] = state.value.decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except UploadTooLargeError:
+        upload.close()
+        raise _too_large(max_file_bytes)
+    except HTTPException:
+        upload.close()
+        raise
+    except Exception as e:
+        upload.close()
+        logger.error(f"Erro ao ler upload multipart: {str(e)}")
+        raise HTTPException(status_code=400, detail="Corpo multipart inválido")
+
+    return upload
@@ -0,0 +1,138 @@
+"""
+Consumo de tokens e latência por provedor, modo de saída e prompt.
+Permite comparar o modo estruturado com o de texto livre e os prompts
+por tipo de documento (e o cache de prompt do Claude) com o genérico.
+Também acumula o consumo de cada requisição (contextvar), para a resposta.
+"""
+
+from contextvars import ContextVar
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+GENERIC = "generic"
+
+
+class RequestUsage:
+    """
+    Consumo acumulado das chamadas ao provedor feitas por uma requisição
+    (várias, quando há hedge ou divisão de PDF).
+    """
+
+    __slots__ = (
+        "calls", "input_tokens", "output_tokens", "cache_read_input_tokens",
+        "cache_creation_input_tokens", "provider_seconds", "time_saved_seconds",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.provider_seconds = 0.0
+        self.time_saved_seconds: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "provider_seconds": round(self.provider_seconds, 3),
+            "time_saved_seconds": round(self.time_saved_seconds, 3)
+            if self.time_saved_seconds is not None else None,
+        }
+
+
+# Consumo da requisição em andamento (definido pelo pipeline)
+current_usage: ContextVar[Optional[RequestUsage]] = ContextVar("current_usage", default=None)
+
+
+class UsageTracker:
+    """
+    Janela deslizante de (latência, tokens de entrada, tokens de saída,
+    tokens lidos do cache) por (provedor, modo, prompt), mais totais.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str, str], Deque[Tuple[float, int, int, int]]] = {}
+        self._totals: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+
+    def record(
+        self,
+        provider: str,
+        mode: str,
+        seconds: float,
+        input_tokens: Optional[int],
+        output_tokens: Optional[int],
+        prompt: Optional[str] = None,
+        cache_read_tokens: Optional[int] = None,
+        cache_creation_tokens: Optional[int] = None
+    ) -> None:
+        """
+        Registra uma chamada bem-sucedida ao provedor e a soma ao consumo
+        da requisição em andamento.
+        """
+        prompt = prompt or GENERIC
+        key = (provider, mode, prompt)
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+            self._totals[key] = {
+                "calls": 0, "input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0,
+            }
+        samples.append((seconds, input_tokens or 0, output_tokens or 0, cache_read_tokens or 0))
+        totals = self._totals[key]
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens or 0
+        totals["output_tokens"] += output_tokens or 0
+        totals["cache_read_input_tokens"] += cache_read_tokens or 0
+
+        usage = current_usage.get()
+        if usage is None:
+            return
+        usage.calls += 1
+        usage.input_tokens += input_tokens or 0
+        usage.output_tokens += output_tokens or 0
+        usage.cache_read_input_tokens += cache_read_tokens or 0
+        usage.cache_creation_input_tokens += cache_creation_tokens or 0
+        usage.provider_seconds += seconds
+        if prompt != GENERIC or cache_read_tokens:
+            baseline = self.baseline(provider, mode)
+            if baseline is not None:
+                usage.time_saved_seconds = (usage.time_saved_seconds or 0.0) + baseline - seconds
+
+    def baseline(self, provider: str, mode: str) -> Optional[float]:
+        """
+        Latência mediana com o prompt genérico sem leitura de cache,
+        referência para estimar o tempo economizado.
+        """
+        latencies = sorted(
+            s[0] for s in self._samples.get((provider, mode, GENERIC), ()) if not s[3]
+        )
+        if not latencies:
+            return None
+        return latencies[len(latencies) // 2]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Resumo por provedor e "modo/prompt".
+        """
+        result: Dict[str, Any] = {}
+        for (provider, mode, prompt), samples in self._samples.items():
+            latencies = sorted(s[0] for s in samples)
+            count = len(samples)
+            result.setdefault(provider, {})[f"{mode}/{prompt}"] = {
+                **self._totals[(provider, mode, prompt)],
+                "p50_seconds": round(latencies[count // 2], 3),
+                "p95_seconds": round(latencies[min(count - 1, int(count * 0.95))], 3),
+                "avg_input_tokens": round(sum(s[1] for s in samples) / count, 1),
+                "avg_output_tokens": round(sum(s[2] for s in samples) / count, 1),
+            }
+        return result
+
+
+# Instância única compartilhada pela aplicação
+usage_tracker = UsageTracker()
@@ -0,0 +1,413 @@
+"""
+Validação e normalização dos dados extraídos.
+Confere os dígitos verificadores do CPF e do registro da CNH, valida CEP,
+datas, UF e categoria da CNH e converte os campos para a forma canônica
+(000.000.000-00, 00000-000, DD/MM/AAAA, sigla da UF), anotando o estado de
+cada campo: valid (já canônico), normalized (corrigido só no formato) ou
+invalid (não passa na verificação; pode motivar uma nova consulta ao
+provedor só desses campos).
+
+A validação é feita por coluna: cada campo de todos os registros passa
+pela mesma verificação, e valores repetidos (comuns em backfills) são
+verificados uma única vez. Lotes grandes são divididos em partes
+validadas no pool de CPU.
+"""
+
+import asyncio
+import logging
+import re
+import unicodedata
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from ..models import DocumentData, FieldValidation, ValidationReport
+from ..config import get_settings
+from .cpu_pool import cpu_pool
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+VALID = "valid"
+NORMALIZED = "normalized"
+INVALID = "invalid"
+
+# (estado, valor canônico, motivo); None = valor que não dá para verificar
+Check = Optional[Tuple[str, str, Optional[str]]]
+
+UFS = frozenset((
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+))
+
+# Nomes por extenso (sem acento, maiúsculos) -> sigla
+STATE_NAMES = {
+    "ACRE": "AC", "ALAGOAS": "AL", "AMAPA": "AP", "AMAZONAS": "AM", "BAHIA": "BA",
+    "CEARA": "CE", "DISTRITO FEDERAL": "DF", "ESPIRITO SANTO": "ES", "GOIAS": "GO",
+    "MARANHAO": "MA", "MATO GROSSO": "MT", "MATO GROSSO DO SUL": "MS", "MINAS GERAIS": "MG",
+    "PARA": "PA", "PARAIBA": "PB", "PARANA": "PR", "PERNAMBUCO": "PE", "PIAUI": "PI",
+    "RIO DE JANEIRO": "RJ", "RIO GRANDE DO NORTE": "RN", "RIO GRANDE DO SUL": "RS",
+    "RONDONIA": "RO", "RORAIMA": "RR", "SANTA CATARINA": "SC", "SAO PAULO": "SP",
+    "SERGIPE": "SE", "TOCANTINS": "TO",
+}
+
+CNH_CATEGORIES = frozenset(("ACC", "A", "B", "C", "D", "E", "AB", "AC", "AD", "AE"))
+
+# Datas que não podem estar no futuro e datas de validade/vencimento
+PAST_DATE_FIELDS = ("dataNascimento", "dataExpedicao", "primeiraHabilitacao")
+DATE_FIELDS = PAST_DATE_FIELDS + ("dataVencimento", "validade")
+# Datas que não podem ser anteriores ao nascimento
+AFTER_BIRTH_FIELDS = ("dataExpedicao", "primeiraHabilitacao", "validade")
+MIN_YEAR = 1900
+# Validade máxima aceita à frente da data atual (anos)
+MAX_YEARS_AHEAD = 30
+
+SEPARATORS = re.compile(r"[\s.\-/]")
+DATE_PATTERN = re.compile(r"(\d{1,2})[/.\-\s](\d{1,2})[/.\-\s](\d{4}|\d{2})")
+ISO_DATE_PATTERN = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ].*)?")
+ISSUER_PATTERN = re.compile(r"([A-Z]{2,10})\s*[/\-\s]\s*([A-Z]{2})")
+
+CPF_WEIGHTS_1 = tuple(range(10, 1, -1))
+CPF_WEIGHTS_2 = tuple(range(11, 1, -1))
+
+
+def _plain(value: str) -> str:
+    """Maiúsculas, sem acentos e com espaços simples."""
+    text = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return " ".join(text.upper().split())
+
+
+def _result(value: str, canonical: str) -> Tuple[str, str, None]:
+    return (VALID if canonical == value else NORMALIZED), canonical, None
+
+
+def check_cpf(value: str) -> Check:
+    """
+    11 dígitos com os dois dígitos verificadores; sem os zeros à esquerda
+    (planilhas) os dígitos são completados antes da verificação.
+    """
+    digits = SEPARATORS.sub("", value)
+    if digits.isdigit() and 9 <= len(digits) < 11 and digits == value.strip():
+        digits = digits.zfill(11)
+    if len(digits) != 11 or not digits.isdigit():
+        return INVALID, value, "CPF deve ter 11 dígitos"
+    if digits == digits[0] * 11:
+        return INVALID, value, "CPF com todos os dígitos iguais"
+    numbers = [ord(c) - 48 for c in digits]
+    first = sum(d * w for d, w in zip(numbers, CPF_WEIGHTS_1)) * 10 % 11 % 10
+    second = sum(d * w for d, w in zip(numbers, CPF_WEIGHTS_2)) * 10 % 11 % 10
+    if numbers[9] != first or numbers[10] != second:
+        return INVALID, value, "dígitos verificadores do CPF não conferem"
+    return _result(value, f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}")
+
+
+def check_cnh(value: str) -> Check:
+    """
+    Número de registro da CNH: 11 dígitos com os verificadores (algoritmo do Denatran).
+    """
+    digits = SEPARATORS.sub("", value)
+    if len(digits) != 11 or not digits.isdigit():
+        return INVALID, value, "registro da CNH deve ter 11 dígitos"
+    if digits == digits[0] * 11:
+        return INVALID, value, "registro da CNH com todos os dígitos iguais"
+    numbers = [ord(c) - 48 for c in digits]
+    first = sum(d * w for d, w in zip(numbers, range(9, 0, -1))) % 11
+    discount = 0
+    if first >= 10:
+        first, discount = 0, 2
+    # Ordem do Denatran: desconto antes do ajuste (resto 0 ou 1 com desconto dá 9 ou 10)
+    second = sum(d * w for d, w in zip(numbers, range(1, 10))) % 11 - discount
+    if second < 0:
+        second += 11
+    if second >= 10:
+        second = 0
+    if numbers[9] != first or numbers[10] != second:
+        return INVALID, value, "dígitos verificadores do registro da CNH não conferem"
+    return _result(value, digits)
+
+
+def check_cep(value: str) -> Check:
+    digits = SEPARATORS.sub("", value)
+    if len(digits) != 8 or not digits.isdigit():
+        return INVALID, value, "CEP deve ter 8 dígitos"
+    # As faixas dos Correios começam em 01000-000
+    if digits < "01000000":
+        return INVALID, value, "CEP fora das faixas existentes"
+    return _result(value, f"{digits[:5]}-{digits[5:]}")
+
+
+def check_uf(value: str) -> Check:
+    plain = _plain(value)
+    uf = plain if plain in UFS else STATE_NAMES.get(plain)
+    if uf is None:
+        return INVALID, value, "UF desconhecida"
+    return _result(value, uf)
+
+
+def check_issuer(value: str) -> Check:
+    """
+    Órgão expedidor com UF (SSP-SP, SSP SP -> SSP/SP); só o órgão não é verificado.
+    """
+    match = ISSUER_PATTERN.fullmatch(_plain(value))
+    if match is None:
+        return None
+    if match.group(2) not in UFS:
+        return INVALID, value, "UF do órgão expedidor desconhecida"
+    return _result(value, f"{match.group(1)}/{match.group(2)}")
+
+
+def check_rg(value: str) -> Check:
+    """
+    O formato do RG varia por estado: só espaços e maiúsculas são
+    normalizados, e a quantidade de dígitos é conferida.
+    """
+    canonical = " ".join(value.upper().split())
+    digits = sum(c.isdigit() for c in canonical)
+    if not 4 <= digits <= 14:
+        return INVALID, value, "RG deve ter entre 4 e 14 dígitos"
+    return _result(value, canonical)
+
+
+def check_category(value: str) -> Check:
+    canonical = SEPARATORS.sub("", value.upper())
+    if canonical not in CNH_CATEGORIES:
+        return INVALID, value, "categoria da CNH desconhecida"
+    return _result(value, canonical)
+
+
+def date_checker(today: date, past: bool) -> Callable[[str], Check]:
+    """
+    Verificação de datas (DD/MM/AAAA, DD-MM-AA, AAAA-MM-DD, DDMMAAAA...),
+    com o limite de futuro do campo.
+    """
+    latest = today.year if past else today.year + MAX_YEARS_AHEAD
+
+    def check_date(value: str) -> Check:
+        text = value.strip()
+        match = DATE_PATTERN.fullmatch(text)
+        if match is not None:
+            day, month, year = match.groups()
+        elif (match := ISO_DATE_PATTERN.fullmatch(text)) is not None:
+            year, month, day = match.groups()
+        elif len(text) == 8 and text.isdigit():
+            day, month, year = text[:2], text[2:4], text[4:]
+        else:
+            return INVALID, value, "formato de data não reconhecido"
+        number = int(year)
+        if len(year) == 2:
+            number += 2000 if 2000 + number <= latest else 1900
+        try:
+            parsed = date(number, int(month), int(day))
+        except ValueError:
+            return INVALID, value, "data inexistente"
+        if past and parsed > today:
+            return INVALID, value, "data no futuro"
+        if parsed.year < MIN_YEAR or parsed.year > latest:
+            return INVALID, value, "ano fora do intervalo aceito"
+        return _result(value, parsed.strftime("%d/%m/%Y"))
+
+    return check_date
+
+
+def field_checks(today: date) -> Dict[str, Callable[[str], Check]]:
+    """
+    Verificação de cada campo do DocumentData que tem regra.
+    """
+    checks: Dict[str, Callable[[str], Check]] = {
+        "cpf": check_cpf,
+        "numeroRegistro": check_cnh,
+        "cep": check_cep,
+        "uf": check_uf,
+        "orgaoExpedidor": check_issuer,
+        "rg": check_rg,
+        "categoria": check_category,
+    }
+    past, future = date_checker(today, True), date_checker(today, False)
+    for name in DATE_FIELDS:
+        checks[name] = past if name in PAST_DATE_FIELDS else future
+    return checks
+
+
+def _date_key(canonical: str) -> str:
+    """DD/MM/AAAA -> AAAAMMDD (comparável como texto)."""
+    return canonical[6:] + canonical[3:5] + canonical[:2]
+
+
+def validate_records(
+    records: Sequence[Dict[str, Any]],
+    normalize: bool = True,
+    today: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Valida registros (dicts com os campos do DocumentData) coluna a coluna.
+    Campos sem regra e chaves desconhecidas são mantidos como vieram.
+
+    Returns:
+        Para cada registro: {"valid", "data", "fields"}, com "fields"
+        mapeando cada campo verificado para {"status", "reason"}
+    """
+    today = today or date.today()
+    fields: List[Dict[str, Dict[str, Any]]] = [{} for _ in records]
+    changes: List[Dict[str, str]] = [{} for _ in records]
+    # Chave AAAAMMDD das datas válidas, por campo, para as regras entre campos
+    dates: Dict[str, List[Optional[str]]] = {}
+
+    for name, check in field_checks(today).items():
+        column = [record.get(name) for record in records]
+        # Cada valor distinto da coluna é verificado uma vez; o mesmo dict
+        # de estado é compartilhado pelos registros com esse valor
+        memo: Dict[Any, Any] = {}
+        keys: Optional[List[Optional[str]]] = [None] * len(column) if name in DATE_FIELDS else None
+        for i, value in enumerate(column):
+            if value is None or value == "":
+                continue
+            if not isinstance(value, str):
+                # Números de planilhas, listas etc. são verificados como texto
+                value = str(value)
+            found = memo.get(value)
+            if found is None:
+                checked = check(value)
+                if checked is None:
+                    found = memo[value] = (None, None, None)
+                else:
+                    status, canonical, reason = checked
+                    found = memo[value] = (
+                        {"status": status, "reason": reason},
+                        canonical if status == NORMALIZED else None,
+                        _date_key(canonical) if keys is not None and status != INVALID else None,
+                    )
+            report, canonical, key = found
+            if report is None:
+                continue
+            fields[i][name] = report
+            if canonical is not None:
+                changes[i][name] = canonical
+            if keys is not None:
+                keys[i] = key
+        if keys is not None:
+            dates[name] = keys
+
+    births = dates["dataNascimento"]
+    before_birth = {"status": INVALID, "reason": "data anterior ao nascimento"}
+    for name in AFTER_BIRTH_FIELDS:
+        for i, (birth, key) in enumerate(zip(births, dates[name])):
+            if birth is not None and key is not None and key < birth:
+                fields[i][name] = before_birth
+                changes[i].pop(name, None)
+
+    results = []
+    for record, report, changed in zip(records, fields, changes):
+        valid = all(field["status"] != INVALID for field in report.values())
+        data = {**record, **changed} if normalize and changed else record
+        results.append({"valid": valid, "data": data, "fields": report})
+    return results
+
+
+class DocumentValidator:
+    """
+    Valida e normaliza o DocumentData de cada extração e os lotes
+    enviados em /api/validate/batch.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.invalid_documents = 0
+        self.normalized_fields = 0
+        self.invalid_fields: Dict[str, int] = {}
+        self.batch_records = 0
+        self.batch_invalid_records = 0
+        self.reasks = 0
+        self.reask_fixed_fields = 0
+        self.reask_failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.validation_enabled
+
+    def check(self, data: DocumentData) -> Dict[str, Any]:
+        """
+        Resultado da validação do documento, sem alterar contadores.
+        """
+        return validate_records([data.model_dump(exclude_none=True)], settings.validation_normalize)[0]
+
+    def validate(
+        self,
+        data: DocumentData,
+        reasked: Optional[List[str]] = None
+    ) -> Tuple[DocumentData, ValidationReport]:
+        """
+        Documento normalizado (se validation_normalize) e o estado de cada campo.
+        """
+        result = self.check(data)
+        self.documents += 1
+        if not result["valid"]:
+            self.invalid_documents += 1
+        changes = {}
+        for name, field in result["fields"].items():
+            if field["status"] == NORMALIZED:
+                self.normalized_fields += 1
+                changes[name] = result["data"][name]
+            elif field["status"] == INVALID:
+                self.invalid_fields[name] = self.invalid_fields.get(name, 0) + 1
+        if changes and settings.validation_normalize:
+            data = data.model_copy(update=changes)
+        report = ValidationReport(
+            valid=result["valid"],
+            fields={name: FieldValidation(**field) for name, field in result["fields"].items()},
+            reasked=reasked
+        )
+        return data, report
+
+    def invalid(self, data: DocumentData) -> Dict[str, Tuple[str, str]]:
+        """
+        Campos inválidos do documento: nome -> (valor lido, motivo).
+        """
+        result = self.check(data)
+        return {
+            name: (getattr(data, name), field["reason"])
+            for name, field in result["fields"].items()
+            if field["status"] == INVALID
+        }
+
+    def merge_reask(self, data: DocumentData, answer: DocumentData, names: List[str]) -> DocumentData:
+        """
+        Aproveita da nova consulta só os campos que agora passam na validação.
+        """
+        result = self.check(answer)
+        fixed = {
+            name: getattr(answer, name) for name in names
+            if name in result["fields"] and result["fields"][name]["status"] != INVALID
+        }
+        self.reask_fixed_fields += len(fixed)
+        return data.model_copy(update=fixed) if fixed else data
+
+    async def validate_batch(self, records: List[Dict[str, Any]], normalize: bool = True) -> List[Dict[str, Any]]:
+        """
+        Valida o lote em partes de validation_batch_chunk registros no pool de CPU.
+        """
+        size = max(1, settings.validation_batch_chunk)
+        today = date.today()
+        parts = await asyncio.gather(*(
+            cpu_pool.run(validate_records, records[start:start + size], normalize, today)
+            for start in range(0, len(records), size)
+        ))
+        results = [result for part in parts for result in part]
+        self.batch_records += len(results)
+        self.batch_invalid_records += sum(1 for result in results if not result["valid"])
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "documents": self.documents,
+            "invalid_documents": self.invalid_documents,
+            "normalized_fields": self.normalized_fields,
+            "invalid_fields": self.invalid_fields,
+            "batch_records": self.batch_records,
+            "batch_invalid_records": self.batch_invalid_records,
+            "reasks": self.reasks,
+            "reask_fixed_fields": self.reask_fixed_fields,
+            "reask_failures": self.reask_failures,
+        }
+
+
+# Instância única compartilhada pela aplicação
+document_validator = DocumentValidator()
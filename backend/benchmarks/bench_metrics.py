@@ -0,0 +1,77 @@
+"""
+Microbenchmark do custo da instrumentação no caminho da requisição.
+
+Mede a observação de um histograma, um estágio cronometrado (StageTimer)
+e uma requisição ASGI mínima com e sem o MetricsMiddleware, além do
+tempo de um scrape de /metrics com as séries já populadas.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_metrics --repeat 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.services.metrics import MetricsMiddleware, MetricsRegistry
+
+
+async def plain_app(scope, receive, send):
+    """Aplicação ASGI que só responde 200 com um corpo pequeno."""
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+def scope() -> dict:
+    return {"type": "http", "method": "POST", "path": "/api/extract/", "headers": []}
+
+
+async def run_requests(app, repeat: int) -> float:
+    """Microssegundos por requisição."""
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await app(scope(), receive, send)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    registry = MetricsRegistry()
+
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        registry.observe_stage("upstream_total", "claude", "image/png", (i % 100) / 10)
+    observe_us = (time.perf_counter() - start) * 1e6 / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        with registry.time_stage("response_parse", "claude", "image/png"):
+            pass
+    timer_us = (time.perf_counter() - start) * 1e6 / args.repeat
+
+    plain_us = asyncio.run(run_requests(plain_app, args.repeat))
+    instrumented_us = asyncio.run(run_requests(MetricsMiddleware(plain_app, registry), args.repeat))
+
+    start = time.perf_counter()
+    size = len(registry.render())
+    render_ms = (time.perf_counter() - start) * 1e3
+
+    print(f"{'observe (histograma)':>28} {observe_us:>8.2f} us")
+    print(f"{'estágio cronometrado':>28} {timer_us:>8.2f} us")
+    print(f"{'requisição sem middleware':>28} {plain_us:>8.2f} us")
+    print(f"{'requisição com middleware':>28} {instrumented_us:>8.2f} us")
+    print(f"{'overhead por requisição':>28} {instrumented_us - plain_us:>8.2f} us")
+    print(f"{'scrape /metrics':>28} {render_ms:>8.2f} ms ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
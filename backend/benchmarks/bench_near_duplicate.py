@@ -0,0 +1,110 @@
+"""
+Microbenchmark do índice de quase-duplicatas.
+
+Preenche o índice com hashes aleatórios (tabelas construídas como na carga
+do snapshot), mede a consulta de um hash próximo de uma entrada (bits
+trocados dentro do limite) e de um hash sem correspondência, além da
+gravação/leitura do snapshot e do hash de uma imagem sintética.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_near_duplicate --entries 1000000 --threshold 4
+"""
+
+import argparse
+import io
+import os
+import random
+import resource
+import tempfile
+import time
+from array import array
+
+from PIL import Image, ImageDraw
+
+from app.services.near_duplicate import HammingIndex, image_hash, read_snapshot, write_snapshot
+
+
+def flip(value: int, bits: int, rng: random.Random) -> int:
+    for position in rng.sample(range(64), bits):
+        value ^= 1 << position
+    return value
+
+
+def synthetic_image(size: int) -> bytes:
+    image = Image.new("RGB", (size, int(size * 0.63)), (235, 230, 220))
+    draw = ImageDraw.Draw(image)
+    for line in range(12):
+        draw.rectangle((size // 20, 40 + line * size // 24, size // 2 + line * 17, 52 + line * size // 24), fill=(40, 40, 60))
+    draw.ellipse((int(size * 0.65), size // 10, int(size * 0.9), size // 2), fill=(150, 120, 100))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--threshold", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = HammingIndex(args.entries)
+    snapshot = {
+        "horizontal": array("Q", (rng.getrandbits(64) for _ in range(args.entries))),
+        "vertical": array("Q", (rng.getrandbits(64) for _ in range(args.entries))),
+        "pages": array("H", [1]) * args.entries,
+        "digests": b"".join(i.to_bytes(32, "big") for i in range(args.entries)),
+        "extra": {},
+    }
+    start = time.perf_counter()
+    index.load(snapshot)
+    build_s = time.perf_counter() - start
+    del snapshot
+    rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+
+    positions = [rng.randrange(args.entries) for _ in range(args.queries)]
+    near = [
+        ((flip(index.horizontal[p], args.threshold, rng), flip(index.vertical[p], args.threshold // 2, rng)),)
+        for p in positions
+    ]
+    start = time.perf_counter()
+    found = sum(1 for signature, p in zip(near, positions)
+                if any(position == p for _, position in index.search(signature, args.threshold)))
+    near_us = (time.perf_counter() - start) * 1e6 / args.queries
+
+    misses = [((rng.getrandbits(64), rng.getrandbits(64)),) for _ in range(args.queries)]
+    start = time.perf_counter()
+    false_matches = sum(len(index.search(signature, args.threshold)) for signature in misses)
+    miss_us = (time.perf_counter() - start) * 1e6 / args.queries
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "near_duplicates.bin")
+        start = time.perf_counter()
+        write_snapshot(path, index.export())
+        write_ms = (time.perf_counter() - start) * 1e3
+        size_mb = os.path.getsize(path) / 1e6
+        start = time.perf_counter()
+        read_snapshot(path)
+        read_ms = (time.perf_counter() - start) * 1e3
+
+    image = synthetic_image(2400)
+    start = time.perf_counter()
+    for _ in range(20):
+        image_hash(image)
+    hash_ms = (time.perf_counter() - start) * 1e3 / 20
+
+    print(f"{'entradas':>28} {args.entries:>10}")
+    print(f"{'construção':>28} {build_s:>10.2f} s")
+    print(f"{'memória (aprox.)':>28} {rss_mb:>10.1f} MB")
+    print(f"{'consulta próxima':>28} {near_us:>10.1f} us ({found}/{args.queries} encontradas)")
+    print(f"{'consulta sem correspondência':>28} {miss_us:>10.1f} us ({false_matches} falsos positivos)")
+    print(f"{'gravação do snapshot':>28} {write_ms:>10.1f} ms ({size_mb:.1f} MB)")
+    print(f"{'leitura do snapshot':>28} {read_ms:>10.1f} ms")
+    print(f"{'hash de JPEG 2400px':>28} {hash_ms:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
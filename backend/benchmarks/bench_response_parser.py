@@ -0,0 +1,114 @@
+"""
+Benchmark e verificação do parser de respostas dos provedores.
+
+Roda o corpus de saídas de provedores (benchmarks/corpus/provider_outputs.jsonl),
+confere o resultado esperado de cada caso (campos ou categoria de falha) e
+compara tempo e taxa de aproveitamento com a lógica anterior
+(split("```")[1] + json.loads). Sai com código 1 se algum caso divergir.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_response_parser --repeat 2000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from app.models import DocumentData
+from app.services.response_parser import ResponseParser, ResponseParseError
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "provider_outputs.jsonl")
+
+
+def legacy_parse(text: str) -> DocumentData:
+    """Lógica anterior, copiada dos serviços."""
+    response_text = text.strip()
+    if response_text.startswith("```"):
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+    return DocumentData(**json.loads(response_text.strip()))
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(parser: ResponseParser, case: dict) -> str:
+    """
+    Retorna "" se o caso bate com o esperado, ou a descrição da divergência.
+    """
+    try:
+        document = parser.parse(case["text"], case["provider"], case["provider"])
+    except ResponseParseError as e:
+        if case["expect"] == e.category:
+            return ""
+        return f"esperado {case['expect']}, obtido falha {e.category}"
+    if case["expect"] != "ok":
+        return f"esperado falha {case['expect']}, obtido sucesso"
+    data = document.model_dump()
+    for name, value in (case["fields"] or {}).items():
+        if data.get(name) != value:
+            return f"campo {name}: esperado {value!r}, obtido {data.get(name)!r}"
+    return ""
+
+
+def timed(func, texts: list, repeat: int) -> float:
+    """Microssegundos por resposta."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            try:
+                func(text)
+            except (ValueError, TypeError):
+                pass
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(texts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    # Os erros esperados do corpus não devem poluir a saída
+    logging.disable(logging.ERROR)
+
+    corpus = load_corpus(args.corpus)
+    response_parser = ResponseParser()
+
+    mismatches = []
+    legacy_ok = 0
+    for case in corpus:
+        problem = check(response_parser, case)
+        if problem:
+            mismatches.append((case["name"], problem))
+        try:
+            legacy_parse(case["text"])
+            legacy_ok += 1
+        except (ValueError, TypeError):
+            pass
+
+    texts = [case["text"] for case in corpus]
+    quiet = ResponseParser()
+    new_us = timed(lambda text: quiet.parse(text, "bench", "bench"), texts, args.repeat)
+    old_us = timed(legacy_parse, texts, args.repeat)
+    expected_ok = sum(1 for case in corpus if case["expect"] == "ok")
+
+    print(f"casos: {len(corpus)}  aproveitáveis: {expected_ok}")
+    print(f"{'':>8} {'sucesso':>8} {'us/resp':>9}")
+    print(f"{'antes':>8} {legacy_ok:>8} {old_us:>9.1f}")
+    print(f"{'depois':>8} {response_parser.parsed:>8} {new_us:>9.1f}")
+    print(json.dumps(response_parser.stats(), indent=2))
+
+    for name, problem in mismatches:
+        print(f"DIVERGENTE {name}: {problem}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
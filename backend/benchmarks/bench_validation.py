@@ -0,0 +1,69 @@
+"""
+Benchmark da validação/normalização em lote (caminho de /api/validate/batch).
+
+Gera registros sintéticos (CPFs com e sem dígitos verificadores corretos,
+CEPs e datas em formatos variados, parte deles repetida, como em backfills)
+e compara a validação por coluna de um lote com a validação registro a
+registro.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_validation --records 50000 --duplicates 0.3
+"""
+
+import argparse
+import random
+import time
+
+from app.services.validation import UFS, validate_records
+
+
+def cpf_with_check_digits(base: str) -> str:
+    numbers = [int(c) for c in base]
+    for weights in (range(10, 1, -1), range(11, 1, -1)):
+        numbers.append(sum(d * w for d, w in zip(numbers, weights)) * 10 % 11 % 10)
+    return "".join(map(str, numbers))
+
+
+def synthetic_record(rng: random.Random) -> dict:
+    base = "".join(str(rng.randrange(10)) for _ in range(9))
+    cpf = cpf_with_check_digits(base) if rng.random() < 0.9 else base + "00"
+    day, month = rng.randrange(1, 29), rng.randrange(1, 13)
+    return {
+        "cpf": cpf if rng.random() < 0.5 else f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}",
+        "cep": f"{rng.randrange(1000000, 99999999):08d}",
+        "dataNascimento": f"{day:02d}/{month:02d}/{rng.randrange(1940, 2005)}",
+        "dataExpedicao": f"{rng.randrange(2005, 2025)}-{month:02d}-{day:02d}",
+        "uf": rng.choice(sorted(UFS)).lower(),
+        "rg": f"{rng.randrange(10 ** 7, 10 ** 8)}-{rng.randrange(10)}",
+        "nome": "FULANO DE TAL",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="fração de registros repetidos")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    unique = [synthetic_record(rng) for _ in range(max(1, int(args.records * (1 - args.duplicates))))]
+    records = unique + [rng.choice(unique) for _ in range(args.records - len(unique))]
+
+    start = time.perf_counter()
+    results = validate_records(records)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for record in records:
+        validate_records([record])
+    single_s = time.perf_counter() - start
+
+    invalid = sum(1 for result in results if not result["valid"])
+    print(f"{'registros':>24} {len(records):>10} ({invalid} inválidos)")
+    print(f"{'lote (por coluna)':>24} {batch_s:>10.3f} s ({len(records) / batch_s:,.0f} registros/s)")
+    print(f"{'registro a registro':>24} {single_s:>10.3f} s ({len(records) / single_s:,.0f} registros/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+Teste de carga offline da API contra o mock local dos provedores.
+
+Sobe o mock (benchmarks/mock_provider.py) e a aplicação (uvicorn) em
+processos separados, com CLAUDE_BASE_URL/GEMINI_BASE_URL apontando para o
+mock, e dispara /api/extract/ (e as variantes upload, stream e batch) em
+cada combinação de concorrência e tamanho de arquivo. Cada arquivo recebe
+bytes finais únicos, para não cair no cache nem na coalescência.
+
+Reporta vazão, latência p50/p95/p99 (e primeiro evento, no stream), CPU por
+requisição e RSS do processo da aplicação (lidos de /proc, apenas Linux) e
+as chamadas recebidas pelo mock. Com --output grava o resultado em JSON para
+acompanhar regressões.
+
+Uso (a partir de backend/):
+    python -m benchmarks.load_test --endpoints extract upload --concurrency 1 8 32 \\
+        --sizes-kb 100 1000 --requests 200 --mock-latency-median 0.5 --output carga.json
+
+Com respostas reais gravadas (app/services/cassette.py) em vez do mock:
+    python -m benchmarks.load_test --app-env CASSETTE_MODE=replay CASSETTE_DIR=cassettes \
+        CASSETTE_MATCH=path
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+API_KEYS = {
+    "claude": "sk-ant-api03-" + "x" * 32,
+    "gemini": "AIza" + "x" * 35,
+}
+FORMATS = {
+    "image/jpeg": ("JPEG", "jpg"),
+    "image/png": ("PNG", "png"),
+    "application/pdf": ("PDF", "pdf"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_file(size_kb: int, file_type: str) -> bytes:
+    """
+    Imagem de ruído (incompressível) com aproximadamente o tamanho pedido.
+    """
+    image_format = FORMATS[file_type][0]
+    target = size_kb * 1024
+    side = 256
+    data = b""
+    for _ in range(4):
+        image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=85)
+        data = buffer.getvalue()
+        side = max(16, int(side * (target / len(data)) ** 0.5))
+    return data
+
+
+def unique(data: bytes, index: int) -> bytes:
+    """
+    Bytes após o fim do arquivo: ignorados pelos leitores, mudam o SHA-256.
+    """
+    return data + b"\n%load-test-" + str(index).encode() + b"\n"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class ProcessSampler:
+    """
+    CPU (utime+stime) e RSS de um processo via /proc; None fora do Linux.
+    """
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.peak_rss = 0
+
+    def available(self) -> bool:
+        return self.pid is not None and os.path.exists(f"/proc/{self.pid}/stat")
+
+    def cpu_seconds(self) -> Optional[float]:
+        if not self.available():
+            return None
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Campos após o nome do processo (que pode conter espaços)
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_mb(self) -> Optional[float]:
+        if not self.available():
+            return None
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return None
+
+    async def watch(self, stop: asyncio.Event) -> None:
+        """
+        Acompanha o pico de RSS durante o cenário.
+        """
+        self.peak_rss = 0
+        while not stop.is_set():
+            rss = self.rss_mb()
+            if rss is None:
+                return
+            self.peak_rss = max(self.peak_rss, rss)
+            try:
+                await asyncio.wait_for(stop.wait(), 0.1)
+            except asyncio.TimeoutError:
+                pass
+
+
+class Scenario:
+    def __init__(self, endpoint: str, provider: str, file_type: str, size_kb: int,
+                 concurrency: int, requests: int, batch_files: int):
+        self.endpoint = endpoint
+        self.provider = provider
+        self.file_type = file_type
+        self.size_kb = size_kb
+        self.concurrency = concurrency
+        self.requests = requests
+        self.batch_files = batch_files
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, data: bytes, index: int) -> Dict[str, Any]:
+    """
+    Uma requisição do cenário: status, sucesso e tempo até o primeiro evento.
+    """
+    provider = scenario.provider
+    api_key = API_KEYS["claude" if provider == "auto" else provider]
+    extension = FORMATS[scenario.file_type][1]
+    name = f"documento_{index}.{extension}"
+    fields = {"provider": provider, "api_key": api_key}
+    if provider == "auto":
+        fields["secondary_api_key"] = API_KEYS["gemini"]
+    first_event = None
+    start = time.perf_counter()
+
+    if scenario.endpoint in ("extract", "stream"):
+        body = {
+            **fields,
+            "file_content": base64.b64encode(unique(data, index)).decode(),
+            "file_type": scenario.file_type,
+            "file_name": name,
+        }
+        if scenario.endpoint == "extract":
+            response = await client.post("/api/extract/", json=body)
+            ok = response.status_code == 200 and response.json().get("success") is True
+            return {"status": response.status_code, "ok": ok, "first_event": None}
+        ok = False
+        async with client.stream("POST", "/api/extract/stream", json=body) as response:
+            status = response.status_code
+            async for line in response.aiter_lines():
+                if first_event is None and line.startswith("event:"):
+                    first_event = time.perf_counter() - start
+                if line.startswith("data:") and '"success"' in line:
+                    ok = json.loads(line[5:]).get("success") is True
+        return {"status": status, "ok": ok and status == 200, "first_event": first_event}
+
+    if scenario.endpoint == "upload":
+        files = {"file": (name, unique(data, index), scenario.file_type)}
+        response = await client.post("/api/extract/upload", data=fields, files=files)
+        ok = response.status_code == 200 and response.json().get("success") is True
+        return {"status": response.status_code, "ok": ok, "first_event": None}
+
+    # batch: NDJSON com um resultado por arquivo e um resumo
+    files = [
+        ("files", (f"{i}_{name}", unique(data, index * scenario.batch_files + i), scenario.file_type))
+        for i in range(scenario.batch_files)
+    ]
+    ok = False
+    async with client.stream("POST", "/api/extract/batch", data=fields, files=files) as response:
+        status = response.status_code
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if first_event is None:
+                first_event = time.perf_counter() - start
+            item = json.loads(line)
+            if item.get("type") == "summary":
+                ok = item["failed"] == 0
+    return {"status": status, "ok": ok and status == 200, "first_event": first_event}
+
+
+async def run_scenario(
+    app_url: str,
+    mock_url: Optional[str],
+    scenario: Scenario,
+    sampler: ProcessSampler,
+    warmup: int
+) -> Dict[str, Any]:
+    data = make_file(scenario.size_kb, scenario.file_type)
+    limits = httpx.Limits(max_connections=scenario.concurrency, max_keepalive_connections=scenario.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=300, limits=limits) as client:
+        for i in range(warmup):
+            await send(client, scenario, data, -1 - i)
+
+        mock_before = (await client.get(f"{mock_url}/__stats")).json() if mock_url else None
+        cpu_before = sampler.cpu_seconds()
+        latencies: List[float] = []
+        first_events: List[float] = []
+        statuses: Dict[str, int] = {}
+        succeeded = 0
+        counter = iter(range(scenario.requests))
+
+        async def worker():
+            nonlocal succeeded
+            for index in counter:
+                start = time.perf_counter()
+                try:
+                    result = await send(client, scenario, data, index)
+                except httpx.HTTPError as e:
+                    result = {"status": type(e).__name__, "ok": False, "first_event": None}
+                latencies.append(time.perf_counter() - start)
+                statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+                if result["ok"]:
+                    succeeded += 1
+                if result["first_event"] is not None:
+                    first_events.append(result["first_event"])
+
+        stop = asyncio.Event()
+        watcher = asyncio.ensure_future(sampler.watch(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+        duration = time.perf_counter() - start
+        stop.set()
+        await watcher
+        cpu_after = sampler.cpu_seconds()
+        mock_after = (await client.get(f"{mock_url}/__stats")).json() if mock_url else None
+
+    documents = scenario.requests * (scenario.batch_files if scenario.endpoint == "batch" else 1)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    result: Dict[str, Any] = {
+        "endpoint": scenario.endpoint,
+        "provider": scenario.provider,
+        "file_type": scenario.file_type,
+        "size_kb": scenario.size_kb,
+        "file_bytes": len(data),
+        "concurrency": scenario.concurrency,
+        "requests": scenario.requests,
+        "documents": documents,
+        "succeeded": succeeded,
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(scenario.requests / duration, 2),
+        "documents_per_s": round(documents / duration, 2),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.5)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(max(latencies)) if latencies else None,
+        },
+        "first_event_ms": {
+            "p50": ms(percentile(first_events, 0.5)),
+            "p95": ms(percentile(first_events, 0.95)),
+        } if first_events else None,
+        "cpu_ms_per_request": round((cpu_after - cpu_before) * 1000 / scenario.requests, 2)
+        if cpu_before is not None and cpu_after is not None else None,
+        "rss_mb_end": round(sampler.rss_mb(), 1) if sampler.available() else None,
+        "rss_mb_peak": round(sampler.peak_rss, 1) if sampler.peak_rss else None,
+    }
+    if mock_before is not None and mock_after is not None:
+        result["upstream_calls"] = sum(mock_after["calls"].values()) - sum(mock_before["calls"].values())
+        result["upstream_errors"] = sum(mock_after["errors"].values()) - sum(mock_before["errors"].values())
+    return result
+
+
+async def wait_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Processo encerrou antes de ficar pronto: {url}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Sem resposta em {url}")
+
+
+def start_processes(args) -> Dict[str, Any]:
+    """
+    Sobe o mock e a aplicação; retorna URLs e processos.
+    """
+    mock_port = free_port()
+    app_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    quiet = subprocess.DEVNULL
+    mock = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_provider",
+        "--port", str(mock_port),
+        "--latency-median", str(args.mock_latency_median),
+        "--latency-sigma", str(args.mock_latency_sigma),
+        "--error-rate", str(args.mock_error_rate),
+        "--seed", "1",
+    ], stdout=quiet, stderr=quiet)
+
+    env = {
+        **os.environ,
+        "CLAUDE_BASE_URL": mock_url,
+        "GEMINI_BASE_URL": mock_url,
+        # O teste mede a aplicação, não os limites por cliente/chave
+        "RATE_LIMIT": "0",
+        "RATE_LIMIT_PER_API_KEY": "0",
+    }
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning",
+    ], env=env, stdout=quiet, stderr=None if args.app_logs else quiet)
+    return {"mock": mock, "app": app, "mock_url": mock_url, "app_url": f"http://127.0.0.1:{app_port}"}
+
+
+async def run(args) -> Dict[str, Any]:
+    processes = None
+    if args.app_url:
+        app_url, mock_url, app_process = args.app_url, args.mock_url, None
+        sampler = ProcessSampler(args.app_pid)
+    else:
+        processes = start_processes(args)
+        app_url, mock_url, app_process = processes["app_url"], processes["mock_url"], processes["app"]
+        sampler = ProcessSampler(app_process.pid)
+
+    results = []
+    try:
+        if mock_url:
+            await wait_ready(f"{mock_url}/__stats", processes["mock"] if processes else None)
+        await wait_ready(f"{app_url}/api/health", app_process)
+        rss_idle = sampler.rss_mb()
+        for endpoint in args.endpoints:
+            for size_kb in args.sizes_kb:
+                for concurrency in args.concurrency:
+                    scenario = Scenario(
+                        endpoint, args.provider, args.file_type, size_kb,
+                        concurrency, args.requests, args.batch_files
+                    )
+                    result = await run_scenario(app_url, mock_url, scenario, sampler, args.warmup)
+                    results.append(result)
+                    print_row(result)
+    finally:
+        if processes:
+            for process in (processes["app"], processes["mock"]):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "mock_latency_median": args.mock_latency_median,
+            "mock_latency_sigma": args.mock_latency_sigma,
+            "mock_error_rate": args.mock_error_rate,
+            "app_env": args.app_env,
+            "rss_mb_idle": round(rss_idle, 1) if rss_idle is not None else None,
+        },
+        "results": results,
+    }
+
+
+def print_row(result: Dict[str, Any]) -> None:
+    latency = result["latency_ms"]
+    print(
+        f"{result['endpoint']:>8} {result['size_kb']:>6}KB c={result['concurrency']:<4}"
+        f" ok={result['succeeded']}/{result['requests']:<5} {result['throughput_rps']:>8} req/s"
+        f"  p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms"
+        f"  cpu={result['cpu_ms_per_request']}ms/req rss={result['rss_mb_peak']}MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=["extract"],
+                        choices=["extract", "upload", "stream", "batch"])
+    parser.add_argument("--provider", default="claude", choices=["claude", "gemini", "auto"])
+    parser.add_argument("--file-type", default="image/jpeg", choices=list(FORMATS))
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[200])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=100, help="requisições por cenário")
+    parser.add_argument("--batch-files", type=int, default=5, help="arquivos por requisição (batch)")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--mock-latency-median", type=float, default=0.5)
+    parser.add_argument("--mock-latency-sigma", type=float, default=0.3)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--app-env", nargs="*", default=[], metavar="CHAVE=VALOR",
+                        help="variáveis extras para a aplicação (ex.: CACHE_ENABLED=false)")
+    parser.add_argument("--app-logs", action="store_true", help="mostrar os logs da aplicação")
+    parser.add_argument("--app-url", help="usar uma aplicação já em execução")
+    parser.add_argument("--app-pid", type=int, help="PID da aplicação (CPU/RSS com --app-url)")
+    parser.add_argument("--mock-url", help="mock já em execução (com --app-url)")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
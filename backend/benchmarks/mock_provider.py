@@ -0,0 +1,270 @@
+"""
+Servidor local que imita as APIs do Claude, do Gemini e as compatíveis com a
+da OpenAI, para benchmarks e testes de carga sem gastar créditos.
+
+Responde em /v1/messages (Claude, com ou sem stream, tool use ou texto), em
+/v1beta/models/{modelo}:generateContent / :streamGenerateContent (Gemini) e em
+/v1/chat/completions (OpenAI, com ou sem stream),
+com latência sorteada de uma distribuição log-normal, taxa de erros
+configurável (com Retry-After) e documento de resposta fixo ou de arquivo.
+GET /__stats retorna as contagens de chamadas e erros.
+
+Uso (a partir de backend/):
+    python -m benchmarks.mock_provider --port 8600 --latency-median 1.5 --error-rate 0.02
+
+E na aplicação:
+    CLAUDE_BASE_URL=http://127.0.0.1:8600 GEMINI_BASE_URL=http://127.0.0.1:8600 uvicorn app.main:app
+    (e OPENAI_ENABLED=true OPENAI_BASE_URL=http://127.0.0.1:8600 para o provedor compatível)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Documento devolvido por padrão (campos de um RG)
+DEFAULT_DOCUMENT = {
+    "tipoDocumento": "RG",
+    "nome": "MARIA DA SILVA SAURO",
+    "nomeDaMae": "ANA DA SILVA",
+    "nomeDoPai": "JOSE SAURO",
+    "rg": "12.345.678-9",
+    "cpf": "123.456.789-09",
+    "orgaoExpedidor": "SSP/SP",
+    "dataExpedicao": "10/05/2015",
+    "dataNascimento": "21/03/1988",
+    "naturalidade": "SAO PAULO",
+    "uf": "SP",
+}
+
+
+class MockConfig:
+    """
+    Comportamento do servidor (latência, erros, resposta).
+    """
+
+    def __init__(
+        self,
+        latency_median: float = 1.0,
+        latency_sigma: float = 0.3,
+        error_rate: float = 0.0,
+        error_statuses: Optional[List[int]] = None,
+        retry_after: int = 1,
+        stream_chunks: int = 8,
+        document: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses or [500, 503, 529]
+        self.retry_after = retry_after
+        self.stream_chunks = max(1, stream_chunks)
+        self.document = document or DEFAULT_DOCUMENT
+        self.random = random.Random(seed)
+
+    def latency(self) -> float:
+        """
+        Latência log-normal com a mediana configurada (sigma 0 = fixa).
+        """
+        if self.latency_median <= 0:
+            return 0.0
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return self.random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def error_status(self) -> Optional[int]:
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            return self.random.choice(self.error_statuses)
+        return None
+
+
+class MockStats:
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.request_bytes = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "errors": self.errors, "request_bytes": self.request_bytes}
+
+
+def chunks(text: str, count: int) -> List[str]:
+    size = max(1, math.ceil(len(text) / count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def sse(data: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+def create_app(config: MockConfig) -> Starlette:
+    """
+    Aplicação Starlette do mock (também usada diretamente pelo load_test).
+    """
+    stats = MockStats()
+
+    async def admit(request: Request, provider: str) -> Optional[Response]:
+        """
+        Lê o corpo, contabiliza a chamada e sorteia um erro (None = seguir).
+        """
+        body = await request.body()
+        stats.request_bytes += len(body)
+        stats.calls[provider] = stats.calls.get(provider, 0) + 1
+        status = config.error_status()
+        if status is None:
+            return None
+        stats.errors[provider] = stats.errors.get(provider, 0) + 1
+        await asyncio.sleep(config.latency() / 10)
+        return JSONResponse(
+            {"error": {"type": "overloaded_error" if status == 529 else "api_error",
+                       "message": f"Erro simulado {status}"}},
+            status_code=status,
+            headers={"Retry-After": str(config.retry_after)}
+        )
+
+    def document_text() -> str:
+        return json.dumps(config.document, ensure_ascii=False)
+
+    async def claude_messages(request: Request) -> Response:
+        error = await admit(request, "claude")
+        if error is not None:
+            return error
+        payload = orjson.loads(await request.body())
+        structured = bool(payload.get("tools"))
+        usage = {"input_tokens": 1500, "output_tokens": 120}
+
+        if payload.get("stream"):
+            return StreamingResponse(
+                claude_stream(structured, usage), media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(config.latency())
+        if structured:
+            block = {"type": "tool_use", "id": "toolu_mock", "name": payload["tools"][0]["name"],
+                     "input": config.document}
+        else:
+            block = {"type": "text", "text": f"```json\n{document_text()}\n```"}
+        return JSONResponse({
+            "id": "msg_mock", "type": "message", "role": "assistant",
+            "content": [block], "stop_reason": "end_turn", "usage": usage,
+        })
+
+    async def claude_stream(structured: bool, usage: Dict[str, int]) -> AsyncIterator[bytes]:
+        delay = config.latency() / (config.stream_chunks + 1)
+        await asyncio.sleep(delay)
+        yield sse({"type": "message_start", "message": {"usage": usage}}, "message_start")
+        yield sse({"type": "content_block_start", "index": 0}, "content_block_start")
+        text = document_text()
+        for part in chunks(text, config.stream_chunks):
+            await asyncio.sleep(delay)
+            delta = ({"type": "input_json_delta", "partial_json": part} if structured
+                     else {"type": "text_delta", "text": part})
+            yield sse({"type": "content_block_delta", "index": 0, "delta": delta}, "content_block_delta")
+        yield sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        yield sse({"type": "message_stop"}, "message_stop")
+
+    def gemini_body(text: str) -> Dict[str, Any]:
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+            "usageMetadata": {"promptTokenCount": 1300, "candidatesTokenCount": 110},
+        }
+
+    async def gemini_generate(request: Request) -> Response:
+        method = request.path_params["method"]
+        error = await admit(request, "gemini")
+        if error is not None:
+            return error
+        if method.endswith(":streamGenerateContent"):
+            return StreamingResponse(gemini_stream(), media_type="text/event-stream")
+        if not method.endswith(":generateContent"):
+            return JSONResponse({"error": {"message": "Método desconhecido"}}, status_code=404)
+        await asyncio.sleep(config.latency())
+        return JSONResponse(gemini_body(document_text()))
+
+    async def gemini_stream() -> AsyncIterator[bytes]:
+        delay = config.latency() / (config.stream_chunks + 1)
+        for part in chunks(document_text(), config.stream_chunks):
+            await asyncio.sleep(delay)
+            yield sse(gemini_body(part))
+
+    async def openai_completions(request: Request) -> Response:
+        error = await admit(request, "openai")
+        if error is not None:
+            return error
+        payload = orjson.loads(await request.body())
+        if payload.get("stream"):
+            return StreamingResponse(openai_stream(), media_type="text/event-stream")
+        await asyncio.sleep(config.latency())
+        return JSONResponse({
+            "id": "chatcmpl-mock", "object": "chat.completion", "model": payload.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": document_text()}}],
+            "usage": {"prompt_tokens": 1200, "completion_tokens": 115},
+        })
+
+    async def openai_stream() -> AsyncIterator[bytes]:
+        delay = config.latency() / (config.stream_chunks + 1)
+        for part in chunks(document_text(), config.stream_chunks):
+            await asyncio.sleep(delay)
+            yield sse({"object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {"content": part}}]})
+        yield b"data: [DONE]\n\n"
+
+    async def mock_stats(request: Request) -> Response:
+        return JSONResponse(stats.as_dict())
+
+    app = Starlette(routes=[
+        Route("/v1/messages", claude_messages, methods=["POST"]),
+        Route("/v1beta/models/{method}", gemini_generate, methods=["POST"]),
+        Route("/v1/chat/completions", openai_completions, methods=["POST"]),
+        Route("/__stats", mock_stats, methods=["GET"]),
+    ])
+    app.state.stats = stats
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency-median", type=float, default=1.0, help="segundos")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="sigma da log-normal (0 = fixa)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[500, 503, 529])
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--response-file", help="JSON com o documento a devolver")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    document = None
+    if args.response_file:
+        with open(args.response_file, encoding="utf-8") as f:
+            document = json.load(f)
+
+    config = MockConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_statuses=args.error_statuses,
+        retry_after=args.retry_after,
+        stream_chunks=args.stream_chunks,
+        document=document,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Perfil de produção: gunicorn gerenciando workers uvicorn (uvloop + httptools).
+
+Uso (a partir de backend/):
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Número de workers: WEB_CONCURRENCY ou os núcleos disponíveis ao processo
+(afinidade de CPU limitada pela cota do cgroup, em containers). Cada worker
+é um event loop independente; o master só gerencia os processos.
+
+Estado por processo com mais de um worker (os padrões abaixo só são
+aplicados se a variável não estiver no ambiente nem no .env):
+- cache de extrações: o LRU em memória é por worker e o SQLite em
+  CACHE_DISK_PATH é compartilhado;
+- limites por cliente e por chave de API: baldes em RATE_LIMIT_DB_PATH,
+  compartilhados; o limite de concorrência (admissão) continua por worker;
+- jobs: JOBS_DB_PATH compartilhado, cada job é reivindicado por um worker
+  e o status pode ser consultado em qualquer um;
+- métricas: snapshots de cada worker em METRICS_MULTIPROCESS_DIR, somados
+  no scrape de /metrics;
+- quase-duplicatas: índice em memória por worker, com o snapshot em
+  NEAR_DUPLICATE_SNAPSHOT_PATH unindo as entradas de todos;
+- circuit breakers, latências do hedge e uso por chave continuam por
+  worker (cada um aprende com as próprias chamadas).
+"""
+
+import importlib.util
+import math
+import os
+import shutil
+
+from dotenv import dotenv_values
+
+
+def _cgroup_cpu_quota():
+    """
+    Cota de CPU do cgroup (v2 ou v1) em núcleos, ou None se não houver.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+_dotenv = {name.upper() for name in dotenv_values(".env")}
+
+
+def _default_env(name: str, value: str) -> None:
+    if name not in os.environ and name not in _dotenv:
+        os.environ[name] = value
+
+
+# Servidor
+bind = f"0.0.0.0:{os.environ.get('PORT', '8567')}"
+workers = int(os.environ.get("WEB_CONCURRENCY") or available_cpus())
+# loop e http "auto": uvloop e httptools quando instalados (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+# Fila de conexões aceitas pelo kernel e ainda não atendidas (limitada por net.core.somaxconn)
+backlog = int(os.environ.get("GUNICORN_BACKLOG", 2048))
+# Maior que o tempo ocioso do proxy/load balancer (60s no nginx e nos LBs
+# comuns), para que quem feche a conexão ociosa seja sempre o proxy
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75))
+
+# Reciclagem: cada worker é substituído depois de max_requests (+ jitter, para
+# não reiniciarem juntos), terminando antes as requisições em andamento
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 500))
+# Tempo para concluir as extrações em andamento ao reciclar ou no SIGTERM:
+# o prazo total de uma extração com retries (api_timeout * fator) e folga
+graceful_timeout = int(os.environ.get(
+    "GUNICORN_GRACEFUL_TIMEOUT",
+    int(os.environ.get("API_TIMEOUT", 30)) * float(os.environ.get("RETRY_DEADLINE_FACTOR", 2.0)) + 10
+))
+# Workers uvicorn avisam o master pelo event loop: só um loop travado
+# por tanto tempo (ex.: trabalho de CPU fora do pool) é reiniciado
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+# Cada worker importa a aplicação depois do fork: conexões SQLite, pools
+# HTTP e o pool de processos de CPU nunca são herdados entre processos
+preload_app = False
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+# A aplicação já registra cada requisição (middleware log_requests)
+accesslog = None
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+# Estado compartilhado entre os workers
+state_dir = os.environ.get("SHARED_STATE_DIR", "/tmp/docextractor")
+if workers > 1:
+    _default_env("CACHE_DISK_PATH", os.path.join(state_dir, "cache.sqlite3"))
+    _default_env("RATE_LIMIT_DB_PATH", os.path.join(state_dir, "rate_limits.sqlite3"))
+    _default_env("JOBS_DB_PATH", os.path.join(state_dir, "jobs.sqlite3"))
+    _default_env("NEAR_DUPLICATE_SNAPSHOT_PATH", os.path.join(state_dir, "near_duplicates.bin"))
+    _default_env("METRICS_MULTIPROCESS_DIR", os.path.join(state_dir, "metrics"))
+    # Os workers já ocupam os núcleos; um processo de CPU por worker basta
+    # para tirar imagens e PDFs do event loop
+    _default_env("CPU_WORKERS", "1")
+
+
+def on_starting(server):
+    """
+    Antes de criar os workers: diretórios do estado compartilhado e
+    métricas zeradas (snapshots de uma execução anterior teriam pids
+    que podem ser reutilizados).
+    """
+    for name in ("CACHE_DISK_PATH", "RATE_LIMIT_DB_PATH", "JOBS_DB_PATH", "NEAR_DUPLICATE_SNAPSHOT_PATH"):
+        path = os.environ.get(name)
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    metrics_dir = os.environ.get("METRICS_MULTIPROCESS_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+    for module, fallback in (("uvloop", "asyncio"), ("httptools", "h11")):
+        if importlib.util.find_spec(module) is None:
+            server.log.warning(f"{module} não instalado: os workers usarão {fallback}")
+    server.log.info(
+        f"{workers} worker(s), backlog {backlog}, keep-alive {keepalive}s, "
+        f"reciclagem a cada {max_requests}+-{max_requests_jitter} requisições"
+    )